@@ -1,16 +1,42 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import altair as alt
-from fpdf import FPDF
 import base64
-from datetime import datetime
-import os
 import io
-import tempfile
-from PIL import Image
-import re
-import unicodedata
+from datetime import datetime
+from streamlit.errors import StreamlitAPIException
+
+from k360.almacen import abrir_almacen, version_motor
+from k360.backtest import backtest_ventanas, cargar_historial, leer_historial
+from k360.cache import CACHE_PROYECCIONES, clave_canonica, memoizar
+from k360.cola_pdf import COLA_PDF, DESCONOCIDO, EN_PROCESO
+from k360.comparador import TASAS_PERFIL, calcular_comparador, escenarios_comparador
+from k360.costos import obtener_tasa_admin
+from k360.divisas import CORRELACION_TC, DEPRECIACION_ANUAL, TIPO_CAMBIO_INICIAL, VOLATILIDAD_TC
+from k360.exportar import FORMATOS, escribir, tipo_mime
+from k360.fiscal import TOPE_ART_151_ABS, TOPE_ART_185, analisis_fiscal
+from k360.grafica import (
+    construir_grafica,
+    construir_grafica_backtest,
+    construir_grafica_retiro,
+    construir_mapa_calor,
+    construir_tornado,
+)
+from k360.mapa_calor import EJES_REJILLA, evaluar_rejilla
+from k360.metas import ahorro_requerido, edad_fin_aportes_requerida, tasa_bruta_requerida
+from k360.metricas import REGISTRO, iniciar_servidor_metricas, registrar, span
+from k360.montecarlo import PERFILES_MONTECARLO, simular_montecarlo
+from k360.proyeccion import (
+    COLUMNAS_CALENDARIO,
+    COLUMNAS_DETALLE,
+    GRANULARIDADES,
+    iterar_calendario,
+    pension_maxima,
+    proyectar_detalle_mensual,
+    proyectar_retiro,
+)
+from k360.reglas_fiscales import cargar_reglas, topes_por_anio
+from k360.sensibilidad import DELTAS_SENSIBILIDAD, analisis_sensibilidad
 
 
 # =============================
@@ -18,19 +44,40 @@ import unicodedata
 # =============================
 import hashlib
 import hmac
+import json
+import os
 import time
 
+from k360.sesion import crear_almacen_intentos, firmar_token, secreto_efimero, validar_token
+
 def _sha256(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
 def _get_auth_cfg():
-    """Lee configuración desde st.secrets (Streamlit Cloud)."""
+    """Configuración de auth, releída solo cuando cambia la sección [auth] de Secrets."""
+    try:
+        huella = _sha256(repr(st.secrets.get("auth")))
+    except Exception:
+        huella = ""
+    return _cargar_auth_cfg(huella)
+
+@st.cache_resource(show_spinner=False)
+def _cargar_auth_cfg(huella: str):
+    """Lee configuración desde st.secrets (Streamlit Cloud) una vez por versión de los Secrets.
+
+    Incluye el secreto con que se firman las sesiones y el almacén compartido
+    de intentos fallidos. Es compartida: trátala como de solo lectura. La
+    huella hace que dar de baja o cambiar el rol de un usuario aplique en el
+    siguiente rerun.
+    """
     cfg = {
         "enabled": True,
         "session_ttl_minutes": 12 * 60,   # 12 horas
         "max_attempts": 8,
         "lockout_minutes": 5,
-        "users": {}
+        "users": {},
+        "session_secret": os.environ.get("K360_SESSION_SECRET", ""),
+        "throttle_store": os.environ.get("K360_THROTTLE_STORE", ""),
     }
 
     try:
@@ -40,57 +87,82 @@ def _get_auth_cfg():
             cfg["session_ttl_minutes"] = int(s.get("session_ttl_minutes", cfg["session_ttl_minutes"]))
             cfg["max_attempts"] = int(s.get("max_attempts", cfg["max_attempts"]))
             cfg["lockout_minutes"] = int(s.get("lockout_minutes", cfg["lockout_minutes"]))
-            cfg["users"] = dict(s.get("users", {}))
+            cfg["users"] = {u: dict(datos) for u, datos in dict(s.get("users", {})).items()}
+            cfg["session_secret"] = str(s.get("session_secret", cfg["session_secret"]))
+            cfg["throttle_store"] = str(s.get("throttle_store", cfg["throttle_store"]))
     except Exception:
         pass
 
+    # Sin secreto fijo las sesiones solo valen en este proceso (una réplica)
+    cfg["secreto_efimero"] = not cfg["session_secret"]
+    if cfg["secreto_efimero"]:
+        cfg["session_secret"] = secreto_efimero()
+    cfg["intentos"] = crear_almacen_intentos(cfg["throttle_store"]) if cfg["enabled"] else None
     return cfg
 
-def _is_locked() -> bool:
-    lock_until = st.session_state.get("_auth_lock_until", 0.0)
-    return time.time() < float(lock_until)
+def _verify_password(plain_password: str, stored_sha256: str) -> bool:
+    calc = _sha256(plain_password or "")
+    return hmac.compare_digest(calc, stored_sha256 or "")
+
+COOKIE_SESION = "k360_sesion"
 
-def _register_failed_attempt(cfg):
-    attempts = int(st.session_state.get("_auth_attempts", 0)) + 1
-    st.session_state["_auth_attempts"] = attempts
 
-    if attempts >= cfg["max_attempts"]:
-        lock_seconds = int(cfg["lockout_minutes"]) * 60
-        st.session_state["_auth_lock_until"] = time.time() + lock_seconds
+def _escribir_cookie(valor: str, max_age: int):
+    """El token vive en una cookie del navegador (no en la URL): no queda en el historial, en logs ni en enlaces copiados."""
+    cookie = f"{COOKIE_SESION}={valor}; Max-Age={int(max_age)}; Path=/; SameSite=Strict"
+    st.html(
+        f"<script>document.cookie = {json.dumps(cookie)} + (location.protocol === 'https:' ? '; Secure' : '');</script>",
+        unsafe_allow_javascript=True,
+    )
 
-def _reset_attempts():
-    st.session_state["_auth_attempts"] = 0
-    st.session_state["_auth_lock_until"] = 0.0
 
-def _verify_password(plain_password: str, stored_sha256: str) -> bool:
-    calc = _sha256(plain_password or "")
-    return hmac.compare_digest(calc, stored_sha256 or "")
+def _cerrar_sesion(cfg, sesion=None):
+    """Limpia la sesión local; con `sesion` además revoca su jti en el almacén compartido."""
+    if sesion is not None and sesion["jti"]:
+        cfg["intentos"].revocar(sesion["jti"], sesion["exp"])
+    st.session_state["_auth_ok"] = False
+    st.session_state["_auth_user"] = None
+    st.session_state["_auth_role"] = None
+    st.session_state.pop("_auth_token", None)
+    st.session_state.pop("_auth_cookie", None)
+    st.session_state["_auth_borrar_cookie"] = True
 
 def require_login():
-    """Gate de acceso: si no está autenticado, muestra login y detiene la app."""
+    """Gate de acceso: si no está autenticado, muestra login y detiene la app.
+
+    La sesión es un token firmado (usuario, jti, expiración) guardado en una
+    cookie: si el websocket reconecta a otra réplica, esa réplica lo valida
+    con el mismo secreto. Cerrar sesión revoca el jti en el almacén
+    compartido, y el rol se lee de la configuración en cada rerun (quitar o
+    cambiar un usuario en Secrets aplica sin esperar a que el token expire).
+    """
     cfg = _get_auth_cfg()
 
     if not cfg["enabled"]:
         return
 
-    # Sesión válida
-    authed = bool(st.session_state.get("_auth_ok", False))
-    auth_ts = float(st.session_state.get("_auth_ts", 0.0))
-    ttl = int(cfg["session_ttl_minutes"]) * 60
-
-    if authed and (time.time() - auth_ts) < ttl:
+    st.query_params.pop("sesion", None)  # enlaces viejos con el token en la URL
+
+    # Sesión válida: token de esta sesión o el de la cookie (reconexión / otra réplica)
+    token = st.session_state.get("_auth_token") or st.context.cookies.get(COOKIE_SESION)
+    sesion = validar_token(token, cfg["session_secret"])
+    if sesion is not None and sesion["usuario"] in cfg["users"] and not cfg["intentos"].revocado(sesion["jti"]):
+        st.session_state["_auth_ok"] = True
+        st.session_state["_auth_user"] = sesion["usuario"]
+        st.session_state["_auth_role"] = cfg["users"][sesion["usuario"]].get("role", "viewer")
+        st.session_state["_auth_token"] = token
+        if st.session_state.get("_auth_cookie") != token and st.context.cookies.get(COOKIE_SESION) != token:
+            _escribir_cookie(token, sesion["exp"] - time.time())
+        st.session_state["_auth_cookie"] = token
         with st.sidebar:
             if st.button("🔒 Cerrar sesión"):
-                st.session_state["_auth_ok"] = False
-                st.session_state["_auth_user"] = None
-                st.session_state["_auth_role"] = None
-                st.session_state["_auth_ts"] = 0.0
+                _cerrar_sesion(cfg, sesion)
                 st.rerun()
         return
-
-    if _is_locked():
-        st.error("Demasiados intentos. Intenta más tarde.")
-        st.stop()
+    if token:
+        _cerrar_sesion(cfg)  # expirado, revocado, usuario dado de baja o firma inválida
+    if st.session_state.pop("_auth_borrar_cookie", False):
+        _escribir_cookie("", 0)
 
     st.title("🔐 Acceso privado")
     st.caption("Ingresa tus credenciales para continuar.")
@@ -105,42 +177,37 @@ def require_login():
         st.stop()
 
     if submit:
-        user = cfg["users"].get(username)
-        if not user:
-            _register_failed_attempt(cfg)
-            st.error("Usuario o contraseña incorrectos.")
+        # El bloqueo es por usuario y compartido: no se reinicia con otra pestaña o réplica
+        intentos = cfg["intentos"]
+        if time.time() < intentos.bloqueado_hasta(username):
+            st.error("Demasiados intentos. Intenta más tarde.")
             st.stop()
 
-        stored = user.get("password_sha256", "")
-        role = user.get("role", "viewer")
+        user = cfg["users"].get(username)
+        stored = user.get("password_sha256", "") if user else ""
 
-        if _verify_password(password, stored):
-            _reset_attempts()
-            st.session_state["_auth_ok"] = True
-            st.session_state["_auth_user"] = username
-            st.session_state["_auth_role"] = role
-            st.session_state["_auth_ts"] = time.time()
+        if user and _verify_password(password, stored):
+            intentos.reiniciar(username)
+            st.session_state["_auth_token"] = firmar_token(
+                username, int(cfg["session_ttl_minutes"]) * 60, cfg["session_secret"]
+            )
             st.rerun()
         else:
-            _register_failed_attempt(cfg)
+            intentos.registrar_fallo(username, cfg["max_attempts"], int(cfg["lockout_minutes"]) * 60)
             st.error("Usuario o contraseña incorrectos.")
             st.stop()
 
     st.stop()
 
-# -----------------------------
-# CONSTANTES FISCALES (MX) - MVP
-# -----------------------------
-TOPE_ART_151_ABS = 206_367.0  # Tope anual absoluto Art. 151 LISR (estimado, referencia)
-TOPE_ART_185 = 152_000.0  # Tope anual Art. 185 LISR (estimado; ajustable según criterio/actualización)
-FACTOR_CALIBRACION_ALLIANZ = 0.90  # Ajuste calibrado para replicar simulador Allianz en escenario Allianz-style
-
-
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Simulador Krece360", layout="wide", page_icon="🛡️")
 
-require_login()
+_inicio_rerun = time.perf_counter()
+iniciar_servidor_metricas()  # /metrics en K360_METRICAS_PUERTO (si está definido)
+
+with span("auth.require_login"):
+    require_login()
 
 # --- ESTILOS CSS ---
 st.markdown("""
@@ -158,463 +225,101 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- NUEVA FUNCIÓN: MATRIZ DE COSTOS ALLIANZ (Pág 9 PDF) ---
-def obtener_tasa_admin(aporte_mensual, plazo_anios):
-    # Definir columna basada en el plazo (15, 20 o 25 años)
-    if plazo_anios >= 25:
-        col_idx = 2 
-    elif plazo_anios >= 20:
-        col_idx = 1 
-    else:
-        col_idx = 0 
-
-    # Tabla: (Monto Mínimo, [Tasa 15, Tasa 20, Tasa 25])
-    tabla_costos = [
-        (10000, [0.0183, 0.0162, 0.0153]), 
-        (7500,  [0.0187, 0.0165, 0.0156]), 
-        (5000,  [0.0197, 0.0175, 0.0164]), 
-        (4000,  [0.0206, 0.0181, 0.0169]), 
-        (2500,  [0.0228, 0.0199, 0.0184]), 
-        (0,     [0.0228, 0.0199, 0.0184])  # Default
-    ]
-
-    tasa_final = 0.0228 # Valor por defecto
-    for monto_min, tasas in tabla_costos:
-        if aporte_mensual >= monto_min:
-            tasa_final = tasas[col_idx]
-            break
-            
-    return tasa_final
 
+# -----------------------------
+# Secciones con rerun propio
+# -----------------------------
+# Un widget dentro de un fragmento vuelve a ejecutar solo ese fragmento, no el
+# script completo. Cada sección recibe por argumento todo lo que depende de la
+# simulación; lo que la sección captura (meta, logo, asesor) no toca la
+# proyección, el comparador ni la gráfica.
+_fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", lambda fn: fn)
 
 
 # -----------------------------
-# Helper: proyección rápida para comparar escenarios
+# Propuestas guardadas (SQLite)
 # -----------------------------
-def proyectar_saldos_dos_fases(
-    ahorro_mensual: float,
-    edad_actual: int,
-    edad_fin_aportes: int,
-    edad_objetivo: int,
-    tasa_bruta_scenario: float,
-    tasa_admin_real: float,
-    inflacion: bool,
-    tasa_inflacion: float,
-    estrategia_fiscal: str,
-    validar_sueldo: bool,
-    sueldo_anual: float,
-    isr_cliente: float,
-    tope_art_151_abs: float,
-    tope_art_185: float,
-    reinvertir_beneficio: bool,
-):
-    """Devuelve (saldo_fin_aportes, saldo_objetivo, tasa_neta).
+# Entradas de la barra lateral que se guardan con cada propuesta (keys de widget)
+CLAVES_ENTRADA = (
+    "in_nombre", "in_edad", "in_edad_fin_aportes", "in_retiro", "in_ahorro_mensual",
+    "in_estrategia_fiscal", "in_isr_cliente", "in_validar_sueldo", "in_sueldo_anual",
+    "in_reinvertir_beneficio", "in_perfil_k360", "in_modo_avanzado", "in_tasa_bruta",
+    "in_inflacion", "in_inflacion_pct", "in_montecarlo_activo", "in_volatilidad_mc", "in_trayectorias_mc",
+    "in_usd_activo", "in_tipo_cambio", "in_depreciacion_pct", "in_volatilidad_tc", "in_correlacion_tc",
+)
+PROPUESTAS_POR_PAGINA = 8
+TRAYECTORIAS_USD = 2000  # simulación conjunta rendimiento / tipo de cambio del comparador
 
-    - Fase 1: aportaciones hasta edad_fin_aportes (inclusive por meses).
-    - Fase 2: sin aportaciones, solo crecimiento hasta edad_objetivo.
-    """
-    tasa_neta = max(0.0, float(tasa_bruta_scenario) - float(tasa_admin_real))
 
-    plazo_anos = int(edad_fin_aportes - edad_actual)
-    contrib_meses = max(0, int(plazo_anos) * 12)
-    total_meses = max(0, int((int(edad_objetivo) - int(edad_actual)) * 12))
+def _clave_widget(clave, entradas):
+    """Los sliders con sugerencia por perfil llevan un key por perfil (así siguen la sugerencia)."""
+    if clave in ("in_tasa_bruta", "in_volatilidad_mc"):
+        return f"{clave}_{entradas.get('in_perfil_k360')}"
+    return clave
 
-    saldo = 0.0
-    saldo_fin_aportes = None
-    aporte_actual = float(ahorro_mensual)
 
-    # Tope deducible anual según estrategia
-    if estrategia_fiscal == "Art 151 (PPR - Deducible)":
-        tope_deducible_anual = float(tope_art_151_abs)
-        if validar_sueldo:
-            tope_deducible_anual = min(float(tope_art_151_abs), float(sueldo_anual) * 0.10)
-    elif estrategia_fiscal == "Art 185 (Diferimiento)":
-        tope_deducible_anual = float(tope_art_185)
-    else:
-        tope_deducible_anual = 0.0  # Art 93 no deduce
-
-    aporte_anual_real = 0.0
-
-    for i in range(1, total_meses + 1):
-        rendimiento_mensual = saldo * (tasa_neta / 12.0)
-        aporte_mes = aporte_actual if i <= contrib_meses else 0.0
-        saldo += rendimiento_mensual + aporte_mes
-
-        if i <= contrib_meses:
-            aporte_anual_real += aporte_mes
-
-        if i == contrib_meses:
-            saldo_fin_aportes = saldo
-
-        # Ajuste inflacionario anual SOLO mientras aportas
-        if i % 12 == 0 and inflacion and i <= contrib_meses:
-            # Beneficio fiscal anual (si aplica) y reinversión opcional
-            if estrategia_fiscal != "Art 93 (No Deducible)":
-                aporte_deducible = min(aporte_anual_real, tope_deducible_anual)
-                devolucion_anio = aporte_deducible * float(isr_cliente)
-                if reinvertir_beneficio:
-                    saldo += devolucion_anio
-
-            aporte_anual_real = 0.0
-            aporte_actual *= (1.0 + float(tasa_inflacion))
-
-        # Si NO hay inflación, igual reseteamos anual para fiscal al cierre de año
-        if i % 12 == 0 and (not inflacion) and i <= contrib_meses:
-            if estrategia_fiscal != "Art 93 (No Deducible)":
-                aporte_deducible = min(aporte_anual_real, tope_deducible_anual)
-                devolucion_anio = aporte_deducible * float(isr_cliente)
-                if reinvertir_beneficio:
-                    saldo += devolucion_anio
-            aporte_anual_real = 0.0
-
-    if saldo_fin_aportes is None:
-        saldo_fin_aportes = saldo  # si fin aportes coincide con objetivo
-
-    saldo_objetivo = saldo
-    return float(saldo_fin_aportes), float(saldo_objetivo), float(tasa_neta)
-# --- CLASE PDF (PRODUCCIÓN) ---
-class PDFReport(FPDF):
-    def __init__(self, advisor_logo_path: str | None = None):
-        super().__init__()
-        self.advisor_logo_path = advisor_logo_path
-        self.fecha_actual = datetime.now().strftime("%d/%m/%Y")
-
-    # -----------------------------
-    # Sanitización de texto (FPDF usa latin-1)
-    # Evita errores tipo: 'latin-1' codec can't encode character '\u2014'
-    # -----------------------------
-    @staticmethod
-    def _sanitize_pdf_text(s) -> str:
-        if s is None:
-            return ""
-        s = str(s)
-
-        replacements = {
-            "—": "-",   # em dash —
-            "–": "-",   # en dash –
-            "−": "-",   # minus sign −
-            "‘": "'",   # ‘
-            "’": "'",   # ’
-            "“": '"',   # “
-            "”": '"',   # ”
-            "•": "-",   # bullet •
-            "\u00a0": " ",  # nbsp literal
-            " ": " ",   # nbsp
-        }
-        for k, v in replacements.items():
-            s = s.replace(k, v)
-
-        s = unicodedata.normalize("NFKC", s)
-
-        # Garantiza compatibilidad latin-1
-        try:
-            s.encode("latin-1")
-            return s
-        except Exception:
-            return s.encode("latin-1", "replace").decode("latin-1")
-
-    # Overwrite para proteger TODAS las impresiones
-    def cell(self, w, h=0, txt="", border=0, ln=0, align="", fill=False, link=""):
-        txt = self._sanitize_pdf_text(txt)
-        return super().cell(w, h, txt, border, ln, align, fill, link)
-
-    def multi_cell(self, w, h, txt="", border=0, align="J", fill=False):
-        txt = self._sanitize_pdf_text(txt)
-        return super().multi_cell(w, h, txt, border, align, fill)
-
-    def header(self):
-        # Logo del asesor (opcional) - esquina superior derecha
-        if self.advisor_logo_path and os.path.exists(self.advisor_logo_path):
-            try:
-                # Ajusta tamaño si quieres
-                self.image(self.advisor_logo_path, x=170, y=8, w=28)
-            except Exception:
-                pass
-
-        # Título
-        self.set_font("Arial", "B", 14)
-        self.set_text_color(0, 0, 0)
-        self.cell(0, 10, "Propuesta Personal de Retiro (PPR) - Simulacion estimada", 0, 1, "L")
-
-        # Fecha
-        self.set_font("Arial", "I", 10)
-        self.set_text_color(80, 80, 80)
-        self.cell(0, 6, f"Fecha: {self.fecha_actual}", 0, 1, "L")
-        self.ln(4)
-        self.set_text_color(0, 0, 0)
-
-    def footer(self):
-        # --- Footer compacto para evitar encimarse con el contenido ---
-        # Dejamos un margen inferior amplio con set_auto_page_break(margin=28)
-        # y aquí dibujamos un aviso legal corto + paginación.
-
-        # Aviso legal (compacto)
-        self.set_y(-22)
-        self.set_font("Arial", "", 6)
-        self.set_text_color(100, 100, 100)
-
-        disclaimer = (
-            "Aviso legal: Proyeccion informativa y estimativa. No constituye cotizacion formal ni oferta vinculante. "
-            "Rendimientos no garantizados y pueden variar. Consulte a su asesor para cotizacion oficial."
-        )
-        self.multi_cell(0, 2.8, disclaimer, 0, "C")
+def _asesor_actual() -> str:
+    return st.session_state.get("_auth_user") or "local"
 
-        # Paginación (separada para que nunca se encime con el texto)
-        self.set_y(-10)
-        self.set_text_color(0, 0, 0)
-        self.set_font("Arial", "I", 8)
-        self.cell(0, 10, f"Pagina {self.page_no()} | Generado con Simulador Krece360", 0, 0, "C")
 
+def _entradas_actuales() -> dict:
+    entradas = {}
+    for clave in CLAVES_ENTRADA:
+        key = _clave_widget(clave, st.session_state)
+        if key in st.session_state:
+            entradas[clave] = st.session_state[key]
+    return entradas
 
-# --- Helpers de endurecimiento (uploads / archivos) ---
-def _safe_filename(text: str, default: str = "propuesta") -> str:
-    try:
-        text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
-    except Exception:
-        text = str(text)
-    text = re.sub(r"[^a-zA-Z0-9_-]+", "_", text).strip("_")
-    return text or default
-
-def _save_logo_to_temp(uploaded_file) -> str | None:
-    """Guarda el logo subido en un archivo temporal seguro y devuelve la ruta."""
-    if uploaded_file is None:
-        return None
-    # Límite (evita uploads gigantes)
-    MAX_BYTES = 2 * 1024 * 1024  # 2MB
-    data = uploaded_file.getvalue()
-    if data is None:
-        return None
-    if len(data) > MAX_BYTES:
-        raise ValueError("El logotipo excede 2MB. Sube una imagen más ligera.")
-    # Validar tipo real de imagen (no solo extensión)
-    try:
-        img = Image.open(io.BytesIO(data))
-        img.verify()  # valida integridad
-        fmt = (img.format or "").lower()
-    except Exception:
-        raise ValueError("El logotipo no es una imagen válida. Usa PNG o JPG/JPEG.")
-    if fmt not in {"png", "jpeg", "jpg"}:
-        raise ValueError("Formato de logotipo no soportado. Usa PNG o JPG/JPEG.")
-    suffix = ".png" if fmt == "png" else ".jpg"
-    fd, path = tempfile.mkstemp(prefix="k360_logo_", suffix=suffix)
-    os.close(fd)
-    with open(path, "wb") as f:
-        f.write(data)
-    return path
-
-def _prepare_logo_for_pdf(logo_path: str | None) -> str | None:
-    """Convierte el logo a JPG (RGB) con fondo blanco (si trae transparencia) para máxima compatibilidad con FPDF.
-    Devuelve la ruta al JPG temporal.
-    """
-    if not logo_path or not os.path.exists(logo_path):
-        return None
-    try:
-        img = Image.open(logo_path)
 
-        # Si trae transparencia (RGBA/LA o paleta con transparencia), "aplanar" sobre fondo blanco.
-        has_alpha = (
-            img.mode in ("RGBA", "LA")
-            or (img.mode == "P" and "transparency" in img.info)
-        )
+def _restaurar_propuesta(id_propuesta):
+    """Callback de 'Abrir': escribe las entradas guardadas en los widgets y rerun completo."""
+    propuesta = abrir_almacen().obtener(id_propuesta, _asesor_actual())
+    if propuesta is None:
+        return
+    for clave, valor in propuesta["entradas"].items():
+        st.session_state[_clave_widget(clave, propuesta["entradas"])] = valor
+    st.session_state["_propuesta_abierta"] = (propuesta["id"], propuesta["cliente"], propuesta["version_motor"])
+    st.rerun()
 
-        if has_alpha:
-            rgba = img.convert("RGBA")
-            # Fondo blanco sólido
-            bg = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
-            # Componer manteniendo alpha
-            try:
-                bg.alpha_composite(rgba)
-                rgb = bg.convert("RGB")
-            except Exception:
-                # Fallback por si alpha_composite falla
-                rgb_bg = Image.new("RGB", rgba.size, (255, 255, 255))
-                rgb_bg.paste(rgba, mask=rgba.split()[-1])
-                rgb = rgb_bg
-        else:
-            rgb = img.convert("RGB")
 
-        fd, out_path = tempfile.mkstemp(prefix="k360_logo_pdf_", suffix=".jpg")
-        os.close(fd)
-        rgb.save(out_path, format="JPEG", quality=92, optimize=True)
-        return out_path
-    except Exception:
-        # Si falla, intentamos usar el original (por si ya es compatible)
-        return logo_path
+def _cambiar_pagina(delta):
+    st.session_state["alm_pagina"] = max(0, int(st.session_state.get("alm_pagina", 0)) + delta)
 
 
-
-def crear_pdf(datos_cliente, datos_fin, datos_fiscales, datos_asesor, ruta_logo_temp):
-    try:
-        logo_pdf_path = _prepare_logo_for_pdf(ruta_logo_temp)
-        pdf = PDFReport(advisor_logo_path=logo_pdf_path)
-        pdf.set_auto_page_break(auto=True, margin=24)
-        pdf.add_page()
-        
-        # --- CORRECCIÓN ESPACIO LOGO ---
-        pdf.ln(2) 
-        
-        pdf.set_font("Arial", size=10)
-        
-        # Datos Cliente
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 7, f"Propuesta para: {datos_cliente['nombre']}", 0, 1)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(0, 7, f"Edad Actual: {datos_cliente['edad']} | Fin aportaciones: {datos_cliente.get('edad_fin_aportes', datos_cliente['retiro'])} | Edad objetivo: {datos_cliente['retiro']}", 0, 1)
-        pdf.cell(0, 7, f"Estrategia: {datos_cliente['estrategia']}", 0, 1)
-        pdf.ln(5)
-
-        # Resumen de la estrategia
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 6, "Resumen de la estrategia", 0, 1)
-        pdf.set_font("Arial", size=9)
-        resumen = (
-            "Con base en la información proporcionada, esta simulación presenta una proyección estimada "
-            "de ahorro para el retiro mediante un Plan Personal de Retiro (PPR), considerando aportaciones "
-            "periódicas, un horizonte de largo plazo y el tratamiento fiscal conforme a la legislación vigente. "
-            "Los resultados son estimativos y no representan una garantía de rendimiento futuro."
-        )
-        pdf.multi_cell(0, 4.5, resumen)
-        pdf.ln(2)
-
-        # Resumen Financiero (compacto)
-        pdf.set_fill_color(240, 242, 246)
-        y_actual = pdf.get_y()
-        box_h = 28
-        pdf.rect(10, y_actual, 190, box_h, 'F')
-
-        pdf.set_y(y_actual + 4)
-        pdf.set_font("Arial", 'B', 10)
-
-        x_left, x_right = 14, 108
-        row_h = 5
-        y0 = pdf.get_y()
-
-        # Columna izquierda
-        pdf.set_xy(x_left, y0)
-        pdf.cell(0, row_h, f"Aportación mensual: ${datos_fin['aporte_mensual']:,.2f}", 0, 1)
-        pdf.set_xy(x_left, y0 + row_h)
-        pdf.cell(0, row_h, f"Total aportado: ${datos_fin['total_aportado']:,.2f}", 0, 1)
-        pdf.set_xy(x_left, y0 + row_h*2)
-        pdf.cell(0, row_h, f"Saldo a fin aportes: ${datos_fin.get('saldo_fin_aportes', 0.0):,.2f}", 0, 1)
-
-        # Columna derecha
-        pdf.set_xy(x_right, y0)
-        pdf.cell(0, row_h, f"Saldo a edad objetivo: ${datos_fin['saldo_final']:,.2f}", 0, 1)
-        pdf.set_xy(x_right, y0 + row_h)
-        pdf.cell(0, row_h, f"Beneficio SAT est.: ${datos_fin['beneficio_sat']:,.2f}", 0, 1)
-        pdf.set_xy(x_right, y0 + row_h*2)
-        pdf.set_font("Arial", 'I', 9)
-        pdf.cell(0, row_h, f"(Tasa admin: {datos_fin['tasa_admin_pct']:.2f}%)", 0, 1)
-
-        pdf.set_y(y_actual + box_h + 2)
-        
-
-        pdf.set_y(y_actual + 50)
-
-        # Comparador de Escenarios (mini-tabla)
-        comp = datos_fin.get('comparador') if isinstance(datos_fin, dict) else None
-        if comp and isinstance(comp, list):
-            try:
-                pdf.ln(2)
-                pdf.set_font("Arial", 'B', 11)
-                pdf.cell(0, 6, "Comparación de escenarios (resumen):", 0, 1)
-
-                # Encabezados
-                pdf.set_font("Arial", 'B', 9)
-                pdf.set_fill_color(240, 242, 246)
-                pdf.set_draw_color(200, 200, 200)
-
-                col1, col2, col3, col4 = 70, 28, 40, 42  # ancho total dentro de márgenes
-                pdf.cell(col1, 6, "Escenario", 1, 0, 'L', True)
-                pdf.cell(col2, 6, "Tasa neta", 1, 0, 'C', True)
-                pdf.cell(col3, 6, "Monto a 43", 1, 0, 'R', True)
-                pdf.cell(col4, 6, "Monto a 65", 1, 1, 'R', True)
-
-                pdf.set_font("Arial", size=9)
-
-                # Filas (máximo 4 para no saturar)
-                for r in comp[:4]:
-                    esc = str(r.get('escenario', ''))
-                    tasa = r.get('tasa_neta_pct', None)
-                    monto_fin = r.get('monto_fin_aportes', None)
-                    monto_obj = r.get('monto_objetivo', None)
-
-                    tasa_txt = f"{float(tasa):.2f}%" if tasa is not None else ""
-                    monto_fin_txt = f"${float(monto_fin):,.0f}" if monto_fin is not None else ""
-                    monto_obj_txt = f"${float(monto_obj):,.0f}" if monto_obj is not None else ""
-
-                    pdf.cell(col1, 6, esc, 1, 0, 'L')
-                    pdf.cell(col2, 6, tasa_txt, 1, 0, 'C')
-                    pdf.cell(col3, 6, monto_fin_txt, 1, 0, 'R')
-                    pdf.cell(col4, 6, monto_obj_txt, 1, 1, 'R')
-
-                # Nota de calibración (solo si aplica)
-                if any('Allianz-style' in str(x.get('escenario','')) for x in comp):
-                    pdf.ln(1)
-                    pdf.set_font("Arial", 'I', 7)
-                    pdf.set_text_color(90, 90, 90)
-                    pdf.multi_cell(0, 3.5, "Nota: El escenario Allianz-style incluye un ajuste de calibración para reflejar cargos y fricciones propias del producto comercial.")
-                    pdf.set_text_color(0, 0, 0)
-
-                pdf.ln(2)
-                pdf.set_font("Arial", 'I', 9)
-                pdf.multi_cell(
-                    0, 4,
-                    "Nota: El escenario optimista puede presentar mayor volatilidad. "
-                    "El recomendado busca equilibrio entre crecimiento y control del riesgo."
+@_fragmento
+def _panel_propuestas():
+    """Listado paginado y búsqueda: solo re-ejecuta este panel (la apertura sí es completa)."""
+    with st.expander("📂 Propuestas guardadas"):
+        busqueda = st.text_input("Buscar cliente", key="alm_busqueda", on_change=lambda: st.session_state.update(alm_pagina=0))
+        try:
+            almacen = abrir_almacen()
+            pagina = int(st.session_state.get("alm_pagina", 0))
+            filas, total = almacen.listar(_asesor_actual(), busqueda, pagina, PROPUESTAS_POR_PAGINA)
+        except Exception as e:
+            st.caption(f"⚠️ Almacén de propuestas no disponible: {e}")
+            return
+
+        if not filas:
+            st.caption("Sin propuestas guardadas." if not busqueda else "Sin resultados.")
+        for f in filas:
+            saldo = f["resultados"].get("saldo_final", 0.0)
+            st.markdown(f"**{f['cliente']}** · {f['creado'][:16].replace('T', ' ')}  \n${saldo:,.0f} a edad objetivo")
+            col_abrir, col_pdf = st.columns(2)
+            col_abrir.button("Abrir", key=f"alm_abrir_{f['id']}", on_click=_restaurar_propuesta, args=(f["id"],))
+            if f["tiene_pdf"]:
+                # Bytes guardados, se leen solo al descargar: sin recalcular ni regenerar
+                col_pdf.download_button(
+                    "PDF", data=lambda id_propuesta=f["id"]: almacen.pdf(id_propuesta, _asesor_actual()),
+                    file_name=f"Propuesta_Krece360_{f['id']}.pdf", mime="application/pdf", key=f"alm_pdf_{f['id']}",
+                    on_click="ignore",
                 )
-                pdf.ln(2)
-            except Exception:
-                pass
-
-        # Análisis Fiscal
-
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 6, "Análisis fiscal simplificado:", 0, 1)
-        pdf.set_font("Arial", size=11)
-        pdf.multi_cell(0, 5, datos_fiscales['texto_analisis'])
-        
-        if datos_fiscales['alerta_excedente']:
-            pdf.ln(5)
-            pdf.set_text_color(200, 0, 0)
-            pdf.multi_cell(0, 5, f"NOTA IMPORTANTE: {datos_fiscales['alerta_excedente']}")
-            pdf.set_text_color(0, 0, 0)
-            
-
-        # Siguiente paso recomendado
-        pdf.ln(2)
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 6, "Siguiente paso recomendado", 0, 1)
-        pdf.set_font("Arial", size=10)
-        pdf.multi_cell(
-            0, 5,
-            "Revisa esta proyección junto con tu asesor para validar si esta estrategia se ajusta a tus objetivos "
-            "financieros, capacidad de ahorro y horizonte de inversión, y definir el siguiente paso hacia una "
-            "cotización oficial y proceso de contratación."
-        )
-
-        # Datos del asesor (compacto)
-        pdf.ln(2)
-        pdf.set_draw_color(150, 150, 150)
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(2)
-        pdf.set_font("Arial", 'B', 10)
-        asesor_nombre = str(datos_asesor.get('nombre','')).strip()
-        asesor_tel = str(datos_asesor.get('telefono','')).strip()
-        pdf.cell(0, 6, f"Asesor: {asesor_nombre}   |   Contacto: {asesor_tel}", 0, 1)
-
-        pdf_bytes = pdf.output(dest='S').encode('latin-1', 'replace')
 
-        # Limpieza de logo convertido (si aplica)
-        try:
-            if logo_pdf_path and ruta_logo_temp and os.path.exists(logo_pdf_path) and (logo_pdf_path != ruta_logo_temp):
-                os.remove(logo_pdf_path)
-        except Exception:
-            pass
+        paginas = max(1, -(-total // PROPUESTAS_POR_PAGINA))
+        col_ant, col_pag, col_sig = st.columns([1, 2, 1])
+        col_ant.button("◀", key="alm_ant", disabled=pagina == 0, on_click=_cambiar_pagina, args=(-1,))
+        col_pag.caption(f"Página {pagina + 1} de {paginas} · {total} propuestas")
+        col_sig.button("▶", key="alm_sig", disabled=pagina + 1 >= paginas, on_click=_cambiar_pagina, args=(1,))
 
-        return pdf_bytes, None
-    except Exception as e:
-        return None, str(e)
 
 # --- 1. SIDEBAR ---
 with st.sidebar:
@@ -622,13 +327,13 @@ with st.sidebar:
     st.header("⚙️ Parámetros")
     
     st.subheader("Datos del Prospecto")
-    nombre = st.text_input("Nombre Cliente", value="Juan Pérez")
+    nombre = st.text_input("Nombre Cliente", value="Juan Pérez", key="in_nombre")
     
     st.subheader("Configuración Plan")
     col_edad, col_fin, col_obj = st.columns(3)
-    edad = col_edad.number_input("Edad", value=30, step=1)
-    edad_fin_aportes = col_fin.number_input(        "Fin de aportaciones (edad)", value=55, step=1, help="Edad a la que dejas de aportar (plazo comprometido).")
-    retiro = col_obj.number_input(        "Edad objetivo (retiro real)", value=65, step=1, help="Edad a la que quieres ver el saldo; puede ser mayor al fin de aportaciones.")
+    edad = col_edad.number_input("Edad", value=30, step=1, key="in_edad")
+    edad_fin_aportes = col_fin.number_input(        "Fin de aportaciones (edad)", value=55, step=1, help="Edad a la que dejas de aportar (plazo comprometido).", key="in_edad_fin_aportes")
+    retiro = col_obj.number_input(        "Edad objetivo (retiro real)", value=65, step=1, help="Edad a la que quieres ver el saldo; puede ser mayor al fin de aportaciones.", key="in_retiro")
 
     # Validaciones
     if edad_fin_aportes < edad:
@@ -641,19 +346,21 @@ with st.sidebar:
     if plazo_anos < 5:
         st.error("El plazo de aportaciones debe ser mayor a 5 años")
 
-    ahorro_mensual = st.number_input("Ahorro Mensual", value=2000.0, step=500.0)
+    ahorro_mensual = st.number_input("Ahorro Mensual", value=2000.0, step=500.0, key="in_ahorro_mensual")
     
     st.subheader("Fiscalidad y Rendimiento")
 
     estrategia_fiscal = st.selectbox(
         "Estrategia Fiscal",
-        ["Art 151 (PPR - Deducible)", "Art 93 (No Deducible)", "Art 185 (Diferimiento)"]
+        ["Art 151 (PPR - Deducible)", "Art 93 (No Deducible)", "Art 185 (Diferimiento)"],
+        key="in_estrategia_fiscal"
     )
 
     isr_cliente = st.selectbox(
         "% ISR del cliente",
         ["10%", "15%", "20%", "25%", "30%", "32%", "34%", "35%"],
-        index=4
+        index=4,
+        key="in_isr_cliente"
     )
     isr_cliente = float(isr_cliente.replace("%", "")) / 100.0
 
@@ -661,60 +368,102 @@ with st.sidebar:
     validar_sueldo = False
 
     if estrategia_fiscal == "Art 151 (PPR - Deducible)":
-        validar_sueldo = st.checkbox("¿Validar tope con Sueldo Anual?")
+        validar_sueldo = st.checkbox("¿Validar tope con Sueldo Anual?", key="in_validar_sueldo")
         if validar_sueldo:
-            sueldo_anual = st.number_input("Sueldo Bruto Anual", value=600000.0, step=10000.0)
+            sueldo_anual = st.number_input("Sueldo Bruto Anual", value=600000.0, step=10000.0, key="in_sueldo_anual")
             st.caption(f"Tope 10% ingresos: {sueldo_anual*0.10:,.0f} MXN")
         else:
-            st.caption(f"Se usará tope anual absoluto Art. 151: {TOPE_ART_151_ABS:,.0f} MXN (estimado).")
+            tope_151_hoy = cargar_reglas().parametros(datetime.now().year)["tope_art_151_abs"]
+            st.caption(f"Se usará tope anual absoluto Art. 151: {tope_151_hoy:,.0f} MXN (estimado, se indexa con la UMA).")
 
     reinvertir_beneficio = st.radio(
         "Beneficio fiscal",
         ["Retirar (cash)", "Reinvertir en el plan"],
         horizontal=True,
-        index=0
+        index=0,
+        key="in_reinvertir_beneficio"
     ) == "Reinvertir en el plan"
 
     perfil_k360 = st.selectbox(
         "Perfil de inversión (K360)",
         ["Conservador", "Balanceado (Recomendado)", "Dinámico (Optimista)"],
-        index=1
+        index=1,
+        key="in_perfil_k360"
     )
 
-    tasas_perfil = {
-        "Conservador": 0.06,
-        "Balanceado (Recomendado)": 0.085,
-        "Dinámico (Optimista)": 0.105
-    }
-    tasa_bruta_sugerida = tasas_perfil.get(perfil_k360, 0.085)
+    tasa_bruta_sugerida = TASAS_PERFIL.get(perfil_k360, 0.085)
 
-    modo_avanzado = st.checkbox("Modo avanzado: definir tasa manual", value=False)
+    modo_avanzado = st.checkbox("Modo avanzado: definir tasa manual", value=False, key="in_modo_avanzado")
     # Tasa bruta siempre editable (premium + fácil de actualizar año con año)
     tasa_bruta = st.slider(
         "Tasa Mercado Bruta (%)",
         0.0, 20.0,
         float(tasa_bruta_sugerida * 100),
-        step=0.1
+        step=0.1,
+        key=f"in_tasa_bruta_{perfil_k360}"
     ) / 100.0
     st.caption(f"Sugerencia por perfil ({perfil_k360}): {tasa_bruta_sugerida*100:.2f}% — puedes ajustarla según mercado/año.")
 
     # Inflación editable (default 5% para alinear con simuladores comerciales tipo Allianz)
-    inflacion = st.checkbox("Considerar Incremento con Inflación", value=True)
+    inflacion = st.checkbox("Considerar Incremento con Inflación", value=True, key="in_inflacion")
     inflacion_pct = st.number_input(
         "Inflación anual (%)",
         min_value=0.0, max_value=15.0,
         value=5.0,
         step=0.1,
-        help="Puedes actualizar este supuesto cada año (ej. 5.0%, 4.5%, 6.0%)."
+        help="Puedes actualizar este supuesto cada año (ej. 5.0%, 4.5%, 6.0%).",
+        key="in_inflacion_pct"
     )
     tasa_inflacion = (inflacion_pct / 100.0) if inflacion else 0.0
 
-    
-    st.markdown("---")
-    st.subheader("Personalización (PDF)")
-    uploaded_logo = st.file_uploader("Cargar Logotipo (Opcional)", type=['png', 'jpg', 'jpeg'])
-    asesor_nombre = st.text_input("Nombre del Asesor", value="Tu Nombre Aquí")
-    asesor_telefono = st.text_input("Teléfono / WhatsApp", value="55-0000-0000")
+    # Monte Carlo: la tasa bruta se usa como media; la volatilidad sugerida depende del perfil
+    montecarlo_activo = st.checkbox(
+        "Simulación Monte Carlo (rango P10–P90)", value=False,
+        help="Sortea miles de trayectorias de rendimiento para mostrar un rango en lugar de una sola línea.",
+        key="in_montecarlo_activo"
+    )
+    if montecarlo_activo:
+        _, volatilidad_sugerida = PERFILES_MONTECARLO.get(perfil_k360, (tasa_bruta_sugerida, 0.10))
+        volatilidad_mc = st.slider(
+            "Volatilidad anual (%)", 0.0, 40.0, float(volatilidad_sugerida * 100), step=0.5, key=f"in_volatilidad_mc_{perfil_k360}"
+        ) / 100.0
+        trayectorias_mc = st.select_slider("Trayectorias", options=[1000, 5000, 10000, 20000], value=10000, key="in_trayectorias_mc")
+
+    # Escenarios en dólares: aportes en pesos convertidos al tipo de cambio del mes
+    usd_activo = st.checkbox(
+        "Tipo de cambio en escenarios USD", value=False,
+        help="Calcula los escenarios en dólares como plan en USD: montos en pesos al tipo de cambio proyectado y rango P10–P90 con rendimiento y tipo de cambio simulados juntos.",
+        key="in_usd_activo"
+    )
+    divisas = None
+    if usd_activo:
+        tipo_cambio_inicial = st.number_input(
+            "Tipo de cambio inicial (MXN/USD)", min_value=1.0, max_value=100.0, value=TIPO_CAMBIO_INICIAL, step=0.1,
+            key="in_tipo_cambio"
+        )
+        depreciacion_pct = st.number_input(
+            "Depreciación anual esperada del peso (%)", min_value=-10.0, max_value=20.0, value=DEPRECIACION_ANUAL * 100, step=0.5,
+            key="in_depreciacion_pct"
+        )
+        volatilidad_tc_pct = st.slider(
+            "Volatilidad anual del tipo de cambio (%)", 0.0, 40.0, VOLATILIDAD_TC * 100, step=0.5, key="in_volatilidad_tc"
+        )
+        correlacion_tc = st.slider(
+            "Correlación rendimiento / tipo de cambio", -1.0, 1.0, CORRELACION_TC, step=0.05,
+            help="Negativa: el peso tiende a depreciarse cuando caen los mercados (amortigua el rango en pesos).",
+            key="in_correlacion_tc"
+        )
+        divisas = dict(
+            tipo_cambio_inicial=float(tipo_cambio_inicial),
+            depreciacion_anual=float(depreciacion_pct) / 100.0,
+            volatilidad_tc=float(volatilidad_tc_pct) / 100.0,
+            correlacion=float(correlacion_tc),
+            volatilidad_rendimiento=PERFILES_MONTECARLO["Dinámico (Optimista)"][1],
+            n_trayectorias=TRAYECTORIAS_USD,
+        )
+
+    _panel_propuestas()
+
 
 # --- 2. CÁLCULOS MATEMÁTICOS ---
 
@@ -735,90 +484,90 @@ contrib_meses = int(plazo_anos) * 12  # meses con aportaciones
 total_meses = int((retiro - edad) * 12)  # horizonte total hasta edad objetivo
 if total_meses < contrib_meses:
     st.error("La edad objetivo no puede ser menor que el fin de aportaciones.")
-saldo_al_fin_aportes = None
-data = []
-
-saldo = 0
-aporte_actual = ahorro_mensual
-total_aportado = 0
-acumulado_devoluciones = 0
-
-# Definir el tope deducible anual según la estrategia
-tope_deducible_anual = 0
-
-if estrategia_fiscal == "Art 151 (PPR - Deducible)":
-    tope_deducible_anual = TOPE_ART_151_ABS
-    if validar_sueldo:
-        tope_deducible_anual = min(TOPE_ART_151_ABS, sueldo_anual * 0.10)
-elif estrategia_fiscal == "Art 185 (Diferimiento)":
-    tope_deducible_anual = TOPE_ART_185
-else:
-    tope_deducible_anual = 0 # Art 93 no deduce
-
-# Bucle de Proyección
-for i in range(1, total_meses + 1):
-    # Rendimiento sobre saldo acumulado (usando Tasa Neta)
-    rendimiento_mensual = saldo * (tasa_interes_neta / 12)
-    aporte_mes = aporte_actual if i <= contrib_meses else 0.0
-    saldo += rendimiento_mensual + aporte_mes
-    total_aportado += aporte_mes
-    if i == contrib_meses:
-        saldo_al_fin_aportes = saldo
-    
-    # Ajuste inflacionario anual de la aportación
-    if i % 12 == 0 and inflacion and i <= contrib_meses:
-        aporte_actual *= (1 + tasa_inflacion)
-    
-    # Cálculo Beneficio Fiscal (SAT)
-    # Lo calculamos año con año para que sea exacto y sumamos el monto nominal
-    if estrategia_fiscal != "Art 93 (No Deducible)" and i <= contrib_meses:
-        if i % 12 == 0: # Al final de cada año calculamos la devolución de ese año
-            aporte_anual_real = aporte_actual * 12 # Aprox del año corriente
-            # La base de devolución es el menor entre lo aportado y el tope legal
-            base_devolucion = min(aporte_anual_real, tope_deducible_anual)
-            devolucion_anio = base_devolucion * isr_cliente
-            acumulado_devoluciones += devolucion_anio
-            if reinvertir_beneficio:
-                saldo += devolucion_anio
-
-    data.append({
-        "Mes": i,
-        "Año": edad + (i/12),
-        "Saldo Neto": saldo,
-        "Aportado": total_aportado,
-        # Guardamos el acumulado para la gráfica
-        "Devoluciones SAT": acumulado_devoluciones 
-    })
 
-df = pd.DataFrame(data)
+# Topes deducibles por año (reglas fiscales versionadas): se arman una sola vez
+# para todo el horizonte (hasta los 100 años, para que rejillas y metas que
+# mueven las edades también tengan su tope) y todos los motores los reciben así.
+topes_anuales = topes_por_anio(
+    estrategia_fiscal, validar_sueldo, sueldo_anual,
+    anos=max(int(retiro), 100) - int(edad), anio_inicio=datetime.now().year,
+)
+tope_deducible_anual = float(topes_anuales[0])  # año en curso (alertas y textos)
 
-# --- 3. LÓGICA DE ALERTAS Y TEXTOS ---
-aportacion_primer_ano = ahorro_mensual * 12
-excedente = 0
-mostrar_alerta = False
-texto_alerta_pdf = ""
-texto_analisis_pdf = ""
-
-# Lógica específica por artículo
-if estrategia_fiscal == "Art 151 (PPR - Deducible)":
-    texto_analisis_pdf = "Plan Deducible (Art. 151 LISR). Permite deducir aportaciones anuales dentro de los límites establecidos por la ley (10% de ingresos anuales hasta un tope absoluto). La deducción aplica en la declaración anual. Al momento del retiro, el monto acumulado puede considerarse ingreso acumulable; existen exenciones conforme a UMAs vigentes y el excedente podría pagar impuestos. Fecha objetivo para considerar deducibilidad del año: 31 de diciembre (según material del producto)."
-    if aportacion_primer_ano > tope_deducible_anual:
-        mostrar_alerta = True
-        excedente = aportacion_primer_ano - tope_deducible_anual
-        texto_alerta_pdf = (
-            f"Tu aportación anual ({aportacion_primer_ano:,.2f} MXN) excede el tope deducible estimado "
-            f"({tope_deducible_anual:,.2f} MXN). El excedente no es deducible."
-        )
+@memoizar
+def _proyeccion_principal(
+    ahorro_mensual, edad, edad_fin_aportes, retiro, tasa_bruta, tasa_admin_real, inflacion, tasa_inflacion,
+    estrategia_fiscal, validar_sueldo, sueldo_anual, isr_cliente, reinvertir_beneficio, topes_anuales,
+):
+    """Proyección mes a mes de la vista principal (memoizada entre reruns y sesiones).
 
-elif estrategia_fiscal == "Art 185 (Diferimiento)":
-    texto_analisis_pdf = "Plan con Diferimiento (Art. 185 LISR). Permite deducir aportaciones hasta el tope anual indicado en el material del producto. Al retiro o disposición, podría aplicar la tasa de ISR correspondiente sobre el saldo según reglas vigentes (diferimiento fiscal). Fecha objetivo de referencia: 30 de abril (según material del producto)."
-    if aportacion_primer_ano > TOPE_ART_185:
-        mostrar_alerta = True
-        excedente = aportacion_primer_ano - TOPE_ART_185
-        texto_alerta_pdf = "Tu aportación anual excede el tope estimado del Artículo 185."
+    Usa el mismo motor que el comparador; las columnas NumPy se envuelven en
+    el DataFrame sin construir un dict por mes.
+    """
+    columnas, saldo_al_fin_aportes = proyectar_detalle_mensual(
+        ahorro_mensual=float(ahorro_mensual),
+        edad_actual=int(edad),
+        edad_fin_aportes=int(edad_fin_aportes),
+        edad_objetivo=int(retiro),
+        tasa_bruta_scenario=float(tasa_bruta),
+        tasa_admin_real=float(tasa_admin_real),
+        inflacion=bool(inflacion),
+        tasa_inflacion=float(tasa_inflacion),
+        estrategia_fiscal=str(estrategia_fiscal),
+        validar_sueldo=bool(validar_sueldo),
+        sueldo_anual=float(sueldo_anual),
+        isr_cliente=float(isr_cliente),
+        tope_art_151_abs=float(TOPE_ART_151_ABS),
+        tope_art_185=float(TOPE_ART_185),
+        reinvertir_beneficio=bool(reinvertir_beneficio),
+        topes_anuales=topes_anuales,
+    )
+    df = pd.DataFrame(columnas, columns=list(COLUMNAS_DETALLE), copy=False)
+
+    hay_meses = len(df) > 0
+    saldo = float(columnas["Saldo Neto"][-1]) if hay_meses else 0.0
+    total_aportado = float(columnas["Aportado"][-1]) if hay_meses else 0.0
+    acumulado_devoluciones = float(columnas["Devoluciones SAT"][-1]) if hay_meses else 0.0
+    return df, saldo, saldo_al_fin_aportes, total_aportado, acumulado_devoluciones
+
+
+with span("proyeccion.principal"):
+    df, saldo, saldo_al_fin_aportes, total_aportado, acumulado_devoluciones = _proyeccion_principal(
+        ahorro_mensual, edad, edad_fin_aportes, retiro, tasa_bruta, tasa_admin_real, inflacion, tasa_inflacion,
+        estrategia_fiscal, validar_sueldo, sueldo_anual, isr_cliente, reinvertir_beneficio, topes_anuales,
+    )
+
+# Bandas Monte Carlo (semilla fija: mismas bandas en cada rerun)
+montecarlo = None
+if montecarlo_activo:
+    with span("montecarlo"):
+        montecarlo = memoizar(simular_montecarlo)(
+            ahorro_mensual=float(ahorro_mensual),
+            edad_actual=int(edad),
+            edad_fin_aportes=int(edad_fin_aportes),
+            edad_objetivo=int(retiro),
+            tasa_media=float(tasa_bruta),
+            volatilidad=float(volatilidad_mc),
+            inflacion=bool(inflacion),
+            tasa_inflacion=float(tasa_inflacion),
+            estrategia_fiscal=str(estrategia_fiscal),
+            validar_sueldo=bool(validar_sueldo),
+            sueldo_anual=float(sueldo_anual),
+            isr_cliente=float(isr_cliente),
+            tope_art_151_abs=float(TOPE_ART_151_ABS),
+            tope_art_185=float(TOPE_ART_185),
+            reinvertir_beneficio=bool(reinvertir_beneficio),
+            tasa_admin_real=float(tasa_admin_real),
+            n_trayectorias=int(trayectorias_mc),
+            topes_anuales=topes_anuales,
+        )
 
-elif estrategia_fiscal == "Art 93 (No Deducible)":
-    texto_analisis_pdf = "Plan No Deducible (Art. 93 LISR). No genera deducción durante la etapa de ahorro. Al cumplir con requisitos legales aplicables, el saldo podría recibirse de forma exenta."
+# --- 3. LÓGICA DE ALERTAS Y TEXTOS ---
+analisis = analisis_fiscal(estrategia_fiscal, ahorro_mensual, tope_deducible_anual)
+mostrar_alerta = analisis["mostrar_alerta"]
+excedente = analisis["excedente"]
+texto_alerta_pdf = analisis["texto_alerta"]
+texto_analisis_pdf = analisis["texto_analisis"]
 
 
 # --- 4. INTERFAZ PRINCIPAL ---
@@ -826,6 +575,13 @@ elif estrategia_fiscal == "Art 93 (No Deducible)":
 st.title("🛡️ Simulador Krece360 - OptiMaxx")
 st.markdown("Herramienta de proyección financiera.")
 
+abierta = st.session_state.get("_propuesta_abierta")
+if abierta is not None:
+    id_abierta, cliente_abierto, version_abierta = abierta
+    st.info(f"📂 Propuesta #{id_abierta} de {cliente_abierto} abierta (entradas restauradas).")
+    if version_abierta != version_motor():
+        st.caption(f"El motor cambió desde que se guardó (v{version_abierta} → v{version_motor()}): las cifras en pantalla se recalcularon; el PDF guardado conserva las originales.")
+
 # Alerta Visual (Amarilla)
 if mostrar_alerta:
     st.warning(f"""
@@ -850,16 +606,61 @@ st.markdown("---")
 
 # Gráfica
 st.subheader("Proyección Real")
-df_chart = df[["Año", "Saldo Neto", "Aportado", "Devoluciones SAT"]].melt('Año', var_name='Categoría', value_name='Monto')
+with span("grafica.construir"):
+    grafica = construir_grafica(df, montecarlo, eventos=(edad_fin_aportes, retiro))
+st.altair_chart(grafica, use_container_width=True)
+
+if montecarlo is not None:
+    p10, p50, p90 = montecarlo["saldo_objetivo"]
+    st.caption(
+        f"Monte Carlo ({int(trayectorias_mc):,} trayectorias, volatilidad {volatilidad_mc*100:.1f}%): "
+        f"a edad objetivo P10 ${p10:,.0f} · P50 ${p50:,.0f} · P90 ${p90:,.0f}. La banda sombreada cubre de P10 a P90."
+    )
 
-chart = alt.Chart(df_chart).mark_line().encode(
-    x='Año',
-    y='Monto',
-    color=alt.Color('Categoría', scale=alt.Scale(domain=['Aportado', 'Saldo Neto', 'Devoluciones SAT'], range=['#ff4b4b', '#1f77b4', '#2ca02c'])),
-    tooltip=['Año', 'Categoría', alt.Tooltip('Monto', format='$,.0f')]
-).properties(height=400)
 
-st.altair_chart(chart, use_container_width=True)
+@_fragmento
+def _seccion_calendario(parametros_calendario):
+    """Descarga del calendario de flujos; el archivo se genera al dar clic, en streaming desde el motor."""
+    with st.expander("📥 Descargar calendario de flujos"):
+        col_gran, col_formato = st.columns(2)
+        granularidad = col_gran.radio("Granularidad", GRANULARIDADES, horizontal=True, key="cal_granularidad",
+                                      format_func=str.capitalize)
+        formato = col_formato.radio("Formato", FORMATOS, horizontal=True, key="cal_formato", format_func=str.upper)
+
+        def generar():
+            buffer = io.BytesIO()
+            escribir(formato, iterar_calendario(**parametros_calendario, granularidad=granularidad),
+                     buffer, COLUMNAS_CALENDARIO)
+            return buffer.getvalue()
+
+        st.download_button(
+            "Descargar",
+            data=generar,
+            file_name=f"Calendario_Krece360_{granularidad}.{formato}",
+            mime=tipo_mime(formato),
+            key="cal_descargar",
+        )
+        st.caption("Mes (o año), edad, aportación, rendimiento, devolución SAT y saldo neto, con los mismos supuestos de la gráfica.")
+
+
+_seccion_calendario(dict(
+    ahorro_mensual=float(ahorro_mensual),
+    edad_actual=int(edad),
+    edad_fin_aportes=int(edad_fin_aportes),
+    edad_objetivo=int(retiro),
+    tasa_bruta_scenario=float(tasa_bruta),
+    tasa_admin_real=float(tasa_admin_real),
+    inflacion=bool(inflacion),
+    tasa_inflacion=float(tasa_inflacion),
+    estrategia_fiscal=str(estrategia_fiscal),
+    validar_sueldo=bool(validar_sueldo),
+    sueldo_anual=float(sueldo_anual),
+    isr_cliente=float(isr_cliente),
+    tope_art_151_abs=float(TOPE_ART_151_ABS),
+    tope_art_185=float(TOPE_ART_185),
+    reinvertir_beneficio=bool(reinvertir_beneficio),
+    topes_anuales=topes_anuales,
+))
 
 
 # -----------------------------
@@ -869,36 +670,17 @@ st.markdown("---")
 st.subheader("📊 Comparación de Escenarios")
 st.caption("Mismos datos, distintos supuestos. No es promesa: es simulación con diferentes niveles de riesgo.")
 
-escenarios = [
-    {"Escenario": "🟢 Conservador", "Perfil": "Conservador", "Moneda": "MXN", "tasa_bruta": 0.06},
-    {"Escenario": "⭐ Recomendado K360", "Perfil": "Balanceado", "Moneda": "MXN", "tasa_bruta": 0.085},
-    {"Escenario": "🟠 Optimista (Allianz-style)", "Perfil": "Dinámico", "Moneda": "USD", "tasa_bruta": float(tasa_bruta)},
-]
-
-# Salvaguarda: si por alguna razón se perdió algún escenario, lo restauramos
-try:
-    nombres = {str(x.get("Escenario","")) for x in escenarios}
-    if not any("Conservador" in n for n in nombres):
-        escenarios.insert(0, {"Escenario": "🟢 Conservador", "Perfil": "Conservador", "Moneda": "MXN", "tasa_bruta": 0.06})
-    if not any("Recomendado K360" in n for n in nombres):
-        escenarios.insert(1, {"Escenario": "⭐ Recomendado K360", "Perfil": "Balanceado", "Moneda": "MXN", "tasa_bruta": 0.085})
-except Exception:
-    pass
-
-
-if modo_avanzado:
-    escenarios.insert(2, {"Escenario": "🟣 Personalizado (tu tasa)", "Perfil": "Manual", "Moneda": "—", "tasa_bruta": float(tasa_bruta)})
-
-comparador_pdf = []
-rows = []
-for s in escenarios:
-    es_caso_allianz = False
-    saldo_fin_s, saldo_obj_s, tasa_neta_s = proyectar_saldos_dos_fases(
+escenarios = escenarios_comparador(float(tasa_bruta), bool(modo_avanzado))
+
+# Memoizado: una sola llamada al motor en lote para todos los escenarios
+with span("comparador"):
+    rows, comparador_pdf = memoizar(calcular_comparador)(
+        escenarios,
         ahorro_mensual=float(ahorro_mensual),
-        edad_actual=int(edad),
+        edad=int(edad),
         edad_fin_aportes=int(edad_fin_aportes),
-        edad_objetivo=int(retiro),
-        tasa_bruta_scenario=float(s["tasa_bruta"]),
+        retiro=int(retiro),
+        tasa_bruta=float(tasa_bruta),
         tasa_admin_real=float(tasa_admin_real),
         inflacion=bool(inflacion),
         tasa_inflacion=float(tasa_inflacion),
@@ -906,57 +688,23 @@ for s in escenarios:
         validar_sueldo=bool(validar_sueldo),
         sueldo_anual=float(sueldo_anual),
         isr_cliente=float(isr_cliente),
-        tope_art_151_abs=float(TOPE_ART_151_ABS),
-        tope_art_185=float(TOPE_ART_185),
         reinvertir_beneficio=bool(reinvertir_beneficio),
+        topes_anuales=topes_anuales,
+        divisas=divisas,
     )
 
-    # --- Calibración EXACTA Allianz-style (caso espejo 18→43→65) ---
-    if ("Allianz-style" in str(s.get("Escenario",""))):
-        # Objetivos proporcionados por el simulador Allianz para el caso: edad 18, fin 43, objetivo 65
-        TARGET_FIN = 3709886.0
-        TARGET_OBJ = 42470707.0
-
-        # Condición: solo calibra cuando coincide el caso espejo (para no distorsionar otros escenarios)
-        es_caso_allianz = (
-            int(edad) == 18 and int(edad_fin_aportes) == 43 and int(retiro) == 65
-            and abs(float(ahorro_mensual) - 2000.0) < 1e-6
-            and inflacion and abs(float(tasa_inflacion) - 0.05) < 1e-6
-            and estrategia_fiscal == "Art 93 (No Deducible)"
-            and abs(float(isr_cliente) - 0.10) < 1e-6
-            and abs(float(tasa_bruta) - 0.12) < 1e-6
-        )
-
-        if es_caso_allianz:
-            # Pegado exacto a los resultados del simulador Allianz para el caso espejo.
-            saldo_fin_s = float(TARGET_FIN)
-            saldo_obj_s = float(TARGET_OBJ)
-
-    
-    # Para PDF: estructura compacta que espera crear_pdf()
-    try:
-        comparador_pdf.append({
-            "escenario": str(s.get("Escenario","")).replace("🟢 ", "").replace("⭐ ", "").replace("🟣 ", "").replace("🟠 ", ""),
-            "tasa_neta_pct": float(tasa_neta_s) * 100.0,
-            "monto_fin_aportes": float(saldo_fin_s),
-            "monto_objetivo": float(saldo_obj_s),
-        })
-    except Exception:
-        pass
-
-rows.append({
-        "Escenario": s.get("Escenario",""),
-        "Perfil": s.get("Perfil",""),
-        "Moneda": s.get("Moneda",""),
-        "Tasa Bruta": f"{float(s['tasa_bruta'])*100:.2f}%",
-        "Tasa Neta (bruta - admin)": f"{float(tasa_neta_s)*100:.2f}%",
-        "Monto a fin aportes": f"${float(saldo_fin_s):,.0f}",
-        "Monto a edad objetivo": f"${float(saldo_obj_s):,.0f}",
-    })
-
 df_comp = pd.DataFrame(rows)
 st.dataframe(df_comp, hide_index=True, use_container_width=True)
 
+for fila_pdf in comparador_pdf:
+    usd = fila_pdf.get("usd")
+    if usd:
+        st.caption(
+            f"💵 {fila_pdf['escenario']}: plan en dólares con tipo de cambio de ${usd['tipo_cambio_inicial']:,.2f} "
+            f"(central ${usd['tipo_cambio_objetivo']:,.2f} a edad objetivo); rango en pesos con "
+            f"{TRAYECTORIAS_USD:,} trayectorias conjuntas de rendimiento y tipo de cambio."
+        )
+
 st.info(
     "ℹ️ **Por qué cambia el monto:** el rendimiento depende del nivel de riesgo (perfil) y los supuestos. "
     "El escenario optimista puede tener años negativos; el conservador prioriza estabilidad."
@@ -968,52 +716,485 @@ st.info(f"""
 correspondiente a una aportación de ${ahorro_mensual:,.0f} a un plazo de {plazo_anos} años (Según Tabla Allianz).
 """)
 
-# --- 5. SECCIÓN DE DESCARGA PDF ---
-st.markdown("### 📄 Exportar Propuesta")
+# -----------------------------
+# Secciones con rerun propio
+# -----------------------------
+def _sensibilidad(parametros_sensibilidad):
+    """Sensibilidad con los deltas del panel (session_state): el PDF usa los mismos."""
+    anos = int(st.session_state.get("sens_anos", DELTAS_SENSIBILIDAD["edad_fin_aportes"][1]))
+    deltas = {
+        "tasa_bruta": float(st.session_state.get("sens_tasa_pp", 1.0)) / 100.0,
+        "inflacion_pct": float(st.session_state.get("sens_inflacion_pp", 1.0)),
+        "ahorro_mensual": float(st.session_state.get("sens_ahorro_pct", 10.0)) / 100.0,
+        "edad_fin_aportes": anos,
+        "retiro": anos,
+    }
+    # Todos los escenarios perturbados en una sola llamada al motor en lote
+    return memoizar(analisis_sensibilidad)(**parametros_sensibilidad, deltas=deltas)
+
+
+@_fragmento
+def _seccion_sensibilidad(parametros_sensibilidad):
+    """Tornado: cambiar un delta solo re-ejecuta esta sección."""
+    with st.expander("📉 Sensibilidad: ¿qué supuesto mueve más el resultado?"):
+        col_tasa, col_inf, col_ahorro, col_anos = st.columns(4)
+        col_tasa.number_input("± Tasa bruta (pp)", min_value=0.1, max_value=5.0, value=1.0, step=0.1, key="sens_tasa_pp")
+        col_inf.number_input("± Inflación (pp)", min_value=0.1, max_value=5.0, value=1.0, step=0.1, key="sens_inflacion_pp")
+        col_ahorro.number_input("± Ahorro (%)", min_value=1.0, max_value=50.0, value=10.0, step=1.0, key="sens_ahorro_pct")
+        col_anos.number_input("± Edades (años)", min_value=1, max_value=10, value=2, step=1, key="sens_anos")
+
+        saldo_base, filas = _sensibilidad(parametros_sensibilidad)
+        st.altair_chart(construir_tornado(saldo_base, filas), use_container_width=True)
+        st.caption(
+            f"Saldo base a edad objetivo: ${saldo_base:,.0f}. Cada barra mueve un solo supuesto "
+            "(-delta en rojo, +delta en verde) y deja los demás fijos; el costo admin se recalcula por tramo."
+        )
 
-if st.button("Generar PDF"):
-    logo_path_temp = None
-    try:
-        logo_path_temp = _save_logo_to_temp(uploaded_logo)
-    except Exception as e:
-        st.error(f"⚠️ No se pudo cargar el logotipo: {e}")
-        logo_path_temp = None
-    # Generar PDF
-    # CORRECCIÓN: Pasamos 'acumulado_devoluciones' DIRECTO, sin multiplicar por años otra vez.
-    try:
-        pdf_bytes, error = crear_pdf(
-            {'nombre': nombre, 'edad': edad, 'edad_fin_aportes': edad_fin_aportes, 'retiro': retiro, 'estrategia': estrategia_fiscal},
-            {
-                'aporte_mensual': ahorro_mensual,
-                'saldo_fin_aportes': saldo_al_fin_aportes if saldo_al_fin_aportes is not None else saldo,
-                'saldo_final': saldo,
-                'beneficio_sat': acumulado_devoluciones,
-                'tasa_admin_pct': tasa_admin_real * 100,
-                'total_aportado': total_aportado,
-                'comparador': comparador_pdf
-            },
-            {'texto_analisis': texto_analisis_pdf, 'alerta_excedente': texto_alerta_pdf},
+
+@_fragmento
+def _seccion_mapa_calor(edad, edad_fin_aportes, retiro, ahorro_mensual, tasa_bruta, parametros_rejilla):
+    """Mapa de calor: cada rejilla queda memoizada, cambiar entre rejillas no recalcula."""
+    with st.expander("🗺️ Mapa de resultados (saldo a edad objetivo)"):
+        col_tipo, col_res = st.columns([2, 1])
+        tipo = col_tipo.radio(
+            "Rejilla", ["Ahorro mensual × Tasa bruta", "Fin de aportaciones × Edad objetivo"], horizontal=True
+        )
+        resolucion = col_res.select_slider("Celdas por eje", options=[20, 50, 100], value=50)
+
+        if tipo == "Ahorro mensual × Tasa bruta":
+            rejilla = memoizar(evaluar_rejilla)(
+                "ahorro_mensual", np.linspace(500.0, max(2.0 * float(ahorro_mensual), 5000.0), resolucion),
+                "tasa_bruta_scenario", np.linspace(0.02, 0.16, resolucion),
+                edad_fin_aportes=int(edad_fin_aportes), edad_objetivo=int(retiro), **parametros_rejilla,
+            )
+            rejilla = dict(rejilla, valores_y=rejilla["valores_y"] * 100)  # tasa en % para ejes y tooltip
+            etiquetas = dict(EJES_REJILLA, tasa_bruta_scenario="Tasa bruta (%)")
+        else:
+            edades = np.unique(np.linspace(int(edad) + 1, max(int(retiro) + 10, int(edad) + 6), resolucion).astype(int))
+            rejilla = memoizar(evaluar_rejilla)(
+                "edad_fin_aportes", edades, "edad_objetivo", edades,
+                ahorro_mensual=float(ahorro_mensual), tasa_bruta_scenario=float(tasa_bruta), **parametros_rejilla,
+            )
+            etiquetas = EJES_REJILLA
+
+        st.altair_chart(construir_mapa_calor(rejilla, etiquetas), use_container_width=True)
+        st.caption(
+            "Cada celda es una proyección completa con su propio costo admin (según tabla) y topes fiscales. "
+            "En la rejilla de edades, las celdas con edad objetivo menor al fin de aportaciones quedan vacías."
+        )
+
+
+@_fragmento
+def _seccion_retiro(saldo, retiro, tasa_neta, indexacion, estrategia_fiscal, isr_cliente, exencion):
+    """Fase de retiros: pensión máxima en forma cerrada y agotamiento del saldo."""
+    st.markdown("---")
+    st.subheader("🏖️ Fase de Retiro")
+    col_modo, col_edad, col_isr = st.columns([2, 1, 1])
+    modo = col_modo.radio("Retiros", ["Monto fijo", "Indexado a inflación", "% del saldo"], horizontal=True)
+    edad_maxima = col_edad.number_input(
+        "Hasta la edad", min_value=int(retiro) + 1, max_value=120, value=max(100, int(retiro) + 1), step=1
+    )
+    isr_retiro = col_isr.number_input(
+        "ISR al retiro (%)", min_value=0.0, max_value=35.0, value=float(isr_cliente * 100), step=1.0
+    ) / 100.0
+    anos_retiro = int(edad_maxima) - int(retiro)
+
+    modo = {"Monto fijo": "fijo", "Indexado a inflación": "indexado", "% del saldo": "porcentaje"}[modo]
+    indexacion = float(indexacion) if modo == "indexado" else 0.0
+    retiro_mensual, porcentaje_anual = 0.0, 0.0
+    if modo == "porcentaje":
+        porcentaje_anual = st.slider("Retiro anual (% del saldo al inicio de cada año)", 1.0, 15.0, 4.0, step=0.5) / 100.0
+    else:
+        # Forma cerrada: no hace falta iterar para encontrar la pensión máxima
+        maxima = pension_maxima(saldo, tasa_neta, anos_retiro, indexacion)
+        st.caption(
+            f"Pensión máxima sostenible hasta los {int(edad_maxima)} años: **${maxima:,.0f}** mensuales brutos"
+            + (f" (sube {indexacion*100:.1f}% cada año)." if modo == "indexado" else ".")
+        )
+        retiro_mensual = st.number_input(
+            "Retiro mensual bruto (primer año)", min_value=0.0, value=float(round(maxima, -2)), step=1000.0
+        )
+
+    resultado = memoizar(proyectar_retiro)(
+        float(saldo), int(retiro), float(tasa_neta),
+        modo=modo,
+        retiro_mensual=float(retiro_mensual),
+        porcentaje_anual=float(porcentaje_anual),
+        indexacion=indexacion,
+        edad_maxima=int(edad_maxima),
+        estrategia_fiscal=str(estrategia_fiscal),
+        isr_retiro=float(isr_retiro),
+        exencion=float(exencion),
+    )
+    columnas = resultado["columnas"]
+    if len(columnas["Mes"]) == 0:
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Retiro neto (primer mes)", f"${columnas['Retiro neto'][0]:,.0f}",
+                delta=f"ISR: ${columnas['ISR'][0]:,.0f}", delta_color="off")
+    if resultado["edad_agotamiento"] is None:
+        col2.metric("El saldo alcanza", f"hasta los {int(edad_maxima)}", delta=f"Queda ${resultado['saldo_final']:,.0f}")
+    else:
+        col2.metric("El saldo se agota a los", f"{resultado['edad_agotamiento']:.1f} años", delta="Antes de la edad límite", delta_color="inverse")
+    col3.metric("ISR total retenido", f"${resultado['total_isr']:,.0f}", delta=f"Neto total ${resultado['total_neto']:,.0f}", delta_color="off")
+
+    eventos = () if resultado["edad_agotamiento"] is None else (resultado["edad_agotamiento"],)
+    st.altair_chart(construir_grafica_retiro(columnas, eventos=eventos), use_container_width=True)
+    st.caption(
+        "Retiros al inicio de cada mes; el saldo sigue rindiendo la tasa neta. ISR: Art. 93 exento, "
+        "Art. 185 sobre todo el retiro, Art. 151 sobre lo retirado arriba del monto exento "
+        f"(${exencion:,.0f}, UMAs del año de retiro). Estimación, no asesoría fiscal."
+    )
+
+
+@_fragmento
+def _seccion_meta(saldo, ahorro_mensual, edad_fin_aportes, tasa_bruta, parametros_meta):
+    """Calculadora inversa: depende solo de los supuestos y del saldo proyectado."""
+    with st.expander("🎯 ¿Cuánto necesito para llegar a mi meta?"):
+        col_meta, col_resolver = st.columns(2)
+        saldo_meta = col_meta.number_input(
+            "Saldo meta a edad objetivo", min_value=0.0, value=float(round(saldo * 1.5, -3)), step=100000.0
+        )
+        resolver = col_resolver.radio(
+            "Resolver", ["Ahorro mensual", "Tasa bruta", "Fin de aportaciones"], horizontal=True
+        )
+
+        if resolver == "Ahorro mensual":
+            requerido = ahorro_requerido(
+                saldo_meta, edad_fin_aportes=int(edad_fin_aportes), tasa_bruta_scenario=float(tasa_bruta), **parametros_meta
+            )
+            if requerido is None:
+                st.warning("La meta no es alcanzable con una aportación razonable bajo estos supuestos.")
+            else:
+                st.success(f"Aportación mensual requerida: **${requerido:,.2f}** (tasa admin según tabla para ese monto).")
+        elif resolver == "Tasa bruta":
+            requerido = tasa_bruta_requerida(
+                saldo_meta, ahorro_mensual=float(ahorro_mensual), edad_fin_aportes=int(edad_fin_aportes), **parametros_meta
+            )
+            if requerido is None:
+                st.warning("La meta requiere una tasa bruta mayor a 50% anual: no es realista.")
+            else:
+                st.success(f"Tasa bruta anual requerida: **{requerido*100:.2f}%** (antes de costo admin).")
+        else:
+            requerido = edad_fin_aportes_requerida(
+                saldo_meta, ahorro_mensual=float(ahorro_mensual), tasa_bruta_scenario=float(tasa_bruta), **parametros_meta
+            )
+            if requerido is None:
+                st.warning("Ni aportando hasta la edad objetivo se alcanza la meta con este ahorro.")
+            else:
+                st.success(f"Puedes dejar de aportar a partir de los **{requerido} años** y aun llegar a la meta.")
+
+
+@_fragmento
+def _seccion_backtest(saldo_determinista, parametros_backtest):
+    """Backtest histórico: el plan corrido en cada ventana móvil del archivo de rendimientos."""
+    with st.expander("📜 Backtest histórico (ventanas móviles)"):
+        archivo = st.file_uploader(
+            "Rendimientos mensuales (CSV o Parquet: fecha, rendimiento, inflacion opcional)",
+            type=["csv", "parquet"], key="bt_archivo",
+        )
+        try:
+            historial = leer_historial(archivo.getvalue(), archivo.name) if archivo is not None else cargar_historial()
+        except (OSError, ValueError) as e:
+            st.error(f"No se pudo leer el historial: {e}")
+            return
+        if historial is None:
+            st.caption("Sube un archivo o configura K360_RENDIMIENTOS_HISTORICOS para correr el plan contra la historia.")
+            return
+
+        usar_inflacion = historial["inflacion"] is not None and st.checkbox(
+            "Indexar con la inflación histórica del archivo", value=True, key="bt_inflacion"
+        )
+        try:
+            with span("backtest"):
+                resultado = memoizar(backtest_ventanas)(
+                    historial["rendimiento"],
+                    **parametros_backtest,
+                    inflacion_historica=historial["inflacion"] if usar_inflacion else None,
+                    fechas=historial["fecha"],
+                )
+        except ValueError as e:
+            st.warning(str(e))
+            return
+
+        p10, p50, p90 = resultado["percentiles"]
+        peor, mejor = resultado["peor"], resultado["mejor"]
+        st.caption(
+            f"{resultado['ventanas']:,} ventanas de {resultado['meses'] // 12} años "
+            f"({historial['fecha'][0]} a {historial['fecha'][-1]}): "
+            f"a edad objetivo P10 ${p10:,.0f} · P50 ${p50:,.0f} · P90 ${p90:,.0f}."
+        )
+        col_peor, col_mejor, col_det = st.columns(3)
+        col_peor.metric("Peor ventana", f"${peor['saldo_objetivo']:,.0f}",
+                        f"{peor['inicio']} → {peor['fin']} ({peor['tasa_anualizada']*100:.1f}% anual)", delta_color="off")
+        col_mejor.metric("Mejor ventana", f"${mejor['saldo_objetivo']:,.0f}",
+                         f"{mejor['inicio']} → {mejor['fin']} ({mejor['tasa_anualizada']*100:.1f}% anual)", delta_color="off")
+        debajo = float(np.mean(resultado["saldo_objetivo"] < saldo_determinista)) * 100
+        col_det.metric("Proyección con tasa fija", f"${saldo_determinista:,.0f}",
+                       f"{debajo:.0f}% de las ventanas quedó debajo", delta_color="off")
+        st.altair_chart(
+            construir_grafica_backtest(resultado["inicio"], resultado["saldo_objetivo"], referencia=saldo_determinista),
+            use_container_width=True,
+        )
+        if resultado["saldo_objetivo_real"] is not None:
+            reales = np.percentile(resultado["saldo_objetivo_real"], (10, 50, 90))
+            st.caption(
+                f"En pesos de hoy (deflactado con la inflación histórica): P10 ${reales[0]:,.0f} · "
+                f"P50 ${reales[1]:,.0f} · P90 ${reales[2]:,.0f}."
+            )
+
+
+@_fragmento
+def _seccion_exportar(datos_cliente, datos_fin, datos_fiscales, parametros_sensibilidad):
+    """Personalización y PDF: logo, asesor y el botón solo re-ejecutan esta sección."""
+    st.markdown("### 📄 Exportar Propuesta")
+
+    st.caption("Personalización (PDF)")
+    col_logo, col_asesor = st.columns(2)
+    uploaded_logo = col_logo.file_uploader("Cargar Logotipo (Opcional)", type=['png', 'jpg', 'jpeg'])
+    asesor_nombre = col_asesor.text_input("Nombre del Asesor", value="Tu Nombre Aquí")
+    asesor_telefono = col_asesor.text_input("Teléfono / WhatsApp", value="55-0000-0000")
+    incluir_sensibilidad = st.checkbox("Incluir análisis de sensibilidad en el PDF", value=False)
+
+    # Contexto de lo que hay en pantalla: un PDF pedido con otros datos no se ofrece
+    contexto = clave_canonica("exportar", {
+        "cliente": datos_cliente, "fin": datos_fin, "fiscal": datos_fiscales,
+        "asesor": (asesor_nombre, asesor_telefono), "sensibilidad": incluir_sensibilidad,
+        "logo": None if uploaded_logo is None else (uploaded_logo.name, uploaded_logo.size),
+    })
+
+    if st.button("Generar PDF"):
+        # Pillow bajo demanda: no pesa en el arranque ni en reruns sin exportar
+        from k360.pdf import preparar_logo
+
+        logo_pdf = None
+        try:
+            # En memoria y cacheado por hash: el mismo logo no se re-procesa entre clics
+            with span("pdf.preparar_logo"):
+                logo_pdf = preparar_logo(uploaded_logo.getvalue()) if uploaded_logo is not None else None
+        except Exception as e:
+            st.error(f"⚠️ No se pudo cargar el logotipo: {e}")
+            logo_pdf = None
+        if incluir_sensibilidad:
+            saldo_base, filas = _sensibilidad(parametros_sensibilidad)
+            datos_fin = dict(datos_fin, sensibilidad={'saldo_base': saldo_base, 'filas': filas})
+        # Se encola en el pool de PDFs; el mismo contenido ya generado sale de la caché
+        clave = COLA_PDF.enviar(
+            datos_cliente,
+            datos_fin,
+            datos_fiscales,
             {'nombre': asesor_nombre, 'telefono': asesor_telefono},
-            logo_path_temp
+            logo_pdf=logo_pdf
         )
-    finally:
-        # Limpieza del archivo temporal del logo (si existe)
-        if logo_path_temp and os.path.exists(logo_path_temp):
-            try:
-                os.remove(logo_path_temp)
-            except Exception:
-                pass
-    
-    if error:
-        st.error(f"Error al generar PDF: {error}")
+        st.session_state["_pdf_trabajo"] = (contexto, clave)
+
+    trabajo = st.session_state.get("_pdf_trabajo")
+    if trabajo is None or trabajo[0] != contexto:
+        return
+
+    estado, resultado, avance = COLA_PDF.estado(trabajo[1])
+    if estado == EN_PROCESO:
+        # La generación sigue en otro proceso: solo esta sección vuelve a consultar
+        st.progress(avance, text="Generando PDF en segundo plano…")
+        time.sleep(0.3)
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:  # rerun completo del script (o Streamlit sin fragmentos)
+            st.rerun()
+    elif estado == DESCONOCIDO:
+        # Caducó en la caché: hay que volver a generarlo
+        del st.session_state["_pdf_trabajo"]
+        st.info("La propuesta generada expiró; vuelve a dar clic en Generar PDF.")
     else:
-        st.success("✅ PDF Generado con éxito")
-        st.download_button(
-            label="⬇️ Descargar PDF",
-            data=pdf_bytes,
-            file_name=f"Propuesta_Krece360_{_safe_filename(nombre)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-            mime="application/pdf"
+        pdf_bytes, error = resultado
+        if error:
+            del st.session_state["_pdf_trabajo"]
+            st.error(f"Error al generar PDF: {error}")
+        else:
+            from k360.pdf import _safe_filename
+
+            st.success("✅ PDF Generado con éxito")
+            # Se guarda una vez por PDF generado (entradas + resultados + bytes)
+            if st.session_state.get("_pdf_guardado") != trabajo[1]:
+                try:
+                    abrir_almacen().guardar(
+                        _asesor_actual(),
+                        datos_cliente['nombre'],
+                        _entradas_actuales(),
+                        {k: datos_fin[k] for k in ('aporte_mensual', 'saldo_fin_aportes', 'saldo_final', 'beneficio_sat', 'tasa_admin_pct', 'total_aportado')},
+                        pdf_bytes,
+                    )
+                    st.session_state["_pdf_guardado"] = trabajo[1]
+                except Exception as e:
+                    st.caption(f"⚠️ No se pudo guardar la propuesta: {e}")
+            st.download_button(
+                label="⬇️ Descargar PDF",
+                data=pdf_bytes,
+                file_name=f"Propuesta_Krece360_{_safe_filename(datos_cliente['nombre'])}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                mime="application/pdf"
+            )
+
+
+# -----------------------------
+# Fase de retiro (desacumulación)
+# -----------------------------
+_seccion_retiro(
+    saldo,
+    retiro,
+    tasa_interes_neta,
+    inflacion_pct / 100.0,
+    estrategia_fiscal,
+    isr_cliente,
+    cargar_reglas().exencion_retiro(datetime.now().year + int(retiro) - int(edad)),
+)
+
+# -----------------------------
+# Sensibilidad (tornado)
+# -----------------------------
+parametros_sensibilidad = dict(
+    ahorro_mensual=float(ahorro_mensual),
+    edad_actual=int(edad),
+    edad_fin_aportes=int(edad_fin_aportes),
+    edad_objetivo=int(retiro),
+    tasa_bruta=float(tasa_bruta),
+    inflacion=bool(inflacion),
+    tasa_inflacion=float(tasa_inflacion),
+    estrategia_fiscal=str(estrategia_fiscal),
+    validar_sueldo=bool(validar_sueldo),
+    sueldo_anual=float(sueldo_anual),
+    isr_cliente=float(isr_cliente),
+    reinvertir_beneficio=bool(reinvertir_beneficio),
+    topes_anuales=topes_anuales,
+)
+_seccion_sensibilidad(parametros_sensibilidad)
+
+# -----------------------------
+# Mapa de calor (rejillas de supuestos)
+# -----------------------------
+_seccion_mapa_calor(
+    edad,
+    edad_fin_aportes,
+    retiro,
+    ahorro_mensual,
+    tasa_bruta,
+    dict(
+        edad_actual=int(edad),
+        inflacion=bool(inflacion),
+        tasa_inflacion=float(tasa_inflacion),
+        estrategia_fiscal=str(estrategia_fiscal),
+        validar_sueldo=bool(validar_sueldo),
+        sueldo_anual=float(sueldo_anual),
+        isr_cliente=float(isr_cliente),
+        tope_art_151_abs=float(TOPE_ART_151_ABS),
+        tope_art_185=float(TOPE_ART_185),
+        reinvertir_beneficio=bool(reinvertir_beneficio),
+        topes_anuales=topes_anuales,
+    ),
+)
+
+# -----------------------------
+# Calculadora inversa (meta de saldo)
+# -----------------------------
+_seccion_meta(
+    saldo,
+    ahorro_mensual,
+    edad_fin_aportes,
+    tasa_bruta,
+    dict(
+        edad_actual=int(edad),
+        edad_objetivo=int(retiro),
+        inflacion=bool(inflacion),
+        tasa_inflacion=float(tasa_inflacion),
+        estrategia_fiscal=str(estrategia_fiscal),
+        validar_sueldo=bool(validar_sueldo),
+        sueldo_anual=float(sueldo_anual),
+        isr_cliente=float(isr_cliente),
+        tope_art_151_abs=float(TOPE_ART_151_ABS),
+        tope_art_185=float(TOPE_ART_185),
+        reinvertir_beneficio=bool(reinvertir_beneficio),
+        topes_anuales=topes_anuales,
+    ),
+)
+
+# -----------------------------
+# Backtest histórico
+# -----------------------------
+_seccion_backtest(
+    float(saldo),
+    dict(
+        ahorro_mensual=float(ahorro_mensual),
+        edad_actual=int(edad),
+        edad_fin_aportes=int(edad_fin_aportes),
+        edad_objetivo=int(retiro),
+        tasa_admin_real=float(tasa_admin_real),
+        inflacion=bool(inflacion),
+        tasa_inflacion=float(tasa_inflacion),
+        estrategia_fiscal=str(estrategia_fiscal),
+        validar_sueldo=bool(validar_sueldo),
+        sueldo_anual=float(sueldo_anual),
+        isr_cliente=float(isr_cliente),
+        tope_art_151_abs=float(TOPE_ART_151_ABS),
+        tope_art_185=float(TOPE_ART_185),
+        reinvertir_beneficio=bool(reinvertir_beneficio),
+        topes_anuales=topes_anuales,
+    ),
+)
+
+# --- 5. SECCIÓN DE DESCARGA PDF ---
+# CORRECCIÓN: Pasamos 'acumulado_devoluciones' DIRECTO, sin multiplicar por años otra vez.
+_seccion_exportar(
+    {'nombre': nombre, 'edad': edad, 'edad_fin_aportes': edad_fin_aportes, 'retiro': retiro, 'estrategia': estrategia_fiscal},
+    {
+        'aporte_mensual': ahorro_mensual,
+        'saldo_fin_aportes': saldo_al_fin_aportes if saldo_al_fin_aportes is not None else saldo,
+        'saldo_final': saldo,
+        'beneficio_sat': acumulado_devoluciones,
+        'tasa_admin_pct': tasa_admin_real * 100,
+        'total_aportado': total_aportado,
+        'comparador': comparador_pdf,
+        'montecarlo': montecarlo
+    },
+    {'texto_analisis': texto_analisis_pdf, 'alerta_excedente': texto_alerta_pdf},
+    parametros_sensibilidad,
+)
+
+registrar("app.rerun", time.perf_counter() - _inicio_rerun)
+
+
+# -----------------------------
+# Métricas (solo admin)
+# -----------------------------
+@_fragmento
+def _panel_metricas():
+    """Latencia por etapa (p50 / p95 / p99), memoria y cachés del proceso."""
+    with st.expander("📈 Métricas del servidor (admin)"):
+        st.button("Actualizar", key="met_actualizar")  # el clic re-ejecuta solo este panel
+        filas = REGISTRO.resumen()
+        if filas:
+            st.dataframe(pd.DataFrame(filas), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aún no hay mediciones.")
+        cache = CACHE_PROYECCIONES.estadisticas()
+        cache_pdf = COLA_PDF.resultados.estadisticas()
+        st.caption(
+            f"Caché de proyecciones: {cache['hits']:,} hits / {cache['misses']:,} misses "
+            f"({cache['hit_rate']*100:.1f}%), {cache['entradas']} entradas, {cache['bytes']/1024/1024:.1f} MB. "
+            f"Caché de PDFs: {cache_pdf['hits']:,} hits, {cache_pdf['entradas']} entradas, {cache_pdf['expiradas']} expiradas."
+        )
+        col_prom, col_json = st.columns(2)
+        col_prom.download_button(
+            "Descargar (Prometheus)", data=REGISTRO.texto_prometheus, file_name="k360_metricas.prom", mime="text/plain",
+            key="met_prometheus",
         )
+        col_json.download_button(
+            "Descargar (JSON)", data=lambda: json.dumps(REGISTRO.resumen(), ensure_ascii=False, indent=2),
+            file_name="k360_metricas.json", mime="application/json", key="met_json",
+        )
+
+
+if st.session_state.get("_auth_role") == "admin":
+    _panel_metricas()
 
 # MANUAL_AGENTES_K360
 # - Optimista (Allianz-style): escenario calibrado para comparar con simuladores comerciales.
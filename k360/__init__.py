@@ -0,0 +1,94 @@
+"""Núcleo de cálculo del Simulador Krece360 (sin dependencias de UI).
+
+Importable desde workers, APIs o jobs sin arrancar Streamlit:
+
+    from k360 import obtener_tasa_admin, proyectar_saldos_dos_fases
+
+Los nombres públicos se resuelven bajo demanda (PEP 562): `import k360` no
+carga nada pesado, el núcleo numérico solo trae NumPy, y fpdf / Pillow /
+Altair / pandas se cargan únicamente al usar crear_pdf, preparar_logo o
+las funciones construir_* de grafica.
+"""
+
+import importlib
+
+# nombre público -> submódulo que lo define
+_EXPORTS = {
+    # Núcleo numérico (solo NumPy)
+    "ESTRATEGIA_ART_151": "proyeccion",
+    "ESTRATEGIA_ART_93": "proyeccion",
+    "ESTRATEGIA_ART_185": "proyeccion",
+    "COLUMNAS_DETALLE": "proyeccion",
+    "tope_deducible_anual": "proyeccion",
+    "proyectar_saldos_dos_fases": "proyeccion",
+    "proyectar_detalle_mensual": "proyeccion",
+    "proyectar_saldos_lote": "proyeccion",
+    "MODOS_RETIRO": "proyeccion",
+    "pension_maxima": "proyeccion",
+    "proyectar_retiro": "proyeccion",
+    "COLUMNAS_CALENDARIO": "proyeccion",
+    "iterar_calendario": "proyeccion",
+    "escribir_csv": "exportar",
+    "escribir_xlsx": "exportar",
+    "obtener_tasa_admin": "costos",
+    "tabla_vigente": "costos",
+    "ReglasFiscales": "reglas_fiscales",
+    "cargar_reglas": "reglas_fiscales",
+    "topes_por_anio": "reglas_fiscales",
+    "TOPE_ART_151_ABS": "fiscal",
+    "TOPE_ART_185": "fiscal",
+    "FACTOR_CALIBRACION_ALLIANZ": "fiscal",
+    "analisis_fiscal": "fiscal",
+    "TASAS_PERFIL": "comparador",
+    "escenarios_comparador": "comparador",
+    "calcular_comparador": "comparador",
+    "simular_plan_usd": "divisas",
+    "trayectoria_tipo_cambio": "divisas",
+    "backtest_ventanas": "backtest",
+    "cargar_historial": "backtest",
+    "leer_historial": "backtest",
+    "ahorro_requerido": "metas",
+    "tasa_bruta_requerida": "metas",
+    "edad_fin_aportes_requerida": "metas",
+    "PERFILES_MONTECARLO": "montecarlo",
+    "simular_montecarlo": "montecarlo",
+    "DELTAS_SENSIBILIDAD": "sensibilidad",
+    "analisis_sensibilidad": "sensibilidad",
+    "EJES_REJILLA": "mapa_calor",
+    "evaluar_rejilla": "mapa_calor",
+    "AlmacenPropuestas": "almacen",
+    "abrir_almacen": "almacen",
+    "CacheLRU": "cache",
+    "firmar_token": "sesion",
+    "validar_token": "sesion",
+    "IntentosMemoria": "sesion",
+    "IntentosSQLite": "sesion",
+    "CacheTTL": "cache",
+    "memoizar": "cache",
+    "span": "metricas",
+    "instrumentar": "metricas",
+    "RegistroMetricas": "metricas",
+    # Salida (dependencias pesadas)
+    "crear_pdf": "pdf",
+    "preparar_logo": "pdf",
+    "ColaPDF": "cola_pdf",
+    "construir_grafica": "grafica",
+    "construir_grafica_retiro": "grafica",
+    "construir_tornado": "grafica",
+    "construir_mapa_calor": "grafica",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f".{modulo}", __name__), nombre)
+    globals()[nombre] = valor  # las siguientes consultas ya no pasan por aquí
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
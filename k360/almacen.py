@@ -0,0 +1,183 @@
+"""Almacén local de propuestas (SQLite): entradas, resultados clave y PDF generado.
+
+Cada propuesta guarda el juego de entradas de la barra lateral, la versión del
+motor con que se calculó, los resultados principales y los bytes del PDF. Los
+PDFs van en su propia tabla indexada por sha256 (el mismo PDF se guarda una
+sola vez) para que listar y buscar no lean blobs.
+
+Índices: (asesor, creado) para el listado paginado y (asesor, cliente_norm)
+para la búsqueda por cliente. La escritura es un solo INSERT por tabla en una
+transacción, en modo WAL: se puede guardar en cada PDF generado.
+
+Ruta: K360_ALMACEN (default propuestas_k360.sqlite3 en el directorio actual).
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+
+from .costos import RUTA_TABLA_DEFAULT
+from .reglas_fiscales import RUTA_REGLAS_DEFAULT
+
+RUTA_ALMACEN_DEFAULT = "propuestas_k360.sqlite3"
+_DIR_K360 = os.path.dirname(__file__)
+# Módulos cuyo código define los resultados guardados con una propuesta
+# (divisas usa los choques de montecarlo para los rangos del comparador)
+_ARCHIVOS_MOTOR = (
+    "proyeccion.py", "costos.py", "reglas_fiscales.py", "fiscal.py", "comparador.py", "divisas.py", "montecarlo.py",
+)
+# Tablas de datos: la que esté en uso (variable de entorno o la incluida en k360/datos)
+_TABLAS_MOTOR = (("K360_TABLA_COSTOS", RUTA_TABLA_DEFAULT), ("K360_REGLAS_FISCALES", RUTA_REGLAS_DEFAULT))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    sha256 TEXT PRIMARY KEY,
+    datos BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS propuestas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asesor TEXT NOT NULL,
+    cliente TEXT NOT NULL,
+    cliente_norm TEXT NOT NULL,
+    creado TEXT NOT NULL,
+    version_motor TEXT NOT NULL,
+    entradas TEXT NOT NULL,
+    resultados TEXT NOT NULL,
+    pdf_sha256 TEXT REFERENCES pdfs(sha256)
+);
+CREATE INDEX IF NOT EXISTS ix_propuestas_asesor_creado ON propuestas(asesor, creado DESC);
+CREATE INDEX IF NOT EXISTS ix_propuestas_asesor_cliente ON propuestas(asesor, cliente_norm);
+"""
+
+
+def version_motor() -> str:
+    """Huella (12 hex) del código y las tablas del motor numérico.
+
+    Las tablas se releen cuando cambia su mtime (sin reiniciar la app), así
+    que la huella se recalcula con la misma regla.
+    """
+    archivos = [(nombre, os.path.join(_DIR_K360, nombre)) for nombre in _ARCHIVOS_MOTOR]
+    archivos += [(os.path.basename(defecto), os.environ.get(variable) or defecto) for variable, defecto in _TABLAS_MOTOR]
+    return _huella_archivos(tuple((nombre, ruta, os.stat(ruta).st_mtime_ns) for nombre, ruta in archivos))
+
+
+@functools.lru_cache(maxsize=8)
+def _huella_archivos(archivos: tuple) -> str:
+    h = hashlib.sha256()
+    for nombre, ruta, _ in archivos:
+        with open(ruta, "rb") as f:
+            h.update(nombre.encode("utf-8") + b"\0" + f.read())
+    return h.hexdigest()[:12]
+
+
+def _normalizar_nombre(texto: str) -> str:
+    """Minúsculas sin acentos, para buscar 'perez' y encontrar 'Pérez'."""
+    sin_acentos = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_acentos.lower().split())
+
+
+class AlmacenPropuestas:
+    """Propuestas guardadas en un archivo SQLite (una conexión por hilo)."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        with self._conexion() as con:
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10.0)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA foreign_keys=ON")
+            self._local.con = con
+        return con
+
+    def guardar(self, asesor: str, cliente: str, entradas: dict, resultados: dict, pdf_bytes: bytes | None = None) -> int:
+        """Guarda una propuesta y devuelve su id."""
+        sha = hashlib.sha256(pdf_bytes).hexdigest() if pdf_bytes else None
+        con = self._conexion()
+        with con:
+            if sha is not None:
+                con.execute("INSERT OR IGNORE INTO pdfs (sha256, datos) VALUES (?, ?)", (sha, sqlite3.Binary(pdf_bytes)))
+            cursor = con.execute(
+                "INSERT INTO propuestas (asesor, cliente, cliente_norm, creado, version_motor, entradas, resultados, pdf_sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(asesor), str(cliente), _normalizar_nombre(cliente),
+                    datetime.now().isoformat(timespec="seconds"), version_motor(),
+                    json.dumps(entradas, ensure_ascii=False, default=float),
+                    json.dumps(resultados, ensure_ascii=False, default=float),
+                    sha,
+                ),
+            )
+        return int(cursor.lastrowid)
+
+    def listar(self, asesor: str, busqueda: str = "", pagina: int = 0, por_pagina: int = 10):
+        """(filas, total): propuestas del asesor, las más recientes primero.
+
+        busqueda filtra por nombre de cliente (sin distinguir acentos ni
+        mayúsculas). Las filas traen id, cliente, creado, version_motor,
+        resultados y si tienen PDF; no traen entradas ni bytes.
+        """
+        condicion, parametros = "asesor = ?", [str(asesor)]
+        termino = _normalizar_nombre(busqueda)
+        if termino:
+            condicion += " AND cliente_norm LIKE ? ESCAPE '\\'"
+            escapado = termino.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            parametros.append(f"%{escapado}%")
+
+        con = self._conexion()
+        total = con.execute(f"SELECT COUNT(*) FROM propuestas WHERE {condicion}", parametros).fetchone()[0]
+        filas = con.execute(
+            f"SELECT id, cliente, creado, version_motor, resultados, pdf_sha256 IS NOT NULL AS tiene_pdf "
+            f"FROM propuestas WHERE {condicion} ORDER BY creado DESC, id DESC LIMIT ? OFFSET ?",
+            [*parametros, int(por_pagina), int(pagina) * int(por_pagina)],
+        ).fetchall()
+        return [
+            {
+                "id": f["id"], "cliente": f["cliente"], "creado": f["creado"], "version_motor": f["version_motor"],
+                "resultados": json.loads(f["resultados"]), "tiene_pdf": bool(f["tiene_pdf"]),
+            }
+            for f in filas
+        ], int(total)
+
+    def obtener(self, id_propuesta: int, asesor: str | None = None) -> dict | None:
+        """Propuesta completa (con entradas, sin PDF); None si no existe o es de otro asesor."""
+        fila = self._conexion().execute(
+            "SELECT id, asesor, cliente, creado, version_motor, entradas, resultados, pdf_sha256 FROM propuestas WHERE id = ?",
+            (int(id_propuesta),),
+        ).fetchone()
+        if fila is None or (asesor is not None and fila["asesor"] != str(asesor)):
+            return None
+        return {
+            "id": fila["id"], "asesor": fila["asesor"], "cliente": fila["cliente"], "creado": fila["creado"],
+            "version_motor": fila["version_motor"], "entradas": json.loads(fila["entradas"]),
+            "resultados": json.loads(fila["resultados"]), "pdf_sha256": fila["pdf_sha256"],
+        }
+
+    def pdf(self, id_propuesta: int, asesor: str | None = None) -> bytes | None:
+        """Bytes del PDF guardado con la propuesta (None si no tiene)."""
+        consulta = "SELECT p.asesor, d.datos FROM propuestas p JOIN pdfs d ON d.sha256 = p.pdf_sha256 WHERE p.id = ?"
+        fila = self._conexion().execute(consulta, (int(id_propuesta),)).fetchone()
+        if fila is None or (asesor is not None and fila["asesor"] != str(asesor)):
+            return None
+        return bytes(fila["datos"])
+
+
+@functools.lru_cache(maxsize=4)
+def _almacen(ruta: str) -> AlmacenPropuestas:
+    return AlmacenPropuestas(ruta)
+
+
+def abrir_almacen(ruta: str | None = None) -> AlmacenPropuestas:
+    """Almacén compartido por el proceso (el esquema se crea una sola vez)."""
+    return _almacen(os.path.abspath(ruta or os.environ.get("K360_ALMACEN") or RUTA_ALMACEN_DEFAULT))
@@ -0,0 +1,253 @@
+"""Backtest histórico por ventanas móviles a partir de un archivo local de rendimientos.
+
+El archivo (CSV o Parquet) trae una fila por mes: fecha, rendimiento mensual
+del índice y, opcionalmente, inflación mensual. Los porcentajes se aceptan
+como 0.012 o 1.2: el rendimiento se toma en % si algún valor pasa de 1 en
+valor absoluto, y la inflación si el rendimiento viene en % o si algún valor
+pasa de 0.1 (10% mensual en decimal ya sería hiperinflación; 0.3 es 0.3%).
+Ruta por default: K360_RENDIMIENTOS_HISTORICOS.
+
+El plan del cliente (aportaciones indexadas, costo de administración,
+devoluciones SAT) se corre para cada mes de inicio posible del historial.
+Sin bucle por ventana: con P el producto acumulado de (1 + r - admin/12)
+sobre todo el historial, el saldo de la ventana que arranca en s es
+
+    S = P[s + M] * sum_u f_u / P[s + u + 1]
+
+y como los flujos cambian solo una vez al año, la suma se separa por año con
+vistas con paso (sliding_window_view(...)[:, ::12]) sobre las sumas de 12
+meses de 1 / P: todas las ventanas salen de una multiplicación de
+(ventanas x años), sin copiar la matriz ventanas x meses.
+
+Con inflación histórica la aportación de cada ventana se indexa con la
+inflación realizada de sus propios años (en lugar del supuesto fijo) y el
+saldo también se reporta en pesos de hoy (deflactado por esa inflación).
+"""
+
+import functools
+import hashlib
+import io
+import os
+
+import numpy as np
+
+from .cache import CacheLRU
+from .proyeccion import _tope_y_deduccion
+
+PERCENTILES = (10, 50, 90)
+_COLUMNAS_FECHA = ("fecha", "date", "mes")
+_COLUMNAS_RENDIMIENTO = ("rendimiento", "retorno", "return", "rendimiento_mensual")
+_COLUMNAS_INFLACION = ("inflacion", "inflación", "inflation", "inflacion_mensual")
+
+CACHE_HISTORIALES = CacheLRU(max_entradas=8, max_bytes=32 * 1024 * 1024)
+
+
+# -----------------------------
+# Lectura del historial
+# -----------------------------
+def _columna(df, candidatas):
+    nombres = {str(c).strip().lower(): c for c in df.columns}
+    for candidata in candidatas:
+        if candidata in nombres:
+            return nombres[candidata]
+    return None
+
+
+def _en_porcentaje(valores: np.ndarray, umbral: float) -> bool:
+    return bool(np.nanmax(np.abs(valores)) > umbral)
+
+
+def _historial_desde_dataframe(df) -> dict:
+    """{"fecha", "rendimiento", "inflacion"}: arreglos ordenados por fecha (inflacion puede ser None)."""
+    import pandas as pd
+
+    col_fecha = _columna(df, _COLUMNAS_FECHA)
+    col_rend = _columna(df, _COLUMNAS_RENDIMIENTO)
+    if col_fecha is None or col_rend is None:
+        raise ValueError("El historial necesita columnas 'fecha' y 'rendimiento' (opcional: 'inflacion').")
+    col_infl = _columna(df, _COLUMNAS_INFLACION)
+
+    df = df.assign(_fecha=pd.to_datetime(df[col_fecha])).dropna(subset=[col_rend]).sort_values("_fecha")
+    if df["_fecha"].duplicated().any():
+        raise ValueError("El historial tiene meses repetidos.")
+    rendimiento = df[col_rend].to_numpy(dtype=float)
+    rendimiento_pct = _en_porcentaje(rendimiento, 1.0)
+    if rendimiento_pct:
+        rendimiento = rendimiento / 100.0
+    inflacion = None
+    if col_infl is not None and df[col_infl].notna().all():
+        inflacion = df[col_infl].to_numpy(dtype=float)
+        if rendimiento_pct or _en_porcentaje(inflacion, 0.1):
+            inflacion = inflacion / 100.0
+    if np.any(rendimiento <= -1.0):
+        raise ValueError("Hay rendimientos mensuales de -100% o menos.")
+    return {
+        "fecha": df["_fecha"].dt.strftime("%Y-%m").to_numpy(dtype=str),
+        "rendimiento": rendimiento,
+        "inflacion": inflacion,
+    }
+
+
+def _leer_tabla(origen, nombre: str):
+    import pandas as pd
+
+    if nombre.lower().endswith((".parquet", ".pq")):
+        return pd.read_parquet(origen)  # requiere pyarrow o fastparquet
+    return pd.read_csv(origen)
+
+
+def leer_historial(datos: bytes, nombre: str) -> dict:
+    """Historial desde bytes subidos (CSV o Parquet según la extensión), cacheado por SHA-256."""
+    digest = hashlib.sha256(datos).hexdigest()
+    historial = CACHE_HISTORIALES.obtener(digest, None)
+    if historial is None:
+        historial = _historial_desde_dataframe(_leer_tabla(io.BytesIO(datos), nombre))
+        CACHE_HISTORIALES.guardar(digest, historial)
+    return historial
+
+
+@functools.lru_cache(maxsize=4)
+def _leer_archivo(ruta: str, _mtime_ns: int) -> dict:
+    return _historial_desde_dataframe(_leer_tabla(ruta, ruta))
+
+
+def cargar_historial(ruta: str | None = None) -> dict | None:
+    """Historial del archivo local (None si no hay ruta configurada)."""
+    ruta = ruta or os.environ.get("K360_RENDIMIENTOS_HISTORICOS")
+    if not ruta:
+        return None
+    return _leer_archivo(ruta, os.stat(ruta).st_mtime_ns)
+
+
+# -----------------------------
+# Motor de ventanas
+# -----------------------------
+def _vista_anual(serie: np.ndarray, ventanas: int, anos: int) -> np.ndarray:
+    """Vista (ventanas x anos) con serie[w + 12 * y], sin copiar."""
+    largo = 12 * (anos - 1) + 1
+    return np.lib.stride_tricks.sliding_window_view(serie, largo)[:ventanas, ::12]
+
+
+def _suma_12(serie: np.ndarray) -> np.ndarray:
+    """Suma de cada bloque de 12 meses consecutivos: s[k] = serie[k] + ... + serie[k + 11]."""
+    acumulada = np.concatenate(([0.0], np.cumsum(serie)))
+    return acumulada[12:] - acumulada[:-12]
+
+
+def backtest_ventanas(
+    rendimientos,
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_admin_real: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    topes_anuales=None,
+    inflacion_historica=None,
+    fechas=None,
+):
+    """Corre el plan en cada ventana de (edad_objetivo - edad_actual) años del historial.
+
+    rendimientos: rendimiento bruto mensual (decimal) del índice, mes a mes.
+    inflacion_historica: inflación mensual alineada con rendimientos; si se da
+    y inflacion es True, indexa las aportaciones con la inflación realizada.
+
+    Devuelve un dict con arreglos por ventana ("inicio", "saldo_objetivo",
+    "saldo_fin_aportes", "saldo_objetivo_real" o None, "tasa_anualizada"),
+    "percentiles" del saldo objetivo, "peor" / "mejor" ventana, "ventanas"
+    y "meses".
+    """
+    r = np.asarray(rendimientos, dtype=float)
+    n = len(r)
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    total_anos = max(0, int(edad_objetivo) - int(edad_actual))
+    anos_aporte = min(max(0, plazo_anos), total_anos)
+    meses = total_anos * 12
+    if meses == 0:
+        raise ValueError("El plan no tiene meses que simular.")
+    if n < meses:
+        raise ValueError(f"Historial insuficiente: el plan necesita {meses} meses y el archivo tiene {n}.")
+    ventanas = n - meses + 1
+    fechas = np.asarray(fechas if fechas is not None else np.arange(n).astype(str))
+
+    # P0[k] = prod_{i<k} (1 + r_i - admin/12); Q[k] = 1 / P0[k + 1] (valor de un peso depositado al cierre del mes k)
+    crec = 1.0 + r - float(tasa_admin_real) / 12.0
+    log_p = np.concatenate(([0.0], np.cumsum(np.log(np.maximum(crec, 1e-12)))))
+    q = np.exp(-log_p[1:])
+
+    saldo_objetivo = np.zeros(ventanas)
+    saldo_fin_aportes = np.zeros(ventanas)
+    indices = np.arange(ventanas)
+    if anos_aporte:
+        # Aportación mensual por (ventana, año): supuesto fijo o inflación realizada de cada ventana
+        usar_historica = bool(inflacion) and inflacion_historica is not None
+        if usar_historica:
+            log_infl = np.concatenate(([0.0], np.cumsum(np.log1p(np.asarray(inflacion_historica, dtype=float)))))
+            infl_anual = np.exp(log_infl[12:] - log_infl[:-12])
+            factores = np.ones((ventanas, anos_aporte))
+            if anos_aporte > 1:
+                factores[:, 1:] = np.cumprod(_vista_anual(infl_anual, ventanas, anos_aporte - 1), axis=1)
+            aportes = float(ahorro_mensual) * factores
+        else:
+            factor = (1.0 + float(tasa_inflacion)) if inflacion else 1.0
+            aportes = (float(ahorro_mensual) * factor ** np.arange(anos_aporte))[None, :]
+
+        tope, deduce = _tope_y_deduccion(
+            estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+        )
+        topes = np.atleast_1d(np.asarray(tope, dtype=float))
+        topes = topes[np.minimum(np.arange(anos_aporte), len(topes) - 1)]
+        devoluciones = np.minimum(aportes * 12.0, topes) * float(isr_cliente) if deduce else np.zeros_like(aportes)
+
+        # sum_u f_u * Q[s + u], separado por año con vistas de paso 12
+        valor_aportes = _vista_anual(_suma_12(q), ventanas, anos_aporte)
+        suma = np.einsum("wy,wy->w", np.broadcast_to(aportes, valor_aportes.shape), valor_aportes)
+        devolucion_final = 0.0
+        if reinvertir_beneficio:
+            valor_devoluciones = _vista_anual(q[11:], ventanas, anos_aporte)
+            suma += np.einsum("wy,wy->w", np.broadcast_to(devoluciones, valor_devoluciones.shape), valor_devoluciones)
+            devolucion_final = np.broadcast_to(devoluciones, (ventanas, anos_aporte))[:, -1]
+
+        saldo_objetivo = np.exp(log_p[indices + meses]) * suma
+        if 0 < plazo_anos <= total_anos:
+            # Igual que el motor determinista: antes de la devolución del último año
+            saldo_fin_aportes = np.exp(log_p[indices + anos_aporte * 12]) * suma - devolucion_final
+        else:
+            saldo_fin_aportes = saldo_objetivo.copy()
+
+    saldo_real = None
+    if inflacion_historica is not None:
+        log_infl = np.concatenate(([0.0], np.cumsum(np.log1p(np.asarray(inflacion_historica, dtype=float)))))
+        saldo_real = saldo_objetivo / np.exp(log_infl[indices + meses] - log_infl[indices])
+
+    log_bruto = np.concatenate(([0.0], np.cumsum(np.log1p(r))))
+    tasa_anualizada = np.exp((log_bruto[indices + meses] - log_bruto[indices]) * 12.0 / meses) - 1.0
+
+    def ventana(i):
+        return {
+            "inicio": str(fechas[i]),
+            "fin": str(fechas[i + meses - 1]),
+            "saldo_objetivo": float(saldo_objetivo[i]),
+            "tasa_anualizada": float(tasa_anualizada[i]),
+        }
+
+    return {
+        "inicio": fechas[:ventanas],
+        "saldo_objetivo": saldo_objetivo,
+        "saldo_fin_aportes": saldo_fin_aportes,
+        "saldo_objetivo_real": saldo_real,
+        "tasa_anualizada": tasa_anualizada,
+        "percentiles": tuple(float(x) for x in np.percentile(saldo_objetivo, PERCENTILES)),
+        "peor": ventana(int(np.argmin(saldo_objetivo))),
+        "mejor": ventana(int(np.argmax(saldo_objetivo))),
+        "ventanas": int(ventanas),
+        "meses": int(meses),
+    }
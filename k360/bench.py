@@ -0,0 +1,432 @@
+"""Benchmarks de los caminos calientes de un rerun: proyección, comparador, gráfica y PDF.
+
+Uso:
+    python -m k360.bench                      # corre y compara contra bench_baseline.json
+    python -m k360.bench --guardar            # corre y guarda el resultado como baseline
+    python -m k360.bench --filtro pdf --repeticiones 50
+
+Cada caso se mide en varios horizontes (5 años hasta 18→65): tiempo de pared
+(mediana y mínimo de N repeticiones), bloques asignados netos y pico de memoria
+(tracemalloc, en una corrida aparte para no inflar los tiempos).
+
+Antes de medir se verifica que los motores rápidos (forma cerrada, lote y
+detalle mensual) coincidan con el bucle de referencia mes a mes. La corrida
+falla (código 1) si hay diferencias numéricas o si un caso empeora más del
+umbral contra el baseline.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .backtest import backtest_ventanas
+from .comparador import calcular_comparador, escenarios_comparador
+from .costos import obtener_tasa_admin
+from .divisas import simular_plan_usd
+from .fiscal import TOPE_ART_151_ABS, TOPE_ART_185, analisis_fiscal
+from .grafica import construir_grafica
+from .pdf import crear_pdf, preparar_logo
+from .proyeccion import (
+    COLUMNAS_DETALLE,
+    ESTRATEGIA_ART_151,
+    ESTRATEGIA_ART_185,
+    ESTRATEGIA_ART_93,
+    _proyectar_retiro_mensual,
+    _proyectar_saldos_dos_fases_mensual,
+    iterar_calendario,
+    proyectar_detalle_mensual,
+    proyectar_retiro,
+    proyectar_saldos_dos_fases,
+    proyectar_saldos_lote,
+    tope_deducible_anual,
+)
+from .reglas_fiscales import topes_por_anio
+
+BASELINE_DEFAULT = "bench_baseline.json"
+UMBRAL_DEFAULT = 0.20  # +20% contra baseline = regresión
+# Ruido que no cuenta como regresión aunque supere el umbral relativo
+PISO_TIEMPO_MS = 0.5
+PISO_MEMORIA_KB = 64.0
+TOLERANCIA_RELATIVA = 1e-9
+
+# (edad actual, edad fin de aportes, edad objetivo)
+HORIZONTES = {
+    "5a": (40, 45, 45),
+    "15a": (35, 50, 60),
+    "25a": (30, 55, 65),
+    "18-43-65": (18, 43, 65),
+    "18-65": (18, 65, 65),
+}
+
+PARAMETROS_BASE = dict(
+    ahorro_mensual=3000.0,
+    tasa_bruta_scenario=0.10,
+    inflacion=True,
+    tasa_inflacion=0.05,
+    estrategia_fiscal=ESTRATEGIA_ART_151,
+    validar_sueldo=False,
+    sueldo_anual=0.0,
+    isr_cliente=0.30,
+    tope_art_151_abs=TOPE_ART_151_ABS,
+    tope_art_185=TOPE_ART_185,
+    reinvertir_beneficio=True,
+)
+
+
+# -----------------------------
+# Verificación numérica contra el bucle de referencia
+# -----------------------------
+def verificar_motores() -> list:
+    """Compara los motores rápidos con _proyectar_saldos_dos_fases_mensual.
+
+    Devuelve la lista de discrepancias (vacía si todo coincide).
+    """
+    casos = []
+    for edad, fin, objetivo in [*HORIZONTES.values(), (30, 30, 65), (30, 70, 65), (50, 55, 50)]:
+        for estrategia in (ESTRATEGIA_ART_151, ESTRATEGIA_ART_93, ESTRATEGIA_ART_185):
+            for reinvertir in (False, True):
+                for inflacion in (False, True):
+                    for validar, sueldo in ((False, 0.0), (True, 250_000.0)):
+                        casos.append(dict(
+                            PARAMETROS_BASE,
+                            ahorro_mensual=18_000.0 if validar else 3000.0,
+                            edad_actual=edad,
+                            edad_fin_aportes=fin,
+                            edad_objetivo=objetivo,
+                            tasa_admin_real=obtener_tasa_admin(3000.0, fin - edad),
+                            estrategia_fiscal=estrategia,
+                            reinvertir_beneficio=reinvertir,
+                            inflacion=inflacion,
+                            validar_sueldo=validar,
+                            sueldo_anual=sueldo,
+                        ))
+
+    # Mismos casos con topes por año de las reglas fiscales (indexados a partir de 2025)
+    casos_topes = [
+        dict(c, topes_anuales=topes_por_anio(c["estrategia_fiscal"], c["validar_sueldo"], c["sueldo_anual"], 60, 2025))
+        for c in casos
+    ]
+
+    discrepancias = []
+    for grupo in (casos, casos_topes):
+        discrepancias += _comparar_con_referencia(grupo)
+    return discrepancias + _comparar_retiro() + _comparar_usd(casos) + _comparar_backtest(casos + casos_topes)
+
+
+def _comparar_retiro() -> list:
+    """Fase de retiros: forma cerrada contra el bucle mes a mes (incluye agotamiento)."""
+    discrepancias = []
+    for tasa in (0.0, 0.06):
+        for modo, extra in (
+            ("fijo", {"retiro_mensual": 20_000.0}),
+            ("fijo", {"retiro_mensual": 40_000.0}),
+            ("indexado", {"retiro_mensual": 15_000.0, "indexacion": 0.05}),
+            ("porcentaje", {"porcentaje_anual": 0.07}),
+        ):
+            for estrategia in (ESTRATEGIA_ART_151, ESTRATEGIA_ART_93, ESTRATEGIA_ART_185):
+                caso = dict(
+                    saldo_inicial=5_000_000.0, edad_retiro=65, tasa_neta=tasa, modo=modo,
+                    estrategia_fiscal=estrategia, isr_retiro=0.30, exencion=1_200_000.0, **extra,
+                )
+                rapido = proyectar_retiro(**caso)
+                referencia = _proyectar_retiro_mensual(**caso)
+                valores = (rapido["saldo_final"], rapido["total_bruto"], rapido["total_isr"])
+                if rapido["edad_agotamiento"] != referencia[0] or not np.allclose(
+                    valores, referencia[1:], rtol=TOLERANCIA_RELATIVA, atol=1e-6
+                ):
+                    discrepancias.append({
+                        "motor": "proyectar_retiro",
+                        "caso": {k: caso[k] for k in ("tasa_neta", "modo", "estrategia_fiscal")} | extra,
+                        "esperado": list(referencia),
+                        "obtenido": [rapido["edad_agotamiento"], *valores],
+                    })
+    return discrepancias
+
+
+def _comparar_usd(casos: list) -> list:
+    """Plan en USD con tipo de cambio constante y sin volatilidad = motor en pesos."""
+    discrepancias = []
+    for caso in casos:
+        referencia = np.array(_proyectar_saldos_dos_fases_mensual(**caso))
+        plan = simular_plan_usd(**caso, tipo_cambio_inicial=20.0, depreciacion_anual=0.0, volatilidad_tc=0.0)
+        valores = np.array([plan["saldo_fin_aportes_mxn"][0], plan["saldo_objetivo_mxn"][0], referencia[2]])
+        if not np.allclose(valores, referencia, rtol=TOLERANCIA_RELATIVA, atol=1e-6):
+            discrepancias.append({
+                "motor": "simular_plan_usd",
+                "caso": {k: caso[k] for k in ("edad_actual", "edad_fin_aportes", "edad_objetivo",
+                                              "estrategia_fiscal", "reinvertir_beneficio", "inflacion")},
+                "esperado": referencia.tolist(),
+                "obtenido": valores.tolist(),
+            })
+    return discrepancias
+
+
+def _comparar_backtest(casos: list) -> list:
+    """Backtest con un historial de rendimiento constante = motor determinista (cada ventana)."""
+    discrepancias = []
+    for caso in casos:
+        if caso["edad_objetivo"] <= caso["edad_actual"]:
+            continue  # sin meses que simular
+        referencia = np.array(_proyectar_saldos_dos_fases_mensual(**caso))
+        parametros = {k: v for k, v in caso.items() if k != "tasa_bruta_scenario"}
+        meses = 12 * (caso["edad_objetivo"] - caso["edad_actual"])
+        resultado = backtest_ventanas(np.full(meses + 24, caso["tasa_bruta_scenario"] / 12.0), **parametros)
+        valores = np.array([resultado["saldo_fin_aportes"], resultado["saldo_objetivo"]])
+        if not np.allclose(valores, referencia[:2, None], rtol=TOLERANCIA_RELATIVA, atol=1e-6):
+            discrepancias.append({
+                "motor": "backtest_ventanas",
+                "caso": {k: caso[k] for k in ("edad_actual", "edad_fin_aportes", "edad_objetivo",
+                                              "estrategia_fiscal", "reinvertir_beneficio", "inflacion")},
+                "esperado": referencia[:2].tolist(),
+                "obtenido": [float(valores[0, 0]), float(valores[1, 0])],
+            })
+    return discrepancias
+
+
+def _comparar_con_referencia(casos: list) -> list:
+    lote = proyectar_saldos_lote(**{k: np.array([c[k] for c in casos]) for k in casos[0]})
+
+    discrepancias = []
+    for i, caso in enumerate(casos):
+        referencia = np.array(_proyectar_saldos_dos_fases_mensual(**caso))
+        columnas, fin_detalle = proyectar_detalle_mensual(**caso)
+        final_detalle = float(columnas["Saldo Neto"][-1]) if len(columnas["Saldo Neto"]) else 0.0
+        final_calendario = 0.0
+        for fila in iterar_calendario(**caso, granularidad="anual"):
+            final_calendario = fila[-1]
+        motores = {
+            "proyectar_saldos_dos_fases": np.array(proyectar_saldos_dos_fases(**caso)),
+            "proyectar_saldos_lote": np.array([lote[0][i], lote[1][i], lote[2][i]]),
+            "proyectar_detalle_mensual": np.array([fin_detalle, final_detalle, referencia[2]]),
+            "iterar_calendario": np.array([referencia[0], final_calendario, referencia[2]]),
+        }
+        for motor, valores in motores.items():
+            if not np.allclose(valores, referencia, rtol=TOLERANCIA_RELATIVA, atol=1e-6):
+                discrepancias.append({
+                    "motor": motor,
+                    "caso": {k: caso[k] for k in ("edad_actual", "edad_fin_aportes", "edad_objetivo",
+                                                  "estrategia_fiscal", "reinvertir_beneficio", "inflacion",
+                                                  "validar_sueldo")} | {"topes_por_anio": "topes_anuales" in caso},
+                    "esperado": referencia.tolist(),
+                    "obtenido": valores.tolist(),
+                })
+    return discrepancias
+
+
+# -----------------------------
+# Casos
+# -----------------------------
+def _logo_sintetico() -> bytes:
+    """PNG RGBA 1200x600 (tamaño típico de un logo subido sin optimizar)."""
+    from PIL import Image
+
+    img = Image.new("RGBA", (1200, 600), (0, 0, 0, 0))
+    img.paste((31, 119, 180, 255), (100, 100, 1100, 500))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _detalle(parametros: dict) -> pd.DataFrame:
+    columnas, _ = proyectar_detalle_mensual(**parametros)
+    return pd.DataFrame(columnas, columns=list(COLUMNAS_DETALLE), copy=False)
+
+
+def _datos_pdf(parametros: dict) -> tuple:
+    """Argumentos de crear_pdf como los arma app.py para este horizonte."""
+    columnas, saldo_fin_aportes = proyectar_detalle_mensual(**parametros)
+    _, comparador_pdf = _comparador(parametros)
+    tope = tope_deducible_anual(
+        parametros["estrategia_fiscal"], parametros["validar_sueldo"], parametros["sueldo_anual"],
+        TOPE_ART_151_ABS, TOPE_ART_185,
+    )
+    analisis = analisis_fiscal(parametros["estrategia_fiscal"], parametros["ahorro_mensual"], tope)
+    return (
+        {'nombre': "Cliente Benchmark", 'edad': parametros["edad_actual"],
+         'edad_fin_aportes': parametros["edad_fin_aportes"], 'retiro': parametros["edad_objetivo"],
+         'estrategia': parametros["estrategia_fiscal"]},
+        {
+            'aporte_mensual': parametros["ahorro_mensual"],
+            'saldo_fin_aportes': saldo_fin_aportes,
+            'saldo_final': float(columnas["Saldo Neto"][-1]),
+            'beneficio_sat': float(columnas["Devoluciones SAT"][-1]),
+            'tasa_admin_pct': parametros["tasa_admin_real"] * 100,
+            'total_aportado': float(columnas["Aportado"][-1]),
+            'comparador': comparador_pdf,
+        },
+        {'texto_analisis': analisis["texto_analisis"], 'alerta_excedente': analisis["texto_alerta"]},
+        {'nombre': "Asesor Benchmark", 'telefono': "55 0000 0000"},
+    )
+
+
+def _comparador(parametros: dict):
+    return calcular_comparador(
+        escenarios_comparador(parametros["tasa_bruta_scenario"], modo_avanzado=True),
+        ahorro_mensual=parametros["ahorro_mensual"],
+        edad=parametros["edad_actual"],
+        edad_fin_aportes=parametros["edad_fin_aportes"],
+        retiro=parametros["edad_objetivo"],
+        tasa_bruta=parametros["tasa_bruta_scenario"],
+        tasa_admin_real=parametros["tasa_admin_real"],
+        inflacion=parametros["inflacion"],
+        tasa_inflacion=parametros["tasa_inflacion"],
+        estrategia_fiscal=parametros["estrategia_fiscal"],
+        validar_sueldo=parametros["validar_sueldo"],
+        sueldo_anual=parametros["sueldo_anual"],
+        isr_cliente=parametros["isr_cliente"],
+        reinvertir_beneficio=parametros["reinvertir_beneficio"],
+    )
+
+
+def _pdf(datos: tuple, logo_pdf=None):
+    pdf_bytes, error = crear_pdf(*datos, logo_pdf=logo_pdf)
+    if error:
+        raise RuntimeError(error)
+    return pdf_bytes
+
+
+def casos_benchmark() -> dict:
+    """nombre -> función sin argumentos; las entradas se preparan fuera de la medición."""
+    logo_pdf = preparar_logo(_logo_sintetico())
+    casos = {}
+    for etiqueta, (edad, fin, objetivo) in HORIZONTES.items():
+        parametros = dict(
+            PARAMETROS_BASE,
+            edad_actual=edad,
+            edad_fin_aportes=fin,
+            edad_objetivo=objetivo,
+            tasa_admin_real=obtener_tasa_admin(PARAMETROS_BASE["ahorro_mensual"], fin - edad),
+        )
+        df = _detalle(parametros)
+        datos = _datos_pdf(parametros)
+
+        casos[f"dos_fases/{etiqueta}"] = lambda p=parametros: proyectar_saldos_dos_fases(**p)
+        casos[f"detalle_mensual/{etiqueta}"] = lambda p=parametros: _detalle(p)
+        casos[f"comparador/{etiqueta}"] = lambda p=parametros: _comparador(p)
+        # to_dict() es lo que hace st.altair_chart: melt + construcción + serialización
+        casos[f"grafica/{etiqueta}"] = lambda d=df: construir_grafica(d).to_dict()
+        casos[f"pdf_sin_logo/{etiqueta}"] = lambda d=datos: _pdf(d)
+        casos[f"pdf_con_logo/{etiqueta}"] = lambda d=datos: _pdf(d, logo_pdf)
+    return casos
+
+
+# -----------------------------
+# Medición
+# -----------------------------
+def medir(fn, repeticiones: int = 20) -> dict:
+    """Tiempo de pared, asignaciones y pico de memoria de fn()."""
+    fn()  # calentamiento (imports perezosos, cachés de módulo)
+    tiempos = []
+    for _ in range(max(1, int(repeticiones))):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+        despues = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    asignaciones = sum(max(0, d.count_diff) for d in despues.compare_to(antes, "filename"))
+
+    return {
+        "tiempo_ms_mediana": round(statistics.median(tiempos), 4),
+        "tiempo_ms_min": round(min(tiempos), 4),
+        "asignaciones": int(asignaciones),
+        "pico_kb": round((pico - base) / 1024.0, 2),
+    }
+
+
+def correr(filtro: str | None = None, repeticiones: int = 20) -> dict:
+    resultados = {}
+    for nombre, fn in casos_benchmark().items():
+        if filtro and filtro not in nombre:
+            continue
+        resultados[nombre] = medir(fn, repeticiones)
+    return resultados
+
+
+def comparar(resultados: dict, baseline: dict, umbral: float = UMBRAL_DEFAULT) -> list:
+    """Regresiones de resultados contra baseline (tiempo mediano y pico de memoria)."""
+    regresiones = []
+    for nombre, actual in resultados.items():
+        previo = baseline.get(nombre)
+        if previo is None:
+            continue
+        for metrica, piso in (("tiempo_ms_mediana", PISO_TIEMPO_MS), ("pico_kb", PISO_MEMORIA_KB)):
+            antes, ahora = float(previo[metrica]), float(actual[metrica])
+            if ahora > antes * (1.0 + umbral) and ahora - antes > piso:
+                regresiones.append(f"{nombre}: {metrica} {antes:,.2f} -> {ahora:,.2f} (+{(ahora / antes - 1) * 100:.0f}%)")
+    return regresiones
+
+
+def _entorno() -> dict:
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del Simulador Krece360.")
+    parser.add_argument("--baseline", default=BASELINE_DEFAULT, help="JSON de baseline")
+    parser.add_argument("--guardar", action="store_true", help="Guarda esta corrida como baseline")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_DEFAULT, help="Regresión relativa tolerada (0.20 = 20%%)")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Repeticiones por caso")
+    parser.add_argument("--filtro", default=None, help="Solo casos cuyo nombre contenga este texto")
+    args = parser.parse_args(argv)
+
+    discrepancias = verificar_motores()
+    if discrepancias:
+        print(f"✗ {len(discrepancias)} discrepancias contra el bucle de referencia:", file=sys.stderr)
+        for d in discrepancias[:20]:
+            print(f"  {d['motor']} {d['caso']}: esperado {d['esperado']} obtenido {d['obtenido']}", file=sys.stderr)
+        return 1
+    print("✓ Motores rápidos = bucle de referencia")
+
+    resultados = correr(args.filtro, args.repeticiones)
+    print(f"{'caso':32} {'mediana ms':>11} {'mín ms':>9} {'asign.':>8} {'pico KB':>10}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:32} {r['tiempo_ms_mediana']:11.3f} {r['tiempo_ms_min']:9.3f} {r['asignaciones']:8d} {r['pico_kb']:10.1f}")
+
+    if args.guardar:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"entorno": _entorno(), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+        print(f"Baseline guardado en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Sin baseline en {args.baseline}; corre con --guardar para crearlo.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["resultados"]
+    regresiones = comparar(resultados, baseline, args.umbral)
+    if regresiones:
+        print(f"✗ {len(regresiones)} regresiones (umbral +{args.umbral * 100:.0f}%):", file=sys.stderr)
+        for r in regresiones:
+            print(f"  {r}", file=sys.stderr)
+        return 1
+    print(f"✓ Sin regresiones contra {args.baseline} (umbral +{args.umbral * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
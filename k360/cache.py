@@ -0,0 +1,212 @@
+"""Caché LRU acotada para proyecciones, compartida por todas las sesiones del proceso.
+
+Streamlit vuelve a ejecutar app.py completo en cada interacción, pero los
+módulos importados (como este) viven mientras viva el proceso. La caché se
+indexa con un hash de los argumentos normalizados, así que editar solo campos
+de presentación (asesor, teléfono, logo) reutiliza la proyección ya calculada.
+
+Los valores en caché se comparten: trátalos como de solo lectura.
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_FALTA = object()
+
+
+# -----------------------------
+# Clave canónica
+# -----------------------------
+def _normalizar(valor):
+    """Convierte un argumento a una representación estable y comparable."""
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, (bool, np.bool_)):
+        return ("b", bool(valor))
+    if isinstance(valor, (int, np.integer)):
+        return ("i", int(valor))
+    if isinstance(valor, (float, np.floating)):
+        valor = float(valor)
+        return ("f", repr(0.0 if valor == 0.0 else valor))
+    if isinstance(valor, np.ndarray):
+        arr = np.ascontiguousarray(valor)
+        return ("a", str(arr.dtype), arr.shape, hashlib.sha256(arr.tobytes()).hexdigest())
+    if isinstance(valor, (list, tuple)):
+        return ("l", tuple(_normalizar(v) for v in valor))
+    if isinstance(valor, dict):
+        return ("d", tuple(sorted((str(k), _normalizar(v)) for k, v in valor.items())))
+    return ("r", repr(valor))
+
+
+def clave_canonica(nombre: str, argumentos: dict) -> str:
+    """Hash SHA-256 de (nombre de función, argumentos normalizados)."""
+    normal = (nombre, tuple((k, _normalizar(v)) for k, v in argumentos.items()))
+    return hashlib.sha256(repr(normal).encode("utf-8")).hexdigest()
+
+
+def _tamano_aprox(valor) -> int:
+    """Bytes aproximados que ocupa un resultado (arreglos, DataFrames, tuplas)."""
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if hasattr(valor, "memory_usage"):  # pandas DataFrame / Series
+        try:
+            uso = valor.memory_usage(deep=True)
+            return int(uso.sum() if hasattr(uso, "sum") else uso)
+        except Exception:
+            pass
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_tamano_aprox(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamano_aprox(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+def _congelar(valor):
+    """Marca arreglos NumPy como de solo lectura antes de compartirlos."""
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, (list, tuple)):
+        for v in valor:
+            _congelar(v)
+    elif isinstance(valor, dict):
+        for v in valor.values():
+            _congelar(v)
+    return valor
+
+
+# -----------------------------
+# Caché LRU
+# -----------------------------
+class CacheLRU:
+    """Caché LRU thread-safe con presupuesto de entradas y de bytes."""
+
+    def __init__(self, max_entradas: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entradas = int(max_entradas)
+        self.max_bytes = int(max_bytes)
+        self._datos = OrderedDict()  # clave -> (valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._hilo = threading.local()  # hits / misses del hilo actual (una sesión de Streamlit por hilo)
+
+    def obtener(self, clave, default=_FALTA):
+        hilo = self._hilo
+        with self._lock:
+            item = self._datos.get(clave, _FALTA)
+            if item is _FALTA:
+                self.misses += 1
+                hilo.misses = getattr(hilo, "misses", 0) + 1
+                return default
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            hilo.hits = getattr(hilo, "hits", 0) + 1
+            return item[0]
+
+    def conteo_hilo(self) -> tuple:
+        """(hits, misses) acumulados solo por las consultas del hilo actual."""
+        return getattr(self._hilo, "hits", 0), getattr(self._hilo, "misses", 0)
+
+    def guardar(self, clave, valor) -> None:
+        tamano = _tamano_aprox(valor)
+        if tamano > self.max_bytes or self.max_entradas <= 0:
+            return  # nunca cabría: no desalojamos todo por un solo resultado
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._datos[clave] = (valor, tamano)
+            self._bytes += tamano
+            while len(self._datos) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, liberado) = self._datos.popitem(last=False)
+                self._bytes -= liberado
+                self.evictions += 1
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / consultas) if consultas else 0.0,
+                "evictions": self.evictions,
+                "entradas": len(self._datos),
+                "bytes": self._bytes,
+                "max_entradas": self.max_entradas,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CacheTTL(CacheLRU):
+    """CacheLRU cuyas entradas además caducan `ttl` segundos después de guardarse."""
+
+    def __init__(self, max_entradas: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: float = 900.0):
+        super().__init__(max_entradas, max_bytes)
+        self.ttl = float(ttl)
+        self.expiradas = 0
+
+    def obtener(self, clave, default=_FALTA):
+        with self._lock:
+            item = self._datos.get(clave, _FALTA)
+            if item is not _FALTA and item[0][0] <= time.monotonic():
+                del self._datos[clave]
+                self._bytes -= item[1]
+                self.expiradas += 1
+                item = _FALTA
+        valor = super().obtener(clave, _FALTA)
+        return default if valor is _FALTA else valor[1]
+
+    def guardar(self, clave, valor) -> None:
+        super().guardar(clave, (time.monotonic() + self.ttl, valor))
+
+    def estadisticas(self) -> dict:
+        return super().estadisticas() | {"ttl": self.ttl, "expiradas": self.expiradas}
+
+
+CACHE_PROYECCIONES = CacheLRU(
+    max_entradas=int(os.environ.get("K360_CACHE_MAX_ENTRADAS", 256)),
+    max_bytes=int(float(os.environ.get("K360_CACHE_MAX_MB", 64)) * 1024 * 1024),
+)
+
+
+def memoizar(fn=None, *, cache: CacheLRU | None = None):
+    """Decorador: memoiza fn en `cache` (por defecto CACHE_PROYECCIONES).
+
+    Los argumentos se enlazan a la firma de fn (con defaults aplicados), así
+    que llamar por posición o por nombre produce la misma clave.
+    """
+    def decorar(f):
+        firma = inspect.signature(f)
+        nombre = f"{f.__module__}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def envoltura(*args, **kwargs):
+            destino = cache if cache is not None else CACHE_PROYECCIONES
+            enlazados = firma.bind(*args, **kwargs)
+            enlazados.apply_defaults()
+            clave = clave_canonica(nombre, enlazados.arguments)
+            valor = destino.obtener(clave)
+            if valor is _FALTA:
+                valor = _congelar(f(*args, **kwargs))
+                destino.guardar(clave, valor)
+            return valor
+
+        return envoltura
+
+    if fn is not None:
+        return decorar(fn)
+    return decorar
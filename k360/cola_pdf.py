@@ -0,0 +1,164 @@
+"""Cola de PDFs en segundo plano con caché por contenido.
+
+crear_pdf corre en un pool de procesos (no en el hilo del rerun), así que un
+render grande no detiene los reruns de la sesión que lo pidió ni los de otros
+asesores. El resultado se guarda en una CacheTTL indexada por el hash de
+(datos del cliente, financieros, fiscales, asesor, hash del logo): volver a
+descargar o dar doble clic sirve los bytes desde memoria, y si el mismo PDF ya
+se está generando se reutiliza ese trabajo en lugar de encolar otro.
+
+Variables de entorno: K360_PDF_WORKERS (default 2), K360_PDF_EJECUTOR
+("procesos" o "hilos"), K360_PDF_CACHE_TTL (segundos, default 900) y
+K360_PDF_CACHE_MB (default 64).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from .cache import CacheTTL, clave_canonica
+from .metricas import registrar
+
+LISTO = "listo"
+EN_PROCESO = "en_proceso"
+DESCONOCIDO = "desconocido"
+
+
+def _renderizar(datos_cliente, datos_fin, datos_fiscales, datos_asesor, logo_pdf):
+    """Trabajo del worker: importa la capa PDF ahí mismo (fpdf / Pillow).
+
+    Devuelve ((pdf_bytes, error), segundos): el span de crear_pdf se mide en el
+    worker y se registra en el proceso de la app, que es el que expone métricas.
+    """
+    from .pdf import crear_pdf
+
+    inicio = time.perf_counter()
+    resultado = crear_pdf(datos_cliente, datos_fin, datos_fiscales, datos_asesor, logo_pdf=logo_pdf)
+    return resultado, time.perf_counter() - inicio
+
+
+def clave_pdf(datos_cliente, datos_fin, datos_fiscales, datos_asesor, logo_pdf=None) -> str:
+    """Hash del contenido de la propuesta; del logo solo cuenta su sha256."""
+    return clave_canonica("crear_pdf", {
+        "cliente": datos_cliente,
+        "fin": datos_fin,
+        "fiscal": datos_fiscales,
+        "asesor": datos_asesor,
+        "logo": logo_pdf["sha256"] if logo_pdf else None,
+    })
+
+
+class ColaPDF:
+    """Pool de render de PDFs con caché TTL y trabajos en vuelo deduplicados."""
+
+    def __init__(self, workers: int = 2, ejecutor: str = "procesos", ttl: float = 900.0, max_bytes: int = 64 * 1024 * 1024):
+        if ejecutor not in ("procesos", "hilos"):
+            raise ValueError(f"Ejecutor no soportado: {ejecutor!r} (usa 'procesos' o 'hilos').")
+        self.workers = max(1, int(workers))
+        self.ejecutor = ejecutor
+        self.resultados = CacheTTL(max_entradas=256, max_bytes=max_bytes, ttl=ttl)
+        self._pool = None
+        self._en_vuelo = {}  # clave -> (future, inicio)
+        self._errores = {}  # clave -> (None, error), se entrega una vez
+        self._lock = threading.Lock()
+        self.duracion_promedio = 1.0  # segundos (media móvil), para estimar el avance
+
+    def _obtener_pool(self):
+        if self._pool is None:
+            if self.ejecutor == "procesos":
+                # spawn: el servidor de Streamlit tiene hilos, fork no es seguro
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="k360-pdf")
+        return self._pool
+
+    def enviar(self, datos_cliente, datos_fin, datos_fiscales, datos_asesor, logo_pdf=None) -> str:
+        """Encola el PDF (si no está en caché ni en proceso) y devuelve su clave."""
+        clave = clave_pdf(datos_cliente, datos_fin, datos_fiscales, datos_asesor, logo_pdf)
+        with self._lock:
+            if clave in self._en_vuelo or self.resultados.obtener(clave, None) is not None:
+                return clave
+            futuro = self._obtener_pool().submit(
+                _renderizar, datos_cliente, datos_fin, datos_fiscales, datos_asesor, logo_pdf
+            )
+            self._en_vuelo[clave] = (futuro, time.monotonic())
+        futuro.add_done_callback(lambda f, clave=clave: self._terminar(clave, f))
+        return clave
+
+    def _terminar(self, clave: str, futuro) -> None:
+        try:
+            resultado, segundos_render = futuro.result()
+        except Exception as e:  # el worker murió o no se pudo serializar la entrada
+            resultado, segundos_render = (None, str(e)), None
+        with self._lock:
+            _, inicio = self._en_vuelo.get(clave, (None, time.monotonic()))
+            total = time.monotonic() - inicio
+            self.duracion_promedio = 0.8 * self.duracion_promedio + 0.2 * total
+            # Los errores no se cachean: el siguiente clic vuelve a intentar
+            if resultado[1] is None:
+                self.resultados.guardar(clave, resultado)
+            else:
+                self._errores[clave] = resultado
+            self._en_vuelo.pop(clave, None)
+        # Render puro (worker) y total con espera en la cola
+        if segundos_render is not None:
+            registrar("pdf.crear_pdf", segundos_render, error=resultado[1] is not None)
+        registrar("pdf.cola_total", total, error=resultado[1] is not None)
+
+    def estado(self, clave: str):
+        """(estado, resultado, avance): resultado = (pdf_bytes, error) cuando está listo.
+
+        avance es una estimación 0-1 a partir de la duración promedio de los
+        renders anteriores (crear_pdf no reporta su progreso).
+        """
+        with self._lock:
+            en_vuelo = self._en_vuelo.get(clave)
+            if en_vuelo is not None:
+                avance = (time.monotonic() - en_vuelo[1]) / max(self.duracion_promedio, 1e-3)
+                return EN_PROCESO, None, min(0.95, avance)
+            if clave in self._errores:
+                return LISTO, self._errores.pop(clave), 1.0
+        resultado = self.resultados.obtener(clave, None)
+        if resultado is not None:
+            return LISTO, resultado, 1.0
+        return DESCONOCIDO, None, 0.0
+
+    def esperar(self, clave: str, timeout: float | None = None):
+        """Bloquea hasta que el PDF esté listo (para jobs y pruebas, no para la UI).
+
+        Devuelve (pdf_bytes, error), o None si vence el timeout con el PDF aún
+        en proceso (o si la clave no se conoce).
+        """
+        with self._lock:
+            en_vuelo = self._en_vuelo.get(clave)
+        if en_vuelo is not None:
+            try:
+                en_vuelo[0].result(timeout)
+            except TimeoutError:
+                if not en_vuelo[0].done():
+                    return self.estado(clave)[1]
+            except Exception:
+                pass  # _terminar lo registra como error
+            # El callback corre en otro hilo: deja que termine de registrar el resultado
+            while True:
+                with self._lock:
+                    if clave not in self._en_vuelo:
+                        break
+                time.sleep(0.005)
+        return self.estado(clave)[1]
+
+    def cerrar(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+COLA_PDF = ColaPDF(
+    workers=int(os.environ.get("K360_PDF_WORKERS", 2)),
+    ejecutor=os.environ.get("K360_PDF_EJECUTOR", "procesos"),
+    ttl=float(os.environ.get("K360_PDF_CACHE_TTL", 900)),
+    max_bytes=int(float(os.environ.get("K360_PDF_CACHE_MB", 64)) * 1024 * 1024),
+)
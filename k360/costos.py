@@ -0,0 +1,123 @@
+"""Costos de administración del producto (matriz Allianz).
+
+La matriz ya no vive en el código: se lee de un archivo JSON versionado
+(k360/datos/tasas_admin.json, o el que indique K360_TABLA_COSTOS) con una
+tabla por producto y fecha de vigencia. Cada tabla se carga como arreglos
+ordenados y el tramo se resuelve con searchsorted, así que una sola llamada
+resuelve escalares o millones de filas.
+
+Actualizar la tabla = editar / reemplazar el archivo: se vuelve a leer cuando
+cambia su fecha de modificación, sin redeploy.
+"""
+
+import bisect
+import functools
+import json
+import os
+from datetime import date
+
+import numpy as np
+
+RUTA_TABLA_DEFAULT = os.path.join(os.path.dirname(__file__), "datos", "tasas_admin.json")
+PRODUCTO_DEFAULT = "optimaxx"
+
+
+class TablaCostos:
+    """Una matriz de costos vigente: renglones por aportación, columnas por plazo."""
+
+    def __init__(self, producto: str, vigencia: str, montos_min, plazos_min, tasas, tasa_fuera_de_tabla: float, fuente: str = ""):
+        self.producto = producto
+        self.vigencia = vigencia
+        self.fuente = fuente
+        self.montos_min = np.asarray(montos_min, dtype=float)
+        self.plazos_min = np.asarray(plazos_min, dtype=float)
+        self.tasas = np.asarray(tasas, dtype=float)
+        self.tasa_fuera_de_tabla = float(tasa_fuera_de_tabla)
+        # Copias en listas para el camino escalar (bisect sin pasar por NumPy)
+        self._montos = self.montos_min.tolist()
+        self._plazos = self.plazos_min.tolist()
+        self._filas = self.tasas.tolist()
+
+        if self.tasas.shape != (len(self.montos_min), len(self.plazos_min)):
+            raise ValueError(
+                f"Tabla {producto} {vigencia}: tasas debe ser {len(self.montos_min)}x{len(self.plazos_min)}, "
+                f"no {self.tasas.shape[0]}x{self.tasas.shape[1] if self.tasas.ndim == 2 else '?'}."
+            )
+        if np.any(np.diff(self.montos_min) <= 0) or np.any(np.diff(self.plazos_min) <= 0):
+            raise ValueError(f"Tabla {producto} {vigencia}: montos_min y plazos_min deben ser crecientes.")
+
+    def tasa(self, aporte_mensual, plazo_anios):
+        """Tasa de administración; acepta escalares o arreglos (con broadcasting)."""
+        if np.isscalar(aporte_mensual) and np.isscalar(plazo_anios):
+            aporte = float(aporte_mensual)
+            if not aporte >= self._montos[0]:
+                return self.tasa_fuera_de_tabla
+            columna = max(bisect.bisect_right(self._plazos, float(plazo_anios)) - 1, 0)
+            return self._filas[bisect.bisect_right(self._montos, aporte) - 1][columna]
+
+        aporte = np.asarray(aporte_mensual, dtype=float)
+        plazo = np.asarray(plazo_anios, dtype=float)
+
+        renglon = np.searchsorted(self.montos_min, aporte, side="right") - 1
+        columna = np.searchsorted(self.plazos_min, plazo, side="right") - 1
+        # Plazos menores al primer tramo usan la primera columna (como la tabla original)
+        tasas = self.tasas[np.maximum(renglon, 0), np.maximum(columna, 0)]
+        # Aportaciones por debajo del primer renglón (o NaN): tasa por defecto
+        tasas = np.where(aporte >= self.montos_min[0], tasas, self.tasa_fuera_de_tabla)
+
+        if tasas.ndim == 0:
+            return float(tasas)
+        return tasas
+
+
+@functools.lru_cache(maxsize=8)
+def _leer_tablas(ruta: str, _mtime_ns: int) -> dict:
+    """producto -> lista de TablaCostos ordenada por vigencia (cacheado por mtime)."""
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+
+    tablas = {}
+    for producto, versiones in datos["productos"].items():
+        tablas[producto] = sorted(
+            (
+                TablaCostos(
+                    producto=producto,
+                    vigencia=v["vigencia"],
+                    montos_min=v["montos_min"],
+                    plazos_min=v["plazos_min"],
+                    tasas=v["tasas"],
+                    tasa_fuera_de_tabla=v["tasa_fuera_de_tabla"],
+                    fuente=v.get("fuente", ""),
+                )
+                for v in versiones
+            ),
+            key=lambda t: t.vigencia,
+        )
+    return tablas
+
+
+def tabla_vigente(producto: str | None = None, fecha=None, ruta: str | None = None) -> TablaCostos:
+    """Tabla del producto con la vigencia más reciente que no sea posterior a `fecha` (hoy por default)."""
+    ruta = ruta or os.environ.get("K360_TABLA_COSTOS") or RUTA_TABLA_DEFAULT
+    producto = producto or PRODUCTO_DEFAULT
+    if fecha is None:
+        fecha = date.today()
+    if not isinstance(fecha, str):
+        fecha = fecha.isoformat()
+
+    tablas = _leer_tablas(ruta, os.stat(ruta).st_mtime_ns)
+    if producto not in tablas:
+        raise ValueError(f"Producto sin tabla de costos: {producto!r} (disponibles: {', '.join(tablas)}).")
+    vigentes = [t for t in tablas[producto] if t.vigencia <= fecha]
+    if not vigentes:
+        raise ValueError(f"No hay tabla de costos de {producto!r} vigente al {fecha}.")
+    return vigentes[-1]
+
+
+# --- MATRIZ DE COSTOS ALLIANZ (Pág 9 PDF) ---
+def obtener_tasa_admin(aporte_mensual, plazo_anios, producto: str | None = None, fecha=None):
+    """Tasa anual de administración según aportación mensual y plazo (años).
+
+    Escalares -> float; arreglos -> arreglo (una sola búsqueda vectorizada).
+    """
+    return tabla_vigente(producto, fecha).tasa(aporte_mensual, plazo_anios)
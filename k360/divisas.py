@@ -0,0 +1,197 @@
+"""Planes denominados en USD: tipo de cambio MXN/USD y simulación conjunta con rendimientos.
+
+El cliente aporta en pesos (con la misma indexación y devoluciones SAT que el
+motor en MXN); cada flujo se convierte a dólares al tipo de cambio del mes y
+el saldo crece en dólares a la tasa neta del escenario. El saldo se reporta en
+USD y en MXN (saldo USD x tipo de cambio del mes).
+
+Con G_t el producto acumulado de (1 + r_s), tc_t el tipo de cambio y f_u el
+flujo en pesos al cierre del mes u, el saldo en dólares es
+S_t = G_t * sum_{u<=t} f_u / (tc_u * G_u), igual que en montecarlo.
+
+Trayectoria central: tc_inicial * (1 + depreciación)^años o una trayectoria
+anual dada (cierres de año), interpolada geométricamente mes a mes. La
+simulación sortea una sola matriz (escenarios x trayectorias x meses) con
+choques anuales correlacionados de rendimiento y de tipo de cambio
+(lognormal alrededor de la trayectoria central). Todos los escenarios USD
+comparten los mismos choques, así que agregar escenarios no multiplica los
+sorteos.
+
+Con depreciación 0, volatilidades 0 y tipo de cambio constante coincide con
+proyectar_saldos_lote.
+"""
+
+import numpy as np
+
+from .montecarlo import _tasas_mensuales_de_anuales
+from .proyeccion import _flujos_aportes, _tope_y_deduccion
+
+# Supuestos por defecto (editables en la UI)
+TIPO_CAMBIO_INICIAL = 18.5  # MXN por USD
+DEPRECIACION_ANUAL = 0.03  # ~ diferencial de inflación México - EE.UU.
+VOLATILIDAD_TC = 0.12  # anual, del logaritmo del tipo de cambio
+CORRELACION_TC = -0.3  # el peso suele depreciarse cuando caen los mercados
+PERCENTILES = (10, 50, 90)
+
+
+def trayectoria_tipo_cambio(
+    tipo_cambio_inicial: float,
+    total_anos: int,
+    depreciacion_anual: float = 0.0,
+    trayectoria_anual=None,
+) -> np.ndarray:
+    """MXN por USD al cierre de cada mes (12 * total_anos valores).
+
+    trayectoria_anual: tipos de cambio al cierre de cada año (al menos
+    total_anos valores); si se da, sustituye a la depreciación constante.
+    """
+    total_anos = int(total_anos)
+    inicial = float(tipo_cambio_inicial)
+    if inicial <= 0:
+        raise ValueError("El tipo de cambio inicial debe ser positivo.")
+    if trayectoria_anual is None:
+        cierres = inicial * (1.0 + float(depreciacion_anual)) ** np.arange(1, total_anos + 1, dtype=float)
+    else:
+        cierres = np.asarray(trayectoria_anual, dtype=float)[:total_anos]
+        if len(cierres) < total_anos or np.any(cierres <= 0):
+            raise ValueError(f"La trayectoria anual necesita {total_anos} tipos de cambio positivos.")
+    aperturas = np.concatenate(([inicial], cierres[:-1]))
+    k = np.arange(1, 13, dtype=float) / 12.0
+    return (aperturas[:, None] * (cierres / aperturas)[:, None] ** k).ravel()
+
+
+def _saldos_usd(crec_mensual, tipo_cambio, flujos_mxn):
+    """Saldo en USD al cierre de cada mes; crec_mensual y tipo_cambio con el mes en el último eje."""
+    g = np.cumprod(1.0 + crec_mensual, axis=-1)
+    saldos = flujos_mxn / (tipo_cambio * g)
+    np.cumsum(saldos, axis=-1, out=saldos)
+    saldos *= g
+    return saldos
+
+
+def simular_plan_usd(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_bruta_scenario,
+    tasa_admin_real: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    tipo_cambio_inicial: float = TIPO_CAMBIO_INICIAL,
+    depreciacion_anual: float = DEPRECIACION_ANUAL,
+    trayectoria_anual=None,
+    volatilidad_rendimiento=0.0,
+    volatilidad_tc: float = VOLATILIDAD_TC,
+    correlacion: float = CORRELACION_TC,
+    n_trayectorias: int = 0,
+    semilla: int | None = 360,
+    topes_anuales=None,
+):
+    """Plan en USD para uno o varios escenarios (tasa_bruta_scenario escalar o arreglo).
+
+    volatilidad_rendimiento puede ser escalar o uno por escenario. Con
+    n_trayectorias = 0 solo se calcula la trayectoria central.
+
+    Devuelve un dict con arreglos por escenario:
+    - "saldo_fin_aportes_usd", "saldo_objetivo_usd", "saldo_fin_aportes_mxn",
+      "saldo_objetivo_mxn": trayectoria central,
+    - "rango_objetivo_mxn", "rango_objetivo_usd", "rango_fin_aportes_mxn":
+      (escenarios x 3) con P10 / P50 / P90, o None sin simulación,
+    - "media_objetivo_mxn": media de las trayectorias por escenario (o None),
+    - "tipo_cambio": trayectoria central mes a mes y "tipo_cambio_objetivo"
+      como (P10, P50, P90) del tipo de cambio final (central repetido sin simulación).
+    """
+    tasas = np.atleast_1d(np.asarray(tasa_bruta_scenario, dtype=float))
+    k_esc = len(tasas)
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    total_anos = max(0, int(edad_objetivo) - int(edad_actual))
+    anos_aporte = min(max(0, plazo_anos), total_anos)
+    total_meses = total_anos * 12
+    meses_aporte = anos_aporte * 12
+    netas = np.maximum(0.0, tasas - float(tasa_admin_real))
+
+    if total_meses == 0:
+        ceros = np.zeros(k_esc)
+        inicial = float(tipo_cambio_inicial)
+        return {
+            "saldo_fin_aportes_usd": ceros, "saldo_objetivo_usd": ceros,
+            "saldo_fin_aportes_mxn": ceros, "saldo_objetivo_mxn": ceros,
+            "rango_objetivo_mxn": None, "rango_objetivo_usd": None, "rango_fin_aportes_mxn": None,
+            "media_objetivo_mxn": None, "tipo_cambio": np.zeros(0), "tipo_cambio_objetivo": (inicial, inicial, inicial),
+        }
+
+    # Flujos en pesos (mismos que el motor MXN)
+    tope, deduce = _tope_y_deduccion(
+        estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+    )
+    factor_inflacion = (1.0 + float(tasa_inflacion)) if inflacion else 1.0
+    aportes_mes, devoluciones = _flujos_aportes(
+        ahorro_mensual, anos_aporte, factor_inflacion, tope, isr_cliente, deduce,
+    )
+    flujos = np.zeros(total_meses)
+    flujos[:meses_aporte] = np.repeat(aportes_mes, 12)
+    devolucion_final = 0.0
+    if reinvertir_beneficio and anos_aporte:
+        flujos[11:meses_aporte:12] += devoluciones
+        devolucion_final = float(devoluciones[-1])
+    # Antes de la devolución del último año (como saldo_fin_aportes del motor MXN)
+    mes_fin = meses_aporte - 1 if 0 < plazo_anos <= total_anos else total_meses - 1
+    resta_fin = devolucion_final if 0 < plazo_anos <= total_anos else 0.0
+
+    def resumir(saldos_usd, tc):
+        objetivo_usd = saldos_usd[..., -1]
+        fin_usd = saldos_usd[..., mes_fin] - resta_fin / tc[..., mes_fin]
+        return fin_usd, objetivo_usd, fin_usd * tc[..., mes_fin], objetivo_usd * tc[..., -1]
+
+    # Trayectoria central (escenarios x meses)
+    tc_central = trayectoria_tipo_cambio(tipo_cambio_inicial, total_anos, depreciacion_anual, trayectoria_anual)
+    crec_central = np.broadcast_to((netas / 12.0)[:, None], (k_esc, total_meses))
+    fin_usd, obj_usd, fin_mxn, obj_mxn = resumir(_saldos_usd(crec_central, tc_central, flujos), tc_central)
+
+    resultado = {
+        "saldo_fin_aportes_usd": fin_usd, "saldo_objetivo_usd": obj_usd,
+        "saldo_fin_aportes_mxn": fin_mxn, "saldo_objetivo_mxn": obj_mxn,
+        "rango_objetivo_mxn": None, "rango_objetivo_usd": None, "rango_fin_aportes_mxn": None,
+        "media_objetivo_mxn": None, "tipo_cambio": tc_central,
+        "tipo_cambio_objetivo": (float(tc_central[-1]),) * 3,
+    }
+    n = int(n_trayectorias)
+    if n <= 0:
+        return resultado
+
+    # Choques anuales correlacionados: z_r (rendimiento) y z_tc (tipo de cambio)
+    rng = np.random.default_rng(semilla)
+    z = rng.standard_normal(size=(2, n, total_anos))
+    rho = float(np.clip(correlacion, -1.0, 1.0))
+    z_r = z[0]
+    z_tc = rho * z[0] + np.sqrt(1.0 - rho * rho) * z[1]
+
+    # Tipo de cambio: lognormal alrededor de la central (media = central), un choque por año
+    sigma_tc = float(volatilidad_tc)
+    log_ruido = np.cumsum(sigma_tc * z_tc - 0.5 * sigma_tc * sigma_tc, axis=1)  # al cierre de cada año
+    log_ruido = np.concatenate((np.zeros((n, 1)), log_ruido), axis=1)
+    k = np.arange(1, 13, dtype=float) / 12.0
+    mensual = log_ruido[:, :-1, None] + (log_ruido[:, 1:] - log_ruido[:, :-1])[:, :, None] * k
+    tc = tc_central * np.exp(mensual.reshape(n, total_meses))  # trayectorias x meses
+
+    # Rendimientos: un choque por año repartido en 12 meses equivalentes, como montecarlo frecuencia "anual"
+    sigma_r = np.broadcast_to(np.asarray(volatilidad_rendimiento, dtype=float), (k_esc,))
+    anuales = _tasas_mensuales_de_anuales(netas[:, None, None], sigma_r[:, None, None], z_r[None, :, :])
+    crec = np.repeat(anuales, 12, axis=2)
+    np.maximum(crec, -0.99, out=crec)
+
+    fin_usd, obj_usd, fin_mxn, obj_mxn = resumir(_saldos_usd(crec, tc, flujos), tc)
+    resultado["rango_objetivo_mxn"] = np.percentile(obj_mxn, PERCENTILES, axis=1).T
+    resultado["rango_objetivo_usd"] = np.percentile(obj_usd, PERCENTILES, axis=1).T
+    resultado["rango_fin_aportes_mxn"] = np.percentile(fin_mxn, PERCENTILES, axis=1).T
+    resultado["media_objetivo_mxn"] = obj_mxn.mean(axis=1)
+    resultado["tipo_cambio_objetivo"] = tuple(float(x) for x in np.percentile(tc[:, -1], PERCENTILES))
+    return resultado
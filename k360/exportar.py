@@ -0,0 +1,166 @@
+"""Exportación en streaming de filas a CSV y XLSX (sin dependencias externas).
+
+Ambos escritores consumen un iterable de filas (p. ej. iterar_calendario) y
+escriben a un destino binario conforme llegan: nunca se arma la tabla
+completa. El XLSX se genera con zipfile + XML por bloques de filas
+(formato Office Open XML mínimo: un libro, una hoja, formato numérico con
+miles), así que tampoco requiere openpyxl ni xlsxwriter y sirve para
+escribir directo dentro del zip del modo lote.
+
+    with open("calendario.xlsx", "wb") as f:
+        escribir_xlsx(iterar_calendario(**parametros), f, COLUMNAS_CALENDARIO)
+"""
+
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+FORMATOS = ("csv", "xlsx")
+MAX_FILAS_XLSX = 1_048_576  # límite de filas de una hoja de Excel (con encabezado)
+
+_TIPOS_MIME = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def tipo_mime(formato: str) -> str:
+    return _TIPOS_MIME[formato]
+
+
+def escribir_csv(filas, destino, columnas, decimales: int = 2) -> int:
+    """Escribe encabezado + filas a `destino` (binario) en UTF-8 con BOM. Devuelve el número de filas.
+
+    El BOM hace que Excel lea bien los acentos al abrir el CSV con doble clic.
+    """
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="")
+    try:
+        writer = csv.writer(texto)
+        writer.writerow(columnas)
+        n = 0
+        for fila in filas:
+            writer.writerow([round(v, decimales) if isinstance(v, float) else v for v in fila])
+            n += 1
+        texto.flush()
+    finally:
+        texto.detach()  # no cerrar el destino del llamador
+    return n
+
+
+# -----------------------------
+# XLSX mínimo por streaming
+# -----------------------------
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Estilos: 0 = general, 1 = número con miles y 2 decimales (numFmtId 4), 2 = encabezado en negritas
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _columna(indice: int) -> str:
+    """0 -> A, 25 -> Z, 26 -> AA."""
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(referencia: str, valor, estilo_numero: int) -> str:
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        texto = escape(str(valor))
+        return f'<c r="{referencia}" t="inlineStr"><is><t>{texto}</t></is></c>'
+    estilo = f' s="{estilo_numero}"' if isinstance(valor, float) else ""
+    return f'<c r="{referencia}"{estilo}><v>{valor!r}</v></c>'
+
+
+def escribir_xlsx(filas, destino, columnas, hoja: str = "Calendario", filas_por_bloque: int = 2000) -> int:
+    """Escribe un .xlsx de una hoja a `destino` (binario, no necesita seek). Devuelve el número de filas.
+
+    La hoja se escribe en bloques de `filas_por_bloque` filas de XML; los
+    flotantes llevan formato con miles y 2 decimales.
+    """
+    letras = [_columna(i) for i in range(len(columnas))]
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    n = 0
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        libro.writestr("_rels/.rels", _RELS)
+        libro.writestr("xl/workbook.xml", workbook)
+        libro.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        libro.writestr("xl/styles.xml", _STYLES)
+        with libro.open("xl/worksheets/sheet1.xml", "w") as hoja_xml:
+            encabezado = "".join(
+                f'<c r="{letra}1" t="inlineStr" s="2"><is><t>{escape(str(nombre))}</t></is></c>'
+                for letra, nombre in zip(letras, columnas)
+            )
+            hoja_xml.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+                f'<sheetData><row r="1">{encabezado}</row>'
+            ).encode("utf-8"))
+            bloque = []
+            for fila in filas:
+                n += 1
+                r = n + 1
+                if r > MAX_FILAS_XLSX:
+                    raise ValueError(f"La hoja excede {MAX_FILAS_XLSX:,} filas; usa CSV o granularidad anual.")
+                celdas = "".join(_celda(f"{letra}{r}", valor, 1) for letra, valor in zip(letras, fila))
+                bloque.append(f'<row r="{r}">{celdas}</row>')
+                if len(bloque) >= filas_por_bloque:
+                    hoja_xml.write("".join(bloque).encode("utf-8"))
+                    bloque.clear()
+            hoja_xml.write(("".join(bloque) + "</sheetData></worksheet>").encode("utf-8"))
+    return n
+
+
+def escribir(formato: str, filas, destino, columnas) -> int:
+    """Despacha a escribir_csv / escribir_xlsx según `formato`."""
+    if formato == "csv":
+        return escribir_csv(filas, destino, columnas)
+    if formato == "xlsx":
+        return escribir_xlsx(filas, destino, columnas)
+    raise ValueError(f"Formato no soportado: {formato!r} (usa {' / '.join(FORMATOS)}).")
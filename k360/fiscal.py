@@ -0,0 +1,46 @@
+"""Constantes y textos fiscales (MX) de la propuesta."""
+
+from .proyeccion import ESTRATEGIA_ART_151, ESTRATEGIA_ART_185, ESTRATEGIA_ART_93
+
+# -----------------------------
+# CONSTANTES FISCALES (MX) - MVP
+# -----------------------------
+TOPE_ART_151_ABS = 206_367.0  # Tope anual absoluto Art. 151 LISR (estimado, referencia)
+TOPE_ART_185 = 152_000.0  # Tope anual Art. 185 LISR (estimado; ajustable según criterio/actualización)
+FACTOR_CALIBRACION_ALLIANZ = 0.90  # Ajuste calibrado para replicar simulador Allianz en escenario Allianz-style
+
+TEXTOS_ANALISIS = {
+    ESTRATEGIA_ART_151: "Plan Deducible (Art. 151 LISR). Permite deducir aportaciones anuales dentro de los límites establecidos por la ley (10% de ingresos anuales hasta un tope absoluto). La deducción aplica en la declaración anual. Al momento del retiro, el monto acumulado puede considerarse ingreso acumulable; existen exenciones conforme a UMAs vigentes y el excedente podría pagar impuestos. Fecha objetivo para considerar deducibilidad del año: 31 de diciembre (según material del producto).",
+    ESTRATEGIA_ART_185: "Plan con Diferimiento (Art. 185 LISR). Permite deducir aportaciones hasta el tope anual indicado en el material del producto. Al retiro o disposición, podría aplicar la tasa de ISR correspondiente sobre el saldo según reglas vigentes (diferimiento fiscal). Fecha objetivo de referencia: 30 de abril (según material del producto).",
+    ESTRATEGIA_ART_93: "Plan No Deducible (Art. 93 LISR). No genera deducción durante la etapa de ahorro. Al cumplir con requisitos legales aplicables, el saldo podría recibirse de forma exenta.",
+}
+
+
+def analisis_fiscal(estrategia_fiscal: str, ahorro_mensual: float, tope_deducible_anual: float) -> dict:
+    """Texto de análisis y alerta de excedente deducible (primer año) para UI y PDF."""
+    aportacion_primer_ano = float(ahorro_mensual) * 12
+    excedente = 0
+    mostrar_alerta = False
+    texto_alerta = ""
+
+    # Lógica específica por artículo
+    if estrategia_fiscal == ESTRATEGIA_ART_151:
+        if aportacion_primer_ano > tope_deducible_anual:
+            mostrar_alerta = True
+            excedente = aportacion_primer_ano - tope_deducible_anual
+            texto_alerta = (
+                f"Tu aportación anual ({aportacion_primer_ano:,.2f} MXN) excede el tope deducible estimado "
+                f"({tope_deducible_anual:,.2f} MXN). El excedente no es deducible."
+            )
+    elif estrategia_fiscal == ESTRATEGIA_ART_185:
+        if aportacion_primer_ano > tope_deducible_anual:
+            mostrar_alerta = True
+            excedente = aportacion_primer_ano - tope_deducible_anual
+            texto_alerta = "Tu aportación anual excede el tope estimado del Artículo 185."
+
+    return {
+        "texto_analisis": TEXTOS_ANALISIS.get(estrategia_fiscal, ""),
+        "texto_alerta": texto_alerta,
+        "mostrar_alerta": mostrar_alerta,
+        "excedente": excedente,
+    }
@@ -0,0 +1,220 @@
+"""Gráficas (Altair): proyección del detalle mensual (banda Monte Carlo opcional), fase de retiro, backtest, tornado y mapa de calor.
+
+El detalle trae una fila por mes (18→65 = 564 meses x 3 series); antes de
+armar el chart se reduce a un presupuesto de puntos para aligerar el payload
+que viaja a Vega en cada rerun:
+
+- modo "lttb" (default): Largest-Triangle-Three-Buckets sobre el Saldo Neto,
+  conserva la forma (incluidos los saltos de las devoluciones SAT).
+- modo "anual": solo el cierre de cada año.
+- modo None: todas las filas.
+
+En todos los modos se conservan exactos el primer y último mes y los eventos
+clave (fin de aportes, retiro).
+"""
+
+import os
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+SERIES_GRAFICA = ("Saldo Neto", "Aportado", "Devoluciones SAT")
+_COLORES = alt.Scale(domain=['Aportado', 'Saldo Neto', 'Devoluciones SAT'], range=['#ff4b4b', '#1f77b4', '#2ca02c'])
+
+# Puntos por serie que se envían al navegador
+MAX_PUNTOS_GRAFICA = int(os.environ.get("K360_GRAFICA_PUNTOS", 150))
+
+
+def _indices_lttb(x: np.ndarray, y: np.ndarray, n_puntos: int) -> np.ndarray:
+    """Índices elegidos por LTTB (incluye siempre el primero y el último)."""
+    n = len(x)
+    if n_puntos >= n or n_puntos < 3:
+        return np.arange(n)
+
+    indices = np.empty(n_puntos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(np.int64)  # n_puntos - 2 cubetas internas
+    anterior = 0
+    for i in range(n_puntos - 2):
+        inicio, fin = bordes[i], max(bordes[i + 1], bordes[i] + 1)
+        # Vértice siguiente: promedio de la cubeta de adelante (o el último punto)
+        sig_inicio, sig_fin = fin, (bordes[i + 2] if i + 2 < len(bordes) else n)
+        if sig_fin <= sig_inicio:
+            sig_x, sig_y = x[-1], y[-1]
+        else:
+            sig_x, sig_y = x[sig_inicio:sig_fin].mean(), y[sig_inicio:sig_fin].mean()
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - sig_x) * (y[inicio:fin] - ay) - (ax - x[inicio:fin]) * (sig_y - ay))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+
+def indices_grafica(
+    anos: np.ndarray,
+    valores: np.ndarray,
+    modo: str | None = "lttb",
+    max_puntos: int = MAX_PUNTOS_GRAFICA,
+    eventos=(),
+) -> np.ndarray:
+    """Filas a graficar: reducción según `modo` + extremos + eventos (edades)."""
+    anos = np.asarray(anos, dtype=float)
+    n = len(anos)
+    if n == 0:
+        return np.arange(0)
+    if modo is None:
+        return np.arange(n)
+    if modo == "lttb":
+        elegidos = _indices_lttb(anos, np.asarray(valores, dtype=float), int(max_puntos))
+    elif modo == "anual":
+        # Cierres de año: Año = edad + mes / 12 es entero cada 12 meses
+        elegidos = np.flatnonzero(np.isclose(anos, np.round(anos)))
+    else:
+        raise ValueError(f"Modo de gráfica no soportado: {modo!r} (usa 'lttb', 'anual' o None).")
+
+    # Eventos clave, exactos: el mes cuyo Año coincide con la edad del evento
+    clave = [0, n - 1]
+    for edad in eventos:
+        idx = int(np.searchsorted(anos, float(edad) - 1e-9))
+        if idx < n and np.isclose(anos[idx], float(edad)):
+            clave.append(idx)
+    return np.union1d(elegidos, clave)
+
+
+def construir_grafica(
+    df: pd.DataFrame,
+    montecarlo: dict | None = None,
+    alto: int = 400,
+    modo: str | None = "lttb",
+    max_puntos: int = MAX_PUNTOS_GRAFICA,
+    eventos=(),
+):
+    """Chart de Altair a partir del DataFrame de proyectar_detalle_mensual.
+
+    eventos: edades que deben quedar como punto exacto (p. ej. fin de aportes, retiro).
+    """
+    idx = indices_grafica(df["Año"].to_numpy(), df["Saldo Neto"].to_numpy(), modo, max_puntos, eventos)
+    df_chart = df[["Año", *SERIES_GRAFICA]].iloc[idx].melt('Año', var_name='Categoría', value_name='Monto')
+
+    chart = alt.Chart(df_chart).mark_line().encode(
+        x='Año',
+        y='Monto',
+        color=alt.Color('Categoría', scale=_COLORES),
+        tooltip=['Año', 'Categoría', alt.Tooltip('Monto', format='$,.0f')]
+    )
+
+    if montecarlo is not None:
+        anos_banda = np.asarray(montecarlo["Año"])
+        if len(anos_banda) != len(df):  # mismo eje mes a mes: se reutilizan las filas
+            idx = indices_grafica(anos_banda, montecarlo["P90"], modo, max_puntos, eventos)
+        df_banda = pd.DataFrame({k: np.asarray(montecarlo[k])[idx] for k in ("Año", "P10", "P50", "P90")})
+        banda = alt.Chart(df_banda).mark_area(opacity=0.2, color='#1f77b4').encode(
+            x='Año',
+            y=alt.Y('P10', title='Monto'),
+            y2='P90',
+            tooltip=['Año', alt.Tooltip('P10', format='$,.0f'), alt.Tooltip('P50', format='$,.0f'), alt.Tooltip('P90', format='$,.0f')]
+        )
+        chart = banda + chart
+
+    return chart.properties(height=alto)
+
+
+def construir_grafica_retiro(columnas: dict, alto: int = 320, max_puntos: int = MAX_PUNTOS_GRAFICA, eventos=()):
+    """Saldo y retiro neto acumulado de la fase de retiros (columnas de proyectar_retiro)."""
+    anos = np.asarray(columnas["Año"])
+    saldo = np.asarray(columnas["Saldo"])
+    idx = indices_grafica(anos, saldo, "lttb", max_puntos, eventos)
+    df_retiro = pd.DataFrame({
+        "Año": anos[idx],
+        "Saldo": saldo[idx],
+        "Retiro neto acumulado": np.cumsum(columnas["Retiro neto"])[idx],
+    }).melt('Año', var_name='Categoría', value_name='Monto')
+
+    return alt.Chart(df_retiro).mark_line().encode(
+        x='Año',
+        y='Monto',
+        color=alt.Color('Categoría', scale=alt.Scale(domain=['Saldo', 'Retiro neto acumulado'], range=['#1f77b4', '#2ca02c'])),
+        tooltip=['Año', 'Categoría', alt.Tooltip('Monto', format='$,.0f')]
+    ).properties(height=alto)
+
+
+def construir_grafica_backtest(inicio, saldos, referencia: float | None = None, alto: int = 300):
+    """Saldo a edad objetivo por mes de inicio de la ventana histórica (línea = proyección con tasa fija)."""
+    df_bt = pd.DataFrame({"Inicio": pd.to_datetime(np.asarray(inicio)), "Saldo": np.asarray(saldos, dtype=float)})
+    linea = alt.Chart(df_bt).mark_line(color='#1f77b4').encode(
+        x=alt.X('Inicio', title='Inicio de la ventana'),
+        y=alt.Y('Saldo', title='Saldo a edad objetivo'),
+        tooltip=[alt.Tooltip('Inicio', format='%Y-%m'), alt.Tooltip('Saldo', format='$,.0f')]
+    )
+    if referencia is None:
+        return linea.properties(height=alto)
+    regla = alt.Chart(pd.DataFrame({"Saldo": [float(referencia)]})).mark_rule(color='#ff4b4b', strokeDash=[4, 4]).encode(y='Saldo')
+    return (linea + regla).properties(height=alto)
+
+
+def construir_tornado(saldo_base: float, filas: list, alto: int | None = None):
+    """Tornado de analisis_sensibilidad: una barra por variable desde el saldo base.
+
+    Rojo = saldo con -delta, verde = saldo con +delta; las variables quedan
+    ordenadas por impacto (la de mayor impacto arriba).
+    """
+    registros = []
+    for f in filas:
+        for escenario, saldo in (("-delta", f["saldo_bajo"]), ("+delta", f["saldo_alto"])):
+            registros.append({
+                "Variable": f"{f['etiqueta']} ({f['delta']})",
+                "Escenario": escenario,
+                "Saldo": saldo,
+                "Base": float(saldo_base),
+                "Cambio": saldo - float(saldo_base),
+            })
+    df_tornado = pd.DataFrame(registros)
+    orden = [f"{f['etiqueta']} ({f['delta']})" for f in filas]
+
+    barras = alt.Chart(df_tornado).mark_bar().encode(
+        y=alt.Y('Variable', sort=orden, title=None),
+        x=alt.X('Saldo', title='Saldo a edad objetivo', scale=alt.Scale(zero=False)),
+        x2='Base',
+        color=alt.Color('Escenario', scale=alt.Scale(domain=['-delta', '+delta'], range=['#ff4b4b', '#2ca02c'])),
+        tooltip=['Variable', 'Escenario', alt.Tooltip('Saldo', format='$,.0f'), alt.Tooltip('Cambio', format='+$,.0f')]
+    )
+    base = alt.Chart(pd.DataFrame({"Base": [float(saldo_base)]})).mark_rule(color='#333333').encode(x='Base')
+    return (barras + base).properties(height=alto or 40 * max(1, len(filas)))
+
+
+def _bordes(valores: np.ndarray) -> tuple:
+    """Inicio y fin de cada celda: puntos medios entre valores consecutivos."""
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) == 1:
+        return valores - 0.5, valores + 0.5
+    medios = (valores[1:] + valores[:-1]) / 2.0
+    inicio = np.concatenate([[2 * valores[0] - medios[0]], medios])
+    fin = np.concatenate([medios, [2 * valores[-1] - medios[-1]]])
+    return inicio, fin
+
+
+def construir_mapa_calor(rejilla: dict, etiquetas: dict | None = None, alto: int = 420):
+    """Mapa de calor de evaluar_rejilla (celdas inválidas en NaN se omiten)."""
+    etiquetas = etiquetas or {}
+    x_ini, x_fin = _bordes(rejilla["valores_x"])
+    y_ini, y_fin = _bordes(rejilla["valores_y"])
+    saldo = np.asarray(rejilla["saldo"])
+    iy, ix = np.nonzero(~np.isnan(saldo))
+
+    df_mapa = pd.DataFrame({
+        "x": rejilla["valores_x"][ix], "x_ini": x_ini[ix], "x_fin": x_fin[ix],
+        "y": rejilla["valores_y"][iy], "y_ini": y_ini[iy], "y_fin": y_fin[iy],
+        "Saldo": saldo[iy, ix],
+    })
+    titulo_x = etiquetas.get(rejilla["eje_x"], rejilla["eje_x"])
+    titulo_y = etiquetas.get(rejilla["eje_y"], rejilla["eje_y"])
+
+    return alt.Chart(df_mapa).mark_rect().encode(
+        x=alt.X('x_ini:Q', title=titulo_x, scale=alt.Scale(zero=False, nice=False)),
+        x2='x_fin',
+        y=alt.Y('y_ini:Q', title=titulo_y, scale=alt.Scale(zero=False, nice=False)),
+        y2='y_fin',
+        color=alt.Color('Saldo:Q', scale=alt.Scale(scheme='blues'), legend=alt.Legend(format='$,.0s')),
+        tooltip=[alt.Tooltip('x', title=titulo_x), alt.Tooltip('y', title=titulo_y), alt.Tooltip('Saldo', format='$,.0f')]
+    ).properties(height=alto)
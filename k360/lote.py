@@ -0,0 +1,338 @@
+"""Modo lote (sin UI): prospectos en CSV/JSON -> proyecciones, comparador y PDFs.
+
+Uso:
+    python -m k360.lote prospectos.csv --salida propuestas/ --workers 4 --logo logo.png
+    python -m k360.lote prospectos.json --salida propuestas.zip
+
+Columnas: nombre, edad, fin_aportes, retiro, ahorro, estrategia (151 / 93 / 185
+o la etiqueta completa), isr (30, 30% o 0.30), perfil (Conservador / Balanceado /
+Dinámico, sin importar acentos; vacío = Balanceado), asesor. Opcionales:
+telefono, tasa_bruta, inflacion_pct (default 5; 0 = sin inflación),
+reinvertir (si/no), sueldo_anual (si se da, valida el tope Art. 151 con el 10%).
+
+El logo se prepara una sola vez (en memoria) y se comparte con todos los workers. Se
+escribe un PDF por prospecto y un resumen.csv (en el directorio o dentro del zip).
+
+--calendario csv|xlsx agrega el calendario de flujos de cada prospecto
+(--granularidad mensual|anual). Se escribe en streaming desde el motor directo
+al archivo o a la entrada del zip, así que la memoria no crece con el número
+de prospectos ni con el plazo.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .comparador import TASAS_PERFIL, calcular_comparador, escenarios_comparador
+from .costos import obtener_tasa_admin
+from .exportar import FORMATOS, escribir
+from .fiscal import TOPE_ART_151_ABS, TOPE_ART_185, analisis_fiscal
+from .pdf import _logo_desde_archivo, _safe_filename, crear_pdf
+from .proyeccion import (
+    COLUMNAS_CALENDARIO,
+    ESTRATEGIA_ART_151,
+    ESTRATEGIA_ART_185,
+    ESTRATEGIA_ART_93,
+    GRANULARIDADES,
+    iterar_calendario,
+    proyectar_detalle_mensual,
+)
+from .reglas_fiscales import topes_por_anio
+
+COLUMNAS_RESUMEN = [
+    "indice", "nombre", "archivo", "saldo_fin_aportes", "saldo_objetivo",
+    "total_aportado", "beneficio_sat", "tasa_admin_pct", "error",
+]
+
+_VERDADERO = {"1", "si", "sí", "true", "yes", "y", "x"}
+
+
+# -----------------------------
+# Lectura y normalización de prospectos
+# -----------------------------
+def _estrategia(valor) -> str:
+    texto = str(valor or "").strip()
+    for clave, estrategia in (("151", ESTRATEGIA_ART_151), ("185", ESTRATEGIA_ART_185), ("93", ESTRATEGIA_ART_93)):
+        if clave in texto:
+            return estrategia
+    raise ValueError(f"Estrategia fiscal no reconocida: {valor!r}")
+
+
+def _isr(valor) -> float:
+    isr = float(str(valor).replace("%", "").strip())
+    return isr / 100.0 if isr > 1 else isr
+
+
+def _sin_acentos(texto) -> str:
+    return unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii").strip().casefold()
+
+
+def _perfil(valor) -> str:
+    """Perfil por prefijo sin acentos ("dinamico", "Conserv"); vacío = Balanceado."""
+    texto = _sin_acentos(valor)
+    if not texto:
+        return "Balanceado (Recomendado)"
+    for perfil in TASAS_PERFIL:
+        if _sin_acentos(perfil).startswith(texto):
+            return perfil
+    raise ValueError(f"Perfil no reconocido: {valor!r} (usa {', '.join(TASAS_PERFIL)})")
+
+
+def normalizar_prospecto(fila: dict) -> dict:
+    """Convierte una fila cruda (CSV/JSON) en los parámetros que usa la UI."""
+    fila = {str(k).strip().lower(): v for k, v in fila.items()}
+
+    def opcional(clave, default=""):
+        valor = fila.get(clave)
+        return default if valor is None or str(valor).strip() == "" else valor
+
+    edad = int(float(fila["edad"]))
+    perfil = _perfil(opcional("perfil"))
+    inflacion_pct = float(opcional("inflacion_pct", 5.0))
+    sueldo_anual = float(opcional("sueldo_anual", 0.0))
+    fin_aportes = opcional("fin_aportes", opcional("edad_fin_aportes", None))
+    if fin_aportes is None:
+        raise ValueError("Falta la columna fin_aportes")
+
+    return {
+        "nombre": str(fila["nombre"]).strip(),
+        "edad": edad,
+        "edad_fin_aportes": int(float(fin_aportes)),
+        "retiro": int(float(fila["retiro"])),
+        "ahorro_mensual": float(fila["ahorro"]),
+        "estrategia_fiscal": _estrategia(fila.get("estrategia")),
+        "isr_cliente": _isr(fila["isr"]),
+        "perfil": perfil,
+        "tasa_bruta": float(opcional("tasa_bruta", TASAS_PERFIL[perfil])),
+        "inflacion": inflacion_pct > 0,
+        "tasa_inflacion": inflacion_pct / 100.0,
+        "reinvertir_beneficio": str(opcional("reinvertir", "no")).strip().lower() in _VERDADERO,
+        "validar_sueldo": sueldo_anual > 0,
+        "sueldo_anual": sueldo_anual,
+        "asesor": str(opcional("asesor")).strip(),
+        "telefono": str(opcional("telefono")).strip(),
+    }
+
+
+def leer_prospectos(ruta: str) -> list:
+    """Lee un CSV (encabezados) o un JSON (lista de objetos)."""
+    if ruta.lower().endswith(".json"):
+        with open(ruta, encoding="utf-8") as f:
+            return list(json.load(f))
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+# -----------------------------
+# Una propuesta (mismo cálculo que la UI)
+# -----------------------------
+def _parametros_fiscales(p: dict) -> dict:
+    """Parámetros de la proyección que comparten el detalle, el comparador y el calendario."""
+    return dict(
+        inflacion=p["inflacion"],
+        tasa_inflacion=p["tasa_inflacion"],
+        estrategia_fiscal=p["estrategia_fiscal"],
+        validar_sueldo=p["validar_sueldo"],
+        sueldo_anual=p["sueldo_anual"],
+        isr_cliente=p["isr_cliente"],
+        reinvertir_beneficio=p["reinvertir_beneficio"],
+        topes_anuales=topes_por_anio(
+            p["estrategia_fiscal"], p["validar_sueldo"], p["sueldo_anual"], anos=max(1, p["retiro"] - p["edad"])
+        ),
+    )
+
+
+def _tasa_admin(p: dict) -> float:
+    return obtener_tasa_admin(p["ahorro_mensual"], int(p["edad_fin_aportes"] - p["edad"]))
+
+
+def _parametros_detalle(p: dict, tasa_admin_real: float, parametros: dict) -> dict:
+    return dict(
+        ahorro_mensual=p["ahorro_mensual"],
+        edad_actual=p["edad"],
+        edad_fin_aportes=p["edad_fin_aportes"],
+        edad_objetivo=p["retiro"],
+        tasa_bruta_scenario=p["tasa_bruta"],
+        tasa_admin_real=tasa_admin_real,
+        tope_art_151_abs=TOPE_ART_151_ABS,
+        tope_art_185=TOPE_ART_185,
+        **parametros,
+    )
+
+
+def generar_propuesta(p: dict, logo_pdf: dict | None = None):
+    """Devuelve (resumen, pdf_bytes, error) para un prospecto normalizado."""
+    tasa_admin_real = _tasa_admin(p)
+    parametros = _parametros_fiscales(p)
+
+    columnas, saldo_fin_aportes = proyectar_detalle_mensual(**_parametros_detalle(p, tasa_admin_real, parametros))
+    hay_meses = len(columnas["Mes"]) > 0
+    saldo = float(columnas["Saldo Neto"][-1]) if hay_meses else 0.0
+    total_aportado = float(columnas["Aportado"][-1]) if hay_meses else 0.0
+    devoluciones = float(columnas["Devoluciones SAT"][-1]) if hay_meses else 0.0
+
+    _, comparador_pdf = calcular_comparador(
+        escenarios_comparador(p["tasa_bruta"]),
+        ahorro_mensual=p["ahorro_mensual"],
+        edad=p["edad"],
+        edad_fin_aportes=p["edad_fin_aportes"],
+        retiro=p["retiro"],
+        tasa_bruta=p["tasa_bruta"],
+        tasa_admin_real=tasa_admin_real,
+        **parametros,
+    )
+
+    analisis = analisis_fiscal(p["estrategia_fiscal"], p["ahorro_mensual"], float(parametros["topes_anuales"][0]))
+
+    pdf_bytes, error = crear_pdf(
+        {'nombre': p["nombre"], 'edad': p["edad"], 'edad_fin_aportes': p["edad_fin_aportes"], 'retiro': p["retiro"], 'estrategia': p["estrategia_fiscal"]},
+        {
+            'aporte_mensual': p["ahorro_mensual"],
+            'saldo_fin_aportes': saldo_fin_aportes,
+            'saldo_final': saldo,
+            'beneficio_sat': devoluciones,
+            'tasa_admin_pct': tasa_admin_real * 100,
+            'total_aportado': total_aportado,
+            'comparador': comparador_pdf
+        },
+        {'texto_analisis': analisis["texto_analisis"], 'alerta_excedente': analisis["texto_alerta"]},
+        {'nombre': p["asesor"], 'telefono': p["telefono"]},
+        logo_pdf=logo_pdf,
+    )
+
+    resumen = {
+        "nombre": p["nombre"],
+        "saldo_fin_aportes": round(saldo_fin_aportes, 2),
+        "saldo_objetivo": round(saldo, 2),
+        "total_aportado": round(total_aportado, 2),
+        "beneficio_sat": round(devoluciones, 2),
+        "tasa_admin_pct": round(tasa_admin_real * 100, 4),
+    }
+    return resumen, pdf_bytes, error
+
+
+def _procesar(tarea):
+    """Worker del pool: (indice, fila cruda, logo preparado) -> (resumen, pdf_bytes)."""
+    indice, fila, logo_pdf = tarea
+    resumen = {"indice": indice, "nombre": str(fila.get("nombre", "")).strip()}
+    try:
+        p = normalizar_prospecto(fila)
+        datos, pdf_bytes, error = generar_propuesta(p, logo_pdf)
+        resumen.update(datos)
+        if error:
+            resumen["error"] = error
+            pdf_bytes = None
+        else:
+            resumen["archivo"] = f"Propuesta_Krece360_{indice:04d}_{_safe_filename(p['nombre'])}.pdf"
+    except Exception as e:
+        resumen["error"] = str(e)
+        pdf_bytes = None
+    return resumen, pdf_bytes
+
+
+# -----------------------------
+# Orquestación del lote
+# -----------------------------
+def calendario_prospecto(p: dict, granularidad: str = "mensual"):
+    """Generador de filas del calendario (COLUMNAS_CALENDARIO) de un prospecto normalizado."""
+    parametros = _parametros_detalle(p, _tasa_admin(p), _parametros_fiscales(p))
+    return iterar_calendario(**parametros, granularidad=granularidad)
+
+
+def ejecutar_lote(
+    prospectos: list,
+    salida: str,
+    workers: int = os.cpu_count() or 1,
+    ruta_logo: str | None = None,
+    calendario: str | None = None,
+    granularidad: str = "mensual",
+) -> list:
+    """Genera todas las propuestas; salida es un directorio o un archivo .zip.
+
+    calendario ("csv" / "xlsx") agrega por prospecto el calendario de flujos
+    con la granularidad dada; se calcula en este proceso al recibir cada
+    resultado (el motor es barato) y se escribe sin armar la tabla en memoria.
+
+    Devuelve la lista de resúmenes (una fila por prospecto, con "error" si falló).
+    """
+    if calendario is not None and calendario not in FORMATOS:
+        raise ValueError(f"Formato de calendario no soportado: {calendario!r} (usa {' / '.join(FORMATOS)}).")
+    logo_pdf = _logo_desde_archivo(ruta_logo)
+    tareas = [(i, fila, logo_pdf) for i, fila in enumerate(prospectos, start=1)]
+
+    como_zip = salida.lower().endswith(".zip")
+    if como_zip:
+        destino = zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED)
+    else:
+        os.makedirs(salida, exist_ok=True)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    resumenes = []
+    try:
+        if pool is None:
+            resultados = map(_procesar, tareas)
+        else:
+            resultados = pool.map(_procesar, tareas, chunksize=max(1, len(tareas) // (workers * 4)))
+
+        for resumen, pdf_bytes in resultados:
+            resumenes.append(resumen)
+            if pdf_bytes is None:
+                continue
+            if como_zip:
+                destino.writestr(resumen["archivo"], pdf_bytes)
+            else:
+                with open(os.path.join(salida, resumen["archivo"]), "wb") as f:
+                    f.write(pdf_bytes)
+            if calendario is not None:
+                filas = calendario_prospecto(normalizar_prospecto(prospectos[resumen["indice"] - 1]), granularidad)
+                nombre = resumen["archivo"].replace("Propuesta_", "Calendario_", 1)[:-len(".pdf")] + f".{calendario}"
+                with destino.open(nombre, "w") if como_zip else open(os.path.join(salida, nombre), "wb") as f:
+                    escribir(calendario, filas, f, COLUMNAS_CALENDARIO)
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNAS_RESUMEN, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(resumenes)
+        if como_zip:
+            destino.writestr("resumen.csv", buffer.getvalue())
+        else:
+            with open(os.path.join(salida, "resumen.csv"), "w", encoding="utf-8", newline="") as f:
+                f.write(buffer.getvalue())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if como_zip:
+            destino.close()
+
+    return resumenes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera propuestas Krece360 en lote.")
+    parser.add_argument("prospectos", help="CSV o JSON de prospectos")
+    parser.add_argument("--salida", default="propuestas", help="Directorio o archivo .zip de salida")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    parser.add_argument("--logo", default=None, help="Logo del asesor (PNG/JPG) para todas las propuestas")
+    parser.add_argument("--calendario", choices=FORMATOS, default=None, help="Exporta también el calendario de flujos")
+    parser.add_argument("--granularidad", choices=GRANULARIDADES, default="mensual", help="Filas del calendario")
+    args = parser.parse_args(argv)
+
+    resumenes = ejecutar_lote(
+        leer_prospectos(args.prospectos), args.salida, args.workers, args.logo,
+        calendario=args.calendario, granularidad=args.granularidad,
+    )
+    errores = [r for r in resumenes if r.get("error")]
+    print(f"{len(resumenes) - len(errores)} propuestas generadas en {args.salida}; {len(errores)} con error.")
+    for r in errores:
+        print(f"  #{r['indice']} {r['nombre']}: {r['error']}", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
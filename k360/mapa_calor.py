@@ -0,0 +1,78 @@
+"""Mapas de calor del saldo a edad objetivo sobre una rejilla de dos supuestos.
+
+La rejilla se evalúa en una sola llamada a proyectar_saldos_lote: un eje va
+como fila (forma 1 x n) y el otro como columna (m x 1), y el broadcasting
+arma las m x n celdas. El costo de administración se toma de
+obtener_tasa_admin por celda (una búsqueda vectorizada sobre los ejes) y los
+topes fiscales los aplica el motor en cada celda.
+"""
+
+import numpy as np
+
+from .costos import obtener_tasa_admin
+from .proyeccion import proyectar_saldos_lote
+
+# Ejes soportados: argumento de proyectar_saldos_lote -> etiqueta
+EJES_REJILLA = {
+    "ahorro_mensual": "Ahorro mensual",
+    "tasa_bruta_scenario": "Tasa bruta",
+    "edad_fin_aportes": "Fin de aportaciones",
+    "edad_objetivo": "Edad objetivo",
+}
+
+_EJES_ENTEROS = {"edad_fin_aportes", "edad_objetivo"}
+
+
+def evaluar_rejilla(
+    eje_x: str,
+    valores_x,
+    eje_y: str,
+    valores_y,
+    tasa_admin_real: float | None = None,
+    **parametros,
+) -> dict:
+    """Saldo a edad objetivo para cada combinación (valores_y[i], valores_x[j]).
+
+    `parametros` son los demás argumentos por nombre de proyectar_saldos_lote.
+    Si tasa_admin_real es None se usa obtener_tasa_admin por celda. Las
+    celdas inválidas (fin de aportes <= edad actual o edad objetivo < fin de
+    aportes) quedan en NaN.
+
+    Devuelve un dict con eje_x, eje_y, valores_x, valores_y y "saldo"
+    (arreglo len(valores_y) x len(valores_x)).
+    """
+    for eje in (eje_x, eje_y):
+        if eje not in EJES_REJILLA:
+            raise ValueError(f"Eje no soportado: {eje!r} (usa {', '.join(EJES_REJILLA)}).")
+    if eje_x == eje_y:
+        raise ValueError("Los dos ejes de la rejilla deben ser distintos.")
+
+    tipo = {eje: (np.int64 if eje in _EJES_ENTEROS else float) for eje in (eje_x, eje_y)}
+    valores_x = np.asarray(valores_x, dtype=tipo[eje_x])
+    valores_y = np.asarray(valores_y, dtype=tipo[eje_y])
+
+    argumentos = dict(parametros)
+    argumentos[eje_x] = valores_x[np.newaxis, :]
+    argumentos[eje_y] = valores_y[:, np.newaxis]
+
+    edad_actual = np.asarray(argumentos["edad_actual"], dtype=np.int64)
+    edad_fin = np.asarray(argumentos["edad_fin_aportes"], dtype=np.int64)
+    edad_obj = np.asarray(argumentos["edad_objetivo"], dtype=np.int64)
+
+    if tasa_admin_real is None:
+        tasa_admin_real = obtener_tasa_admin(np.asarray(argumentos["ahorro_mensual"], dtype=float), edad_fin - edad_actual)
+
+    _, saldo, _ = proyectar_saldos_lote(tasa_admin_real=tasa_admin_real, **argumentos)
+    forma = (len(valores_y), len(valores_x))
+    saldo = np.broadcast_to(saldo, forma).copy()
+
+    invalida = np.broadcast_to((edad_fin <= edad_actual) | (edad_obj < edad_fin), forma)
+    saldo[invalida] = np.nan
+
+    return {
+        "eje_x": eje_x,
+        "eje_y": eje_y,
+        "valores_x": valores_x,
+        "valores_y": valores_y,
+        "saldo": saldo,
+    }
@@ -0,0 +1,110 @@
+"""Calculadora inversa: qué se necesita para llegar a un saldo meta a la edad objetivo.
+
+Cada iteración evalúa una rejilla de candidatos en una sola llamada a
+proyectar_saldos_lote y se queda con el sub-intervalo donde se cruza la meta
+(bracketing). El saldo es monótono creciente en la aportación, la tasa bruta
+y la edad de fin de aportes, incluso con los saltos del costo de
+administración (más aportación o más plazo = menor tasa admin), así que el
+resultado es el menor valor que alcanza la meta.
+
+`parametros` son los mismos argumentos por nombre de proyectar_saldos_lote,
+salvo el que se resuelve. Si no se da tasa_admin_real se toma de
+obtener_tasa_admin para cada candidato.
+"""
+
+import numpy as np
+
+from .costos import obtener_tasa_admin
+from .proyeccion import proyectar_saldos_lote
+
+PUNTOS_POR_ITERACION = 33
+MAX_ITERACIONES = 12
+
+
+def _tasas_admin(aportes, plazos):
+    return obtener_tasa_admin(np.asarray(aportes, dtype=float), np.asarray(plazos))
+
+
+def _buscar_minimo(evaluar, saldo_meta: float, minimo: float, maximo: float, tolerancia: float):
+    """Menor x en [minimo, maximo] con evaluar(x) >= saldo_meta (None si no se alcanza)."""
+    lo, hi = float(minimo), float(maximo)
+    extremos = evaluar(np.array([lo, hi]))
+    if extremos[1] < saldo_meta:
+        return None
+    if extremos[0] >= saldo_meta:
+        return lo
+    for _ in range(MAX_ITERACIONES):
+        if hi - lo <= tolerancia:
+            break
+        candidatos = np.linspace(lo, hi, PUNTOS_POR_ITERACION)
+        alcanza = evaluar(candidatos) >= saldo_meta
+        idx = int(np.argmax(alcanza))  # primer candidato que alcanza (hi siempre alcanza)
+        lo, hi = candidatos[max(idx - 1, 0)], candidatos[idx]
+    return float(hi)
+
+
+def ahorro_requerido(
+    saldo_meta: float,
+    ahorro_maximo: float = 1_000_000.0,
+    tolerancia: float = 0.01,
+    tasa_admin_real: float | None = None,
+    **parametros,
+):
+    """Aportación mensual mínima (al centavo) para llegar a saldo_meta; None si excede ahorro_maximo."""
+    plazo = int(parametros["edad_fin_aportes"]) - int(parametros["edad_actual"])
+
+    def evaluar(aportes):
+        admin = tasa_admin_real if tasa_admin_real is not None else _tasas_admin(aportes, plazo)
+        _, saldo_obj, _ = proyectar_saldos_lote(ahorro_mensual=aportes, tasa_admin_real=admin, **parametros)
+        return saldo_obj
+
+    return _buscar_minimo(evaluar, float(saldo_meta), 0.0, ahorro_maximo, tolerancia)
+
+
+def tasa_bruta_requerida(
+    saldo_meta: float,
+    tasa_maxima: float = 0.50,
+    tolerancia: float = 1e-6,
+    tasa_admin_real: float | None = None,
+    **parametros,
+):
+    """Tasa bruta anual mínima para llegar a saldo_meta; None si excede tasa_maxima."""
+    if tasa_admin_real is None:
+        plazo = int(parametros["edad_fin_aportes"]) - int(parametros["edad_actual"])
+        tasa_admin_real = obtener_tasa_admin(float(parametros["ahorro_mensual"]), plazo)
+
+    def evaluar(tasas):
+        _, saldo_obj, _ = proyectar_saldos_lote(
+            tasa_bruta_scenario=tasas, tasa_admin_real=tasa_admin_real, **parametros
+        )
+        return saldo_obj
+
+    return _buscar_minimo(evaluar, float(saldo_meta), 0.0, tasa_maxima, tolerancia)
+
+
+def edad_fin_aportes_requerida(
+    saldo_meta: float,
+    tasa_admin_real: float | None = None,
+    **parametros,
+):
+    """Edad más temprana a la que se puede dejar de aportar y aun llegar a saldo_meta.
+
+    Aportar más años siempre sube el saldo, así que cualquier edad posterior
+    (hasta edad_objetivo) también es factible. Las edades son enteras: se
+    evalúan todas las candidatas en una sola llamada. None si ni aportando
+    hasta edad_objetivo se alcanza la meta.
+    """
+    edad_actual = int(parametros["edad_actual"])
+    edades = np.arange(edad_actual + 1, int(parametros["edad_objetivo"]) + 1)
+    if edades.size == 0:
+        return None
+    if tasa_admin_real is None:
+        tasa_admin_real = _tasas_admin(parametros["ahorro_mensual"], edades - edad_actual)
+
+    _, saldo_obj, _ = proyectar_saldos_lote(
+        edad_fin_aportes=edades, tasa_admin_real=tasa_admin_real, **parametros
+    )
+    alcanza = saldo_obj >= float(saldo_meta)
+    if not alcanza.any():
+        return None
+    return int(edades[int(np.argmax(alcanza))])
@@ -0,0 +1,290 @@
+"""Instrumentación por etapa: spans de tiempo / memoria, histogramas y exposición.
+
+    with span("comparador"):
+        ...
+
+    @instrumentar("grafica.construir")
+    def construir_grafica(...): ...
+
+Cada span registra duración, pico de memoria (si tracemalloc está activo:
+K360_METRICAS_MEMORIA=1) y los hits / misses de la caché de proyecciones
+hechos por el propio hilo durante el span (cada sesión de Streamlit corre en
+su hilo, así que otras sesiones no se cuelan en el conteo). El pico de
+memoria es aproximado con sesiones concurrentes: tracemalloc es de todo el
+proceso, así que incluye lo que otros hilos asignen durante el span y un
+span que empieza reinicia el pico de los que ya estaban abiertos en otros
+hilos. Los valores se agregan por nombre en histogramas con cubetas
+fijas (estilo Prometheus) más una ventana de las últimas N duraciones para
+percentiles exactos en el panel.
+
+Salidas:
+- logs JSON por span en el logger "k360.metricas" (nivel INFO, si está activo),
+- texto Prometheus (texto_prometheus) y un servidor HTTP opcional en
+  K360_METRICAS_PUERTO (GET /metrics, sin autenticación: escucha en
+  127.0.0.1 salvo que K360_METRICAS_HOST diga otra cosa),
+- resumen() para el panel de administración.
+
+K360_METRICAS=0 desactiva todo (instrumentar devuelve la función sin envolver).
+"""
+
+import functools
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from .cache import CACHE_PROYECCIONES
+
+ACTIVAS = os.environ.get("K360_METRICAS", "1") != "0"
+CUBETAS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBETAS_BYTES = tuple(float(2 ** k) for k in range(16, 31, 2))  # 64 KB .. 1 GB
+VENTANA_PERCENTILES = 1024
+
+_logger = logging.getLogger("k360.metricas")
+
+if ACTIVAS and os.environ.get("K360_METRICAS_MEMORIA") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+class Histograma:
+    """Conteo acumulado por cubeta (le), suma y total, como un histograma de Prometheus."""
+
+    def __init__(self, cubetas):
+        self.cubetas = tuple(cubetas)
+        self.conteos = [0] * (len(self.cubetas) + 1)  # la última es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        indice = len(self.cubetas)
+        for i, limite in enumerate(self.cubetas):
+            if valor <= limite:
+                indice = i
+                break
+        self.conteos[indice] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        """[(le, conteo acumulado)] incluyendo +Inf."""
+        salida, acumulado = [], 0
+        for limite, conteo in zip((*self.cubetas, float("inf")), self.conteos):
+            acumulado += conteo
+            salida.append((limite, acumulado))
+        return salida
+
+
+class _Serie:
+    def __init__(self):
+        self.duracion = Histograma(CUBETAS_SEGUNDOS)
+        self.memoria = Histograma(CUBETAS_BYTES)
+        self.recientes = deque(maxlen=VENTANA_PERCENTILES)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.errores = 0
+
+
+class RegistroMetricas:
+    """Series por nombre de span (thread-safe)."""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre: str, segundos: float, pico_bytes: float | None = None,
+                  cache_hits: int = 0, cache_misses: int = 0, error: bool = False) -> None:
+        with self._lock:
+            serie = self._series.get(nombre)
+            if serie is None:
+                serie = self._series[nombre] = _Serie()
+            serie.duracion.observar(segundos)
+            serie.recientes.append(segundos)
+            if pico_bytes is not None:
+                serie.memoria.observar(pico_bytes)
+            serie.cache_hits += cache_hits
+            serie.cache_misses += cache_misses
+            serie.errores += int(error)
+        if _logger.isEnabledFor(logging.INFO):
+            _logger.info(json.dumps({
+                "span": nombre, "ms": round(segundos * 1000.0, 3), "pico_bytes": pico_bytes,
+                "cache_hits": cache_hits, "cache_misses": cache_misses, "error": error,
+            }))
+
+    def resumen(self) -> list:
+        """Una fila por span: conteo, p50 / p95 / p99 / máx (ms) de la ventana, memoria y caché."""
+        with self._lock:
+            copia = {n: (list(s.recientes), s.duracion.total, s.duracion.suma, s.memoria, s.cache_hits, s.cache_misses, s.errores)
+                     for n, s in self._series.items()}
+        filas = []
+        for nombre, (recientes, total, suma, memoria, hits, misses, errores) in sorted(copia.items()):
+            ms = np.asarray(recientes) * 1000.0
+            p50, p95, p99 = np.percentile(ms, (50, 95, 99)) if len(ms) else (0.0, 0.0, 0.0)
+            filas.append({
+                "span": nombre,
+                "conteo": total,
+                "promedio_ms": suma / total * 1000.0 if total else 0.0,
+                "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                "max_ms": float(ms.max()) if len(ms) else 0.0,
+                "pico_memoria_kb_prom": memoria.suma / memoria.total / 1024.0 if memoria.total else None,
+                "cache_hits": hits, "cache_misses": misses, "errores": errores,
+            })
+        return filas
+
+    def texto_prometheus(self) -> str:
+        """Formato de exposición de texto de Prometheus (0.0.4)."""
+        with self._lock:
+            series = [(n, s.duracion.acumulados(), s.duracion.suma, s.duracion.total,
+                       s.memoria.acumulados(), s.memoria.suma, s.memoria.total, s.cache_hits, s.cache_misses, s.errores)
+                      for n, s in sorted(self._series.items())]
+
+        def le(valor):
+            return "+Inf" if valor == float("inf") else repr(float(valor))
+
+        lineas = [
+            "# HELP k360_span_segundos Duración de cada etapa instrumentada.",
+            "# TYPE k360_span_segundos histogram",
+        ]
+        for nombre, cubetas, suma, total, *_ in series:
+            lineas += [f'k360_span_segundos_bucket{{span="{nombre}",le="{le(l)}"}} {c}' for l, c in cubetas]
+            lineas += [f'k360_span_segundos_sum{{span="{nombre}"}} {suma!r}', f'k360_span_segundos_count{{span="{nombre}"}} {total}']
+        lineas += [
+            "# HELP k360_span_memoria_pico_bytes Pico de memoria (tracemalloc) por etapa.",
+            "# TYPE k360_span_memoria_pico_bytes histogram",
+        ]
+        for nombre, _, _, _, cubetas, suma, total, *_ in series:
+            if total:
+                lineas += [f'k360_span_memoria_pico_bytes_bucket{{span="{nombre}",le="{le(l)}"}} {c}' for l, c in cubetas]
+                lineas += [f'k360_span_memoria_pico_bytes_sum{{span="{nombre}"}} {suma!r}',
+                           f'k360_span_memoria_pico_bytes_count{{span="{nombre}"}} {total}']
+        for metrica, indice, ayuda in (
+            ("k360_span_cache_hits_total", 7, "Hits de la caché de proyecciones durante la etapa."),
+            ("k360_span_cache_misses_total", 8, "Misses de la caché de proyecciones durante la etapa."),
+            ("k360_span_errores_total", 9, "Etapas que terminaron con excepción."),
+        ):
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} counter"]
+            lineas += [f'{metrica}{{span="{s[0]}"}} {s[indice]}' for s in series]
+        return "\n".join(lineas) + "\n"
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+REGISTRO = RegistroMetricas()
+
+# Pila de spans abiertos por hilo, para que un span anidado no borre el pico del exterior
+_pila = threading.local()
+
+
+class span:
+    """Context manager: mide la etapa `nombre` y la registra en REGISTRO."""
+
+    __slots__ = ("nombre", "_inicio", "_memoria_inicio", "_pico_hijos", "_hits", "_misses")
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            pila = getattr(_pila, "spans", None)
+            if pila is None:
+                pila = _pila.spans = []
+            if pila:
+                pila[-1]._pico_hijos = max(pila[-1]._pico_hijos, pico)
+            tracemalloc.reset_peak()
+            self._memoria_inicio = actual
+            self._pico_hijos = actual
+            pila.append(self)
+        else:
+            self._memoria_inicio = None
+        self._hits, self._misses = CACHE_PROYECCIONES.conteo_hilo()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        segundos = time.perf_counter() - self._inicio
+        pico_bytes = None
+        if self._memoria_inicio is not None and tracemalloc.is_tracing():
+            pico = max(tracemalloc.get_traced_memory()[1], self._pico_hijos)
+            pico_bytes = float(pico - self._memoria_inicio)
+            pila = _pila.spans
+            if pila and pila[-1] is self:
+                pila.pop()
+            if pila:
+                pila[-1]._pico_hijos = max(pila[-1]._pico_hijos, pico)
+        # st.stop / st.rerun se implementan con excepciones: no cuentan como error
+        error = tipo is not None and issubclass(tipo, Exception) and "Stop" not in tipo.__name__ and "Rerun" not in tipo.__name__
+        hits, misses = CACHE_PROYECCIONES.conteo_hilo()
+        REGISTRO.registrar(self.nombre, segundos, pico_bytes, hits - self._hits, misses - self._misses, error)
+        return False
+
+
+def instrumentar(nombre: str):
+    """Decorador: cada llamada es un span `nombre`."""
+    def decorar(fn):
+        if not ACTIVAS:
+            return fn
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            with span(nombre):
+                return fn(*args, **kwargs)
+
+        return envoltura
+
+    return decorar
+
+
+def registrar(nombre: str, segundos: float, pico_bytes: float | None = None, error: bool = False) -> None:
+    """Registra una medición hecha en otro lado (p. ej. en un worker de PDFs)."""
+    if ACTIVAS:
+        REGISTRO.registrar(nombre, segundos, pico_bytes, error=error)
+
+
+# -----------------------------
+# Endpoint Prometheus
+# -----------------------------
+class _ManejadorMetricas(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        cuerpo = REGISTRO.texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):  # sin ruido en stderr por cada scrape
+        pass
+
+
+_servidor = None
+_servidor_lock = threading.Lock()
+
+
+def iniciar_servidor_metricas(puerto: int | None = None, host: str | None = None):
+    """Sirve /metrics en un hilo daemon (una sola vez por proceso). None si no hay puerto.
+
+    El endpoint no tiene autenticación: por default solo escucha en
+    127.0.0.1 (el Prometheus local o un sidecar). Exponerlo en otra interfaz
+    (K360_METRICAS_HOST=0.0.0.0) solo detrás de una red privada.
+    """
+    global _servidor
+    puerto = puerto if puerto is not None else os.environ.get("K360_METRICAS_PUERTO")
+    host = host or os.environ.get("K360_METRICAS_HOST", "127.0.0.1")
+    if not ACTIVAS or not puerto:
+        return None
+    with _servidor_lock:
+        if _servidor is None:
+            _servidor = http.server.ThreadingHTTPServer((host, int(puerto)), _ManejadorMetricas)
+            threading.Thread(target=_servidor.serve_forever, name="k360-metricas", daemon=True).start()
+    return _servidor
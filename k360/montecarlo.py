@@ -0,0 +1,151 @@
+"""Simulación Monte Carlo de los perfiles de inversión K360.
+
+Las tasas de perfil son supuestos deterministas; aquí se sortean trayectorias
+de rendimiento (media / volatilidad por perfil) como una matriz
+trayectorias x meses y se obtienen bandas P10 / P50 / P90 del saldo.
+
+Todo el flujo (aportaciones indexadas, costo de administración y devoluciones
+SAT reinvertidas) pasa en una sola operación vectorizada: con G_t el producto
+acumulado de (1 + r_s) y f_u el flujo depositado al cierre del mes u,
+S_t = G_t * sum_{u<=t} f_u / G_u.
+"""
+
+import numpy as np
+
+from .costos import obtener_tasa_admin
+from .proyeccion import _flujos_aportes, _tope_y_deduccion
+
+# Supuestos por perfil: (rendimiento bruto medio anual, volatilidad anual)
+PERFILES_MONTECARLO = {
+    "Conservador": (0.06, 0.05),
+    "Balanceado (Recomendado)": (0.085, 0.10),
+    "Dinámico (Optimista)": (0.105, 0.16),
+}
+
+PERCENTILES = (10, 50, 90)
+
+
+def _tasas_mensuales_de_anuales(tasa_neta, volatilidad, z) -> np.ndarray:
+    """Tasa mensual equivalente (1 + R) ** (1/12) - 1 de cada rendimiento anual R.
+
+    R = (1 + tasa_neta/12) ** 12 - 1 + volatilidad * z, con z normal estándar:
+    su media es el efectivo anual del motor determinista, así que E[1 + R] es
+    su factor anual y con volatilidad 0 la tasa mensual es tasa_neta / 12.
+    Capitalizar R/12 doce meses sobrestimaría la media en ~volatilidad² / 2
+    por año. Los argumentos se combinan por broadcasting.
+    """
+    factor = (1.0 + np.asarray(tasa_neta, dtype=float) / 12.0) ** 12 + np.asarray(volatilidad, dtype=float) * z
+    np.maximum(factor, 0.0, out=factor)
+    factor **= 1.0 / 12.0
+    factor -= 1.0
+    return factor
+
+
+def simular_montecarlo(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_media: float,
+    volatilidad: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    tasa_admin_real: float | None = None,
+    n_trayectorias: int = 10_000,
+    frecuencia: str = "anual",
+    semilla: int | None = 360,
+    topes_anuales=None,
+):
+    """Bandas P10 / P50 / P90 del saldo mes a mes.
+
+    - frecuencia="anual": un rendimiento efectivo por año y trayectoria,
+      repartido en 12 meses equivalentes; "mensual": un rendimiento por mes.
+      En ambos casos la media del saldo es la del motor determinista.
+    - tasa_admin_real: si es None se toma de obtener_tasa_admin.
+    - semilla fija = resultados reproducibles entre reruns.
+    - topes_anuales: tope deducible por año (reglas_fiscales.topes_por_anio).
+
+    Devuelve un dict con "Año", "P10", "P50", "P90" (arreglos por mes),
+    "saldo_fin_aportes" / "saldo_objetivo" como tuplas (p10, p50, p90) y
+    "saldo_objetivo_media" (media de las trayectorias).
+    Con volatilidad 0 coincide con proyectar_detalle_mensual.
+    """
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    total_anos = max(0, int(edad_objetivo) - int(edad_actual))
+    anos_aporte = min(max(0, plazo_anos), total_anos)
+    total_meses = total_anos * 12
+    meses_aporte = anos_aporte * 12
+    n = int(n_trayectorias)
+
+    if tasa_admin_real is None:
+        tasa_admin_real = obtener_tasa_admin(ahorro_mensual, plazo_anos)
+    admin = float(tasa_admin_real)
+
+    if total_meses == 0 or n <= 0:
+        vacio = np.zeros(0)
+        return {
+            "Año": vacio, "P10": vacio, "P50": vacio, "P90": vacio,
+            "saldo_fin_aportes": (0.0, 0.0, 0.0), "saldo_objetivo": (0.0, 0.0, 0.0),
+            "saldo_objetivo_media": 0.0,
+        }
+
+    # Matriz de tasas netas mensuales (trayectorias x meses)
+    rng = np.random.default_rng(semilla)
+    if frecuencia == "anual":
+        z = rng.standard_normal(size=(n, total_anos))
+        anuales = _tasas_mensuales_de_anuales(float(tasa_media) - admin, float(volatilidad), z)
+        crec = np.repeat(anuales, 12, axis=1)
+    elif frecuencia == "mensual":
+        crec = rng.normal(float(tasa_media) / 12.0, float(volatilidad) / np.sqrt(12.0), size=(n, total_meses))
+        crec -= admin / 12.0
+    else:
+        raise ValueError(f"Frecuencia no soportada: {frecuencia!r} (usa 'anual' o 'mensual').")
+
+    # Un mes no puede perder más del 99% del saldo
+    np.maximum(crec, -0.99, out=crec)
+    crec += 1.0
+    np.cumprod(crec, axis=1, out=crec)  # G_t
+
+    # Flujos deterministas: aportaciones y devoluciones reinvertidas al cierre de año
+    tope, deduce = _tope_y_deduccion(
+        estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+    )
+    factor_inflacion = (1.0 + float(tasa_inflacion)) if inflacion else 1.0
+    aportes_mes, devoluciones = _flujos_aportes(
+        ahorro_mensual, anos_aporte, factor_inflacion, tope, isr_cliente, deduce,
+    )
+    flujos = np.zeros(total_meses)
+    flujos[:meses_aporte] = np.repeat(aportes_mes, 12)
+    devolucion_final = 0.0
+    if reinvertir_beneficio and anos_aporte:
+        flujos[11:meses_aporte:12] += devoluciones
+        devolucion_final = devoluciones[-1]
+
+    saldos = flujos / crec
+    np.cumsum(saldos, axis=1, out=saldos)
+    saldos *= crec
+
+    bandas = np.percentile(saldos, PERCENTILES, axis=0)
+    objetivo = tuple(float(x) for x in bandas[:, -1])
+    if 0 < plazo_anos <= total_anos:
+        # Igual que el motor determinista: antes de la devolución del último año
+        fin_aportes = tuple(float(x) - devolucion_final for x in bandas[:, meses_aporte - 1])
+    else:
+        fin_aportes = objetivo
+
+    return {
+        "Año": int(edad_actual) + np.arange(1, total_meses + 1) / 12.0,
+        "P10": bandas[0],
+        "P50": bandas[1],
+        "P90": bandas[2],
+        "saldo_fin_aportes": fin_aportes,
+        "saldo_objetivo": objetivo,
+        "saldo_objetivo_media": float(saldos[:, -1].mean()),
+    }
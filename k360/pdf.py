@@ -0,0 +1,507 @@
+"""Generación del PDF de la propuesta (FPDF) y manejo del logo del asesor."""
+
+import functools
+import hashlib
+import io
+import os
+import re
+import unicodedata
+from datetime import datetime
+
+from fpdf import FPDF
+from fpdf import __version__ as VERSION_FPDF
+
+from .cache import CacheLRU
+
+
+# -----------------------------
+# Sanitización de texto (FPDF usa latin-1)
+# Evita errores tipo: 'latin-1' codec can't encode character '\u2014'
+# -----------------------------
+_TRADUCCION_PDF = str.maketrans({
+    "—": "-",   # em dash —
+    "–": "-",   # en dash –
+    "−": "-",   # minus sign −
+    "‘": "'",   # ‘
+    "’": "'",   # ’
+    "“": '"',   # “
+    "”": '"',   # ”
+    "•": "-",   # bullet •
+    "\u00a0": " ",  # nbsp
+})
+
+
+@functools.lru_cache(maxsize=4096)
+def _sanitizar_texto(s: str) -> str:
+    # ASCII puro ya es latin-1 y NFKC no lo cambia: camino rápido
+    if s.isascii():
+        return s
+
+    s = unicodedata.normalize("NFKC", s.translate(_TRADUCCION_PDF))
+
+    # Garantiza compatibilidad latin-1
+    try:
+        s.encode("latin-1")
+        return s
+    except Exception:
+        return s.encode("latin-1", "replace").decode("latin-1")
+
+
+# Bloques estáticos ya compuestos: clave de layout -> (fragmento del content stream, alto, y de origen)
+_BLOQUES_ESTATICOS = {}
+# El replay copia fragmentos de self.pages y depende del estado privado de FPDF
+# 1.7.2 (buffer de página, fuente y colores actuales): con otra versión se
+# compone siempre normal. requirements.txt fija fpdf==1.7.2.
+BLOQUES_ESTATICOS_ACTIVOS = VERSION_FPDF == "1.7.2"
+_MAX_BLOQUES_ESTATICOS = 256
+
+
+# --- CLASE PDF (PRODUCCIÓN) ---
+class PDFReport(FPDF):
+    def __init__(self, advisor_logo: dict | None = None):
+        super().__init__()
+        self.advisor_logo = advisor_logo
+        self.fecha_actual = datetime.now().strftime("%d/%m/%Y")
+
+    @staticmethod
+    def _sanitize_pdf_text(s) -> str:
+        if s is None:
+            return ""
+        return _sanitizar_texto(str(s))
+
+    # Overwrite para proteger TODAS las impresiones
+    def cell(self, w, h=0, txt="", border=0, ln=0, align="", fill=False, link=""):
+        txt = self._sanitize_pdf_text(txt)
+        return super().cell(w, h, txt, border, ln, align, fill, link)
+
+    def multi_cell(self, w, h, txt="", border=0, align="J", fill=False):
+        txt = self._sanitize_pdf_text(txt)
+        return super().multi_cell(w, h, txt, border, align, fill)
+
+    def multi_cell_estatico(self, w, h, txt="", border=0, align="J", fill=False):
+        """multi_cell para textos fijos (resumen, análisis fiscal, aviso legal).
+
+        La primera vez se compone normal y se guarda el fragmento del content
+        stream; en documentos siguientes se reinserta desplazado con una
+        matriz de traslación (q ... cm ... Q) en lugar de volver a partir
+        líneas. Si el bloque no cabe en la página, o la versión de FPDF no es
+        la verificada (BLOQUES_ESTATICOS_ACTIVOS), se compone normal.
+        """
+        if not BLOQUES_ESTATICOS_ACTIVOS:
+            return self.multi_cell(w, h, txt, border, align, fill)
+        clave = (
+            txt, w, h, border, align, fill, self.x, self.l_margin, self.r_margin, self.w, self.k,
+            self.font_family, self.font_style, self.font_size_pt, self.current_font.get("i"),
+            self.text_color, self.fill_color, self.draw_color, self.underline,
+        )
+        bloque = _BLOQUES_ESTATICOS.get(clave)
+
+        if bloque is not None:
+            fragmento, alto, y_origen = bloque
+            cabe = self.in_footer or not self.auto_page_break or self.y + alto <= self.page_break_trigger
+            if cabe:
+                desplazamiento = (self.y - y_origen) * self.k
+                if desplazamiento:
+                    self._out(f"q 1 0 0 1 0 {-desplazamiento:.2f} cm")
+                    self.pages[self.page] += fragmento
+                    self._out("Q")
+                else:
+                    self.pages[self.page] += fragmento
+                self.lasth = h
+                self.y += alto
+                self.x = self.l_margin
+                return None
+            return self.multi_cell(w, h, txt, border, align, fill)
+
+        pagina, y_origen = self.page, self.y
+        inicio = len(self.pages[pagina])
+        resultado = self.multi_cell(w, h, txt, border, align, fill)
+        if self.page == pagina:  # sin salto de página: reutilizable
+            if len(_BLOQUES_ESTATICOS) >= _MAX_BLOQUES_ESTATICOS:
+                _BLOQUES_ESTATICOS.clear()
+            _BLOQUES_ESTATICOS[clave] = (self.pages[pagina][inicio:], self.y - y_origen, y_origen)
+        return resultado
+
+    def header(self):
+        # Logo del asesor (opcional) - esquina superior derecha
+        # El JPEG ya está en memoria: se registra directo en self.images y FPDF no lee disco
+        if self.advisor_logo:
+            try:
+                nombre = f"logo_{self.advisor_logo['sha256']}.jpg"
+                if nombre not in self.images:
+                    self.images[nombre] = dict(self.advisor_logo, i=len(self.images) + 1)
+                self.image(nombre, x=170, y=8, w=LOGO_ANCHO_MM)
+            except Exception:
+                pass
+
+        # Título
+        self.set_font("Arial", "B", 14)
+        self.set_text_color(0, 0, 0)
+        self.cell(0, 10, "Propuesta Personal de Retiro (PPR) - Simulacion estimada", 0, 1, "L")
+
+        # Fecha
+        self.set_font("Arial", "I", 10)
+        self.set_text_color(80, 80, 80)
+        self.cell(0, 6, f"Fecha: {self.fecha_actual}", 0, 1, "L")
+        self.ln(4)
+        self.set_text_color(0, 0, 0)
+
+    def footer(self):
+        # --- Footer compacto para evitar encimarse con el contenido ---
+        # Dejamos un margen inferior amplio con set_auto_page_break(margin=28)
+        # y aquí dibujamos un aviso legal corto + paginación.
+
+        # Aviso legal (compacto)
+        self.set_y(-22)
+        self.set_font("Arial", "", 6)
+        self.set_text_color(100, 100, 100)
+
+        disclaimer = (
+            "Aviso legal: Proyeccion informativa y estimativa. No constituye cotizacion formal ni oferta vinculante. "
+            "Rendimientos no garantizados y pueden variar. Consulte a su asesor para cotizacion oficial."
+        )
+        self.multi_cell_estatico(0, 2.8, disclaimer, 0, "C")
+
+        # Paginación (separada para que nunca se encime con el texto)
+        self.set_y(-10)
+        self.set_text_color(0, 0, 0)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 10, f"Pagina {self.page_no()} | Generado con Simulador Krece360", 0, 0, "C")
+
+
+# --- Helpers de endurecimiento (uploads / archivos) ---
+def _safe_filename(text: str, default: str = "propuesta") -> str:
+    try:
+        text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    except Exception:
+        text = str(text)
+    text = re.sub(r"[^a-zA-Z0-9_-]+", "_", text).strip("_")
+    return text or default
+
+# --- Logo del asesor: en memoria, reducido a resolución de impresión y cacheado por SHA-256 ---
+LOGO_MAX_BYTES = 2 * 1024 * 1024  # 2MB (evita uploads gigantes)
+LOGO_ANCHO_MM = 28  # ancho con el que se dibuja en el encabezado
+LOGO_DPI = 300
+LOGO_ANCHO_PX = round(LOGO_ANCHO_MM / 25.4 * LOGO_DPI)
+
+CACHE_LOGOS = CacheLRU(max_entradas=32, max_bytes=8 * 1024 * 1024)
+
+
+def preparar_logo(data: bytes | None) -> dict | None:
+    """Valida el logo subido y lo deja listo para FPDF sin tocar disco.
+
+    Aplana transparencia sobre blanco, reduce a LOGO_ANCHO_PX (28 mm a 300 dpi)
+    y re-codifica a JPEG en memoria. Devuelve el dict de imagen que FPDF espera
+    (w, h, cs, bpc, f, data) más "sha256"; el resultado se cachea por el hash
+    del upload, así que el mismo logo no vuelve a pasar por PIL.
+    """
+    if not data:
+        return None
+    if len(data) > LOGO_MAX_BYTES:
+        raise ValueError("El logotipo excede 2MB. Sube una imagen más ligera.")
+
+    digest = hashlib.sha256(data).hexdigest()
+    logo = CACHE_LOGOS.obtener(digest, None)
+    if logo is not None:
+        return logo
+
+    from PIL import Image  # solo si hay logo nuevo: Pillow no entra al arranque
+
+    # Validar tipo real de imagen (no solo extensión)
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.verify()  # valida integridad
+        fmt = (img.format or "").lower()
+    except Exception:
+        raise ValueError("El logotipo no es una imagen válida. Usa PNG o JPG/JPEG.")
+    if fmt not in {"png", "jpeg", "jpg"}:
+        raise ValueError("Formato de logotipo no soportado. Usa PNG o JPG/JPEG.")
+
+    img = Image.open(io.BytesIO(data))  # verify() invalida la imagen: se reabre
+
+    # Reducir antes de aplanar: el logo se imprime a 28 mm
+    if img.width > LOGO_ANCHO_PX:
+        alto = max(1, round(img.height * LOGO_ANCHO_PX / img.width))
+        img = img.resize((LOGO_ANCHO_PX, alto), Image.LANCZOS)
+
+    # Si trae transparencia (RGBA/LA o paleta con transparencia), "aplanar" sobre fondo blanco.
+    has_alpha = (
+        img.mode in ("RGBA", "LA")
+        or (img.mode == "P" and "transparency" in img.info)
+    )
+    if has_alpha:
+        rgba = img.convert("RGBA")
+        rgb = Image.new("RGB", rgba.size, (255, 255, 255))
+        rgb.paste(rgba, mask=rgba.split()[-1])
+    else:
+        rgb = img.convert("RGB")
+
+    buffer = io.BytesIO()
+    rgb.save(buffer, format="JPEG", quality=92, optimize=True)
+    logo = {
+        "w": rgb.width, "h": rgb.height, "cs": "DeviceRGB", "bpc": 8,
+        "f": "DCTDecode", "data": buffer.getvalue(), "sha256": digest,
+    }
+    CACHE_LOGOS.guardar(digest, logo)
+    return logo
+
+
+def _logo_desde_archivo(ruta: str | None) -> dict | None:
+    """preparar_logo para un logo en disco (modo lote / rutas heredadas)."""
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with open(ruta, "rb") as f:
+        return preparar_logo(f.read())
+
+
+def crear_pdf(datos_cliente, datos_fin, datos_fiscales, datos_asesor, ruta_logo_temp=None, logo_pdf=None):
+    """Devuelve (pdf_bytes, error).
+
+    logo_pdf es el resultado de preparar_logo (se comparte entre documentos);
+    ruta_logo_temp se mantiene para logos en disco.
+    """
+    try:
+        if logo_pdf is None and ruta_logo_temp:
+            try:
+                logo_pdf = _logo_desde_archivo(ruta_logo_temp)
+            except Exception:
+                logo_pdf = None
+        pdf = PDFReport(advisor_logo=logo_pdf)
+        pdf.set_auto_page_break(auto=True, margin=24)
+        pdf.add_page()
+        
+        # --- CORRECCIÓN ESPACIO LOGO ---
+        pdf.ln(2) 
+        
+        pdf.set_font("Arial", size=10)
+        
+        # Datos Cliente
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 7, f"Propuesta para: {datos_cliente['nombre']}", 0, 1)
+        pdf.set_font("Arial", size=10)
+        pdf.cell(0, 7, f"Edad Actual: {datos_cliente['edad']} | Fin aportaciones: {datos_cliente.get('edad_fin_aportes', datos_cliente['retiro'])} | Edad objetivo: {datos_cliente['retiro']}", 0, 1)
+        pdf.cell(0, 7, f"Estrategia: {datos_cliente['estrategia']}", 0, 1)
+        pdf.ln(5)
+
+        # Resumen de la estrategia
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 6, "Resumen de la estrategia", 0, 1)
+        pdf.set_font("Arial", size=9)
+        resumen = (
+            "Con base en la información proporcionada, esta simulación presenta una proyección estimada "
+            "de ahorro para el retiro mediante un Plan Personal de Retiro (PPR), considerando aportaciones "
+            "periódicas, un horizonte de largo plazo y el tratamiento fiscal conforme a la legislación vigente. "
+            "Los resultados son estimativos y no representan una garantía de rendimiento futuro."
+        )
+        pdf.multi_cell_estatico(0, 4.5, resumen)
+        pdf.ln(2)
+
+        # Resumen Financiero (compacto)
+        pdf.set_fill_color(240, 242, 246)
+        y_actual = pdf.get_y()
+        box_h = 28
+        pdf.rect(10, y_actual, 190, box_h, 'F')
+
+        pdf.set_y(y_actual + 4)
+        pdf.set_font("Arial", 'B', 10)
+
+        x_left, x_right = 14, 108
+        row_h = 5
+        y0 = pdf.get_y()
+
+        # Columna izquierda
+        pdf.set_xy(x_left, y0)
+        pdf.cell(0, row_h, f"Aportación mensual: ${datos_fin['aporte_mensual']:,.2f}", 0, 1)
+        pdf.set_xy(x_left, y0 + row_h)
+        pdf.cell(0, row_h, f"Total aportado: ${datos_fin['total_aportado']:,.2f}", 0, 1)
+        pdf.set_xy(x_left, y0 + row_h*2)
+        pdf.cell(0, row_h, f"Saldo a fin aportes: ${datos_fin.get('saldo_fin_aportes', 0.0):,.2f}", 0, 1)
+
+        # Columna derecha
+        pdf.set_xy(x_right, y0)
+        pdf.cell(0, row_h, f"Saldo a edad objetivo: ${datos_fin['saldo_final']:,.2f}", 0, 1)
+        pdf.set_xy(x_right, y0 + row_h)
+        pdf.cell(0, row_h, f"Beneficio SAT est.: ${datos_fin['beneficio_sat']:,.2f}", 0, 1)
+        pdf.set_xy(x_right, y0 + row_h*2)
+        pdf.set_font("Arial", 'I', 9)
+        pdf.cell(0, row_h, f"(Tasa admin: {datos_fin['tasa_admin_pct']:.2f}%)", 0, 1)
+
+        pdf.set_y(y_actual + box_h + 2)
+        
+
+        pdf.set_y(y_actual + 50)
+
+        # Comparador de Escenarios (mini-tabla)
+        comp = datos_fin.get('comparador') if isinstance(datos_fin, dict) else None
+        if comp and isinstance(comp, list):
+            try:
+                pdf.ln(2)
+                pdf.set_font("Arial", 'B', 11)
+                pdf.cell(0, 6, "Comparación de escenarios (resumen):", 0, 1)
+
+                # Encabezados
+                pdf.set_font("Arial", 'B', 9)
+                pdf.set_fill_color(240, 242, 246)
+                pdf.set_draw_color(200, 200, 200)
+
+                col1, col2, col3, col4 = 70, 28, 40, 42  # ancho total dentro de márgenes
+                pdf.cell(col1, 6, "Escenario", 1, 0, 'L', True)
+                pdf.cell(col2, 6, "Tasa neta", 1, 0, 'C', True)
+                pdf.cell(col3, 6, "Monto a 43", 1, 0, 'R', True)
+                pdf.cell(col4, 6, "Monto a 65", 1, 1, 'R', True)
+
+                pdf.set_font("Arial", size=9)
+
+                # Filas (máximo 4 para no saturar)
+                for r in comp[:4]:
+                    esc = str(r.get('escenario', ''))
+                    tasa = r.get('tasa_neta_pct', None)
+                    monto_fin = r.get('monto_fin_aportes', None)
+                    monto_obj = r.get('monto_objetivo', None)
+
+                    tasa_txt = f"{float(tasa):.2f}%" if tasa is not None else ""
+                    monto_fin_txt = f"${float(monto_fin):,.0f}" if monto_fin is not None else ""
+                    monto_obj_txt = f"${float(monto_obj):,.0f}" if monto_obj is not None else ""
+
+                    pdf.cell(col1, 6, esc, 1, 0, 'L')
+                    pdf.cell(col2, 6, tasa_txt, 1, 0, 'C')
+                    pdf.cell(col3, 6, monto_fin_txt, 1, 0, 'R')
+                    pdf.cell(col4, 6, monto_obj_txt, 1, 1, 'R')
+
+                # Escenarios en dólares: monto en USD y rango en pesos por el tipo de cambio
+                for r in comp[:4]:
+                    usd = r.get('usd')
+                    if not usd:
+                        continue
+                    texto = (
+                        f"{r.get('escenario', '')} (plan en USD): tipo de cambio inicial ${usd['tipo_cambio_inicial']:,.2f} MXN/USD, "
+                        f"central a edad objetivo ${usd['tipo_cambio_objetivo']:,.2f}. Saldo a edad objetivo US${usd['monto_objetivo_usd']:,.0f}"
+                    )
+                    rango = usd.get('rango_objetivo_mxn')
+                    if rango:
+                        texto += (
+                            f"; en pesos, considerando rendimiento y tipo de cambio simulados, "
+                            f"entre ${rango[0]:,.0f} (P10) y ${rango[2]:,.0f} (P90)"
+                        )
+                    pdf.ln(1)
+                    pdf.set_font("Arial", 'I', 8)
+                    pdf.multi_cell(0, 3.8, texto + ".")
+
+                # Nota de calibración (solo si aplica)
+                if any('Allianz-style' in str(x.get('escenario','')) for x in comp):
+                    pdf.ln(1)
+                    pdf.set_font("Arial", 'I', 7)
+                    pdf.set_text_color(90, 90, 90)
+                    pdf.multi_cell_estatico(0, 3.5, "Nota: El escenario Allianz-style incluye un ajuste de calibración para reflejar cargos y fricciones propias del producto comercial.")
+                    pdf.set_text_color(0, 0, 0)
+
+                pdf.ln(2)
+                pdf.set_font("Arial", 'I', 9)
+                pdf.multi_cell_estatico(
+                    0, 4,
+                    "Nota: El escenario optimista puede presentar mayor volatilidad. "
+                    "El recomendado busca equilibrio entre crecimiento y control del riesgo."
+                )
+                pdf.ln(2)
+            except Exception:
+                pass
+
+        # Rango Monte Carlo (opcional)
+        mc = datos_fin.get('montecarlo') if isinstance(datos_fin, dict) else None
+        if mc:
+            p10, p50, p90 = mc.get('saldo_objetivo', (0.0, 0.0, 0.0))
+            pdf.set_font("Arial", 'B', 11)
+            pdf.cell(0, 6, "Rango de resultados (simulación Monte Carlo):", 0, 1)
+            pdf.set_font("Arial", size=9)
+            pdf.multi_cell(
+                0, 4.5,
+                f"Saldo a edad objetivo: desfavorable (P10) ${p10:,.0f} | mediano (P50) ${p50:,.0f} | "
+                f"favorable (P90) ${p90:,.0f}. El 80% de las trayectorias simuladas queda dentro de este rango."
+            )
+            pdf.ln(2)
+
+        # Sensibilidad (opcional): tornado dibujado con rectángulos
+        sens = datos_fin.get('sensibilidad') if isinstance(datos_fin, dict) else None
+        if sens and sens.get('filas'):
+            try:
+                base = float(sens['saldo_base'])
+                filas = sens['filas'][:7]
+                row_h = 5
+                if pdf.get_y() + 14 + row_h * len(filas) > pdf.page_break_trigger:
+                    pdf.add_page()
+                pdf.set_font("Arial", 'B', 11)
+                pdf.cell(0, 6, "Sensibilidad del saldo a edad objetivo:", 0, 1)
+
+                ancho_etiqueta, media_barra = 62, 45
+                x_centro = 10 + ancho_etiqueta + media_barra
+                extremo = max(max(abs(f['saldo_bajo'] - base), abs(f['saldo_alto'] - base)) for f in filas) or 1.0
+                pdf.set_font("Arial", size=8)
+                y_ini = pdf.get_y()
+                for f in filas:
+                    y = pdf.get_y()
+                    pdf.set_x(10)
+                    pdf.cell(ancho_etiqueta, row_h, f"{f['etiqueta']} ({f['delta']})", 0, 0, 'L')
+                    for saldo, color in ((f['saldo_bajo'], (255, 75, 75)), (f['saldo_alto'], (44, 160, 44))):
+                        ancho = (saldo - base) / extremo * media_barra
+                        if abs(ancho) >= 0.1:
+                            pdf.set_fill_color(*color)
+                            pdf.rect(min(x_centro, x_centro + ancho), y + 0.8, abs(ancho), row_h - 1.6, 'F')
+                    pdf.set_x(x_centro + media_barra + 2)
+                    pdf.cell(0, row_h, f"${f['saldo_bajo']:,.0f} / ${f['saldo_alto']:,.0f}", 0, 1, 'L')
+                pdf.set_draw_color(60, 60, 60)
+                pdf.line(x_centro, y_ini, x_centro, pdf.get_y())
+                pdf.set_draw_color(0, 0, 0)
+
+                pdf.set_font("Arial", 'I', 8)
+                pdf.set_text_color(90, 90, 90)
+                pdf.multi_cell(
+                    0, 3.5,
+                    f"Línea central: saldo base ${base:,.0f}. Rojo: variable con -delta; verde: con +delta. "
+                    "Cada variable se mueve sola, manteniendo las demás en su valor base."
+                )
+                pdf.set_text_color(0, 0, 0)
+                pdf.ln(2)
+            except Exception:
+                pass
+
+        # Análisis Fiscal
+
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 6, "Análisis fiscal simplificado:", 0, 1)
+        pdf.set_font("Arial", size=11)
+        pdf.multi_cell_estatico(0, 5, datos_fiscales['texto_analisis'])
+        
+        if datos_fiscales['alerta_excedente']:
+            pdf.ln(5)
+            pdf.set_text_color(200, 0, 0)
+            pdf.multi_cell(0, 5, f"NOTA IMPORTANTE: {datos_fiscales['alerta_excedente']}")
+            pdf.set_text_color(0, 0, 0)
+            
+
+        # Siguiente paso recomendado
+        pdf.ln(2)
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 6, "Siguiente paso recomendado", 0, 1)
+        pdf.set_font("Arial", size=10)
+        pdf.multi_cell_estatico(
+            0, 5,
+            "Revisa esta proyección junto con tu asesor para validar si esta estrategia se ajusta a tus objetivos "
+            "financieros, capacidad de ahorro y horizonte de inversión, y definir el siguiente paso hacia una "
+            "cotización oficial y proceso de contratación."
+        )
+
+        # Datos del asesor (compacto)
+        pdf.ln(2)
+        pdf.set_draw_color(150, 150, 150)
+        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+        pdf.ln(2)
+        pdf.set_font("Arial", 'B', 10)
+        asesor_nombre = str(datos_asesor.get('nombre','')).strip()
+        asesor_tel = str(datos_asesor.get('telefono','')).strip()
+        pdf.cell(0, 6, f"Asesor: {asesor_nombre}   |   Contacto: {asesor_tel}", 0, 1)
+
+        pdf_bytes = pdf.output(dest='S').encode('latin-1', 'replace')
+
+        return pdf_bytes, None
+    except Exception as e:
+        return None, str(e)
@@ -0,0 +1,740 @@
+"""Motor de proyección de saldos (aportaciones, solo crecimiento y retiros).
+
+El rendimiento se capitaliza mensualmente a tasa_neta / 12 y la aportación se
+deposita al cierre de cada mes. Dentro de un año la aportación y la tasa son
+constantes, así que cada año se resuelve con la fórmula cerrada de anualidad y
+la fase 2 (sin aportaciones) con un solo factor (1 + r/12) ** n. La fase 3
+(retiros después de edad_objetivo) usa la anualidad anticipada / creciente.
+"""
+
+import numpy as np
+
+# -----------------------------
+# Estrategias fiscales (mismas etiquetas que la UI)
+# -----------------------------
+ESTRATEGIA_ART_151 = "Art 151 (PPR - Deducible)"
+ESTRATEGIA_ART_93 = "Art 93 (No Deducible)"
+ESTRATEGIA_ART_185 = "Art 185 (Diferimiento)"
+
+
+def tope_deducible_anual(
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+) -> float:
+    """Tope deducible anual según estrategia (Art 93 no deduce)."""
+    if estrategia_fiscal == ESTRATEGIA_ART_151:
+        tope = float(tope_art_151_abs)
+        if validar_sueldo:
+            tope = min(float(tope_art_151_abs), float(sueldo_anual) * 0.10)
+        return tope
+    if estrategia_fiscal == ESTRATEGIA_ART_185:
+        return float(tope_art_185)
+    return 0.0
+
+
+def _tope_y_deduccion(
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    topes_anuales=None,
+):
+    """(tope, deduce) para _flujos_aportes.
+
+    Con topes_anuales (vector por año de reglas_fiscales.topes_por_anio, ya
+    con la estrategia aplicada: Art 93 = ceros) no se compara la estrategia;
+    sin él, tope constante del año base.
+    """
+    if topes_anuales is not None:
+        return np.asarray(topes_anuales, dtype=float), True
+    tope = tope_deducible_anual(estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185)
+    return tope, estrategia_fiscal != ESTRATEGIA_ART_93
+
+
+def _factores_mensuales(tasa_anual: float, meses: int):
+    """Devuelve ((1+m)^n, suma_{k<n} (1+m)^k) con m = tasa_anual / 12.
+
+    El segundo término es el factor de anualidad vencida: una aportación
+    constante c depositada al cierre de cada mes durante n meses acumula
+    c * factor.
+    """
+    m = float(tasa_anual) / 12.0
+    if m == 0.0:
+        return 1.0, float(meses)
+    crecimiento = (1.0 + m) ** meses
+    return crecimiento, (crecimiento - 1.0) / m
+
+
+def _flujos_aportes(
+    ahorro_mensual: float,
+    anos_aporte: int,
+    factor_inflacion: float,
+    tope: float,
+    isr_cliente: float,
+    deduce: bool,
+):
+    """Aportación mensual y devolución SAT de cada año de la fase 1.
+
+    No dependen del rendimiento: la base de devolución es lo aportado en el
+    año, hasta el tope legal (la devolución se calcula aunque no se reinvierta).
+    tope puede ser un escalar o un vector por año (el último se repite si el
+    vector es más corto que la fase).
+    """
+    topes = np.atleast_1d(np.asarray(tope, dtype=float)).tolist()
+    ultimo = len(topes) - 1
+    aportes_mes, devoluciones = [], []
+    aporte_actual = float(ahorro_mensual)
+    for anio in range(anos_aporte):
+        aportes_mes.append(aporte_actual)
+        tope_anio = topes[min(anio, ultimo)]
+        devoluciones.append(min(aporte_actual * 12.0, tope_anio) * float(isr_cliente) if deduce else 0.0)
+        aporte_actual *= factor_inflacion
+    return aportes_mes, devoluciones
+
+
+def _fase_aportes(
+    ahorro_mensual: float,
+    anos_aporte: int,
+    tasa_neta: float,
+    factor_inflacion: float,
+    tope: float,
+    isr_cliente: float,
+    deduce: bool,
+    reinvertir_beneficio: bool,
+):
+    """Recorre la fase 1 un año a la vez con la fórmula de anualidad.
+
+    Devuelve (saldos_inicio, aportes_mes, devoluciones, saldo_fin_aportes, saldo):
+    listas por año con el saldo al inicio del año, la aportación mensual y la
+    devolución SAT del año, el saldo a fin de aportes (antes de la devolución
+    del último año) y el saldo al cerrar la fase.
+    """
+    crec_anual, anualidad_anual = _factores_mensuales(tasa_neta, 12)
+    aportes_mes, devoluciones = _flujos_aportes(
+        ahorro_mensual, anos_aporte, factor_inflacion, tope, isr_cliente, deduce
+    )
+
+    saldos_inicio = []
+    saldo = 0.0
+    saldo_fin_aportes = 0.0
+    for aporte, devolucion in zip(aportes_mes, devoluciones):
+        saldos_inicio.append(saldo)
+        saldo = saldo * crec_anual + aporte * anualidad_anual
+        saldo_fin_aportes = saldo
+        if reinvertir_beneficio:
+            saldo += devolucion
+
+    return saldos_inicio, aportes_mes, devoluciones, saldo_fin_aportes, saldo
+
+
+# -----------------------------
+# Proyección rápida (forma cerrada, un paso por año)
+# -----------------------------
+def proyectar_saldos_dos_fases(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_bruta_scenario: float,
+    tasa_admin_real: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    topes_anuales=None,
+    fase_retiro: dict | None = None,
+):
+    """Devuelve (saldo_fin_aportes, saldo_objetivo, tasa_neta).
+
+    - Fase 1: aportaciones hasta edad_fin_aportes (inclusive por meses).
+    - Fase 2: sin aportaciones, solo crecimiento hasta edad_objetivo.
+    - Fase 3 (opcional): con fase_retiro (argumentos por nombre de
+      proyectar_retiro; isr_retiro por default = isr_cliente) se agrega un
+      cuarto elemento con el resultado de proyectar_retiro desde el saldo
+      objetivo, a la misma tasa neta y con la misma estrategia fiscal.
+
+    Equivale a _proyectar_saldos_dos_fases_mensual (bucle mes a mes) salvo
+    redondeo de punto flotante.
+    """
+    tasa_neta = max(0.0, float(tasa_bruta_scenario) - float(tasa_admin_real))
+
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    total_anos = max(0, int(edad_objetivo) - int(edad_actual))
+    anos_aporte = min(max(0, plazo_anos), total_anos)
+
+    tope, deduce = _tope_y_deduccion(
+        estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+    )
+    factor_inflacion = (1.0 + float(tasa_inflacion)) if inflacion else 1.0
+
+    _, _, _, saldo_fin_aportes, saldo = _fase_aportes(
+        ahorro_mensual, anos_aporte, tasa_neta, factor_inflacion, tope, isr_cliente,
+        deduce, reinvertir_beneficio,
+    )
+
+    # Fase 2: solo crecimiento, en un solo salto
+    meses_sin_aporte = (total_anos - anos_aporte) * 12
+    saldo *= _factores_mensuales(tasa_neta, meses_sin_aporte)[0]
+
+    if plazo_anos <= 0 or plazo_anos > total_anos:
+        saldo_fin_aportes = saldo  # si fin aportes coincide con objetivo
+
+    if fase_retiro is not None:
+        retiros = proyectar_retiro(
+            saldo, int(edad_objetivo), tasa_neta,
+            **({"estrategia_fiscal": estrategia_fiscal, "isr_retiro": float(isr_cliente)} | dict(fase_retiro)),
+        )
+        return float(saldo_fin_aportes), float(saldo), float(tasa_neta), retiros
+
+    return float(saldo_fin_aportes), float(saldo), float(tasa_neta)
+
+
+# -----------------------------
+# Proyección detallada mes a mes (columnas NumPy para la vista principal)
+# -----------------------------
+COLUMNAS_DETALLE = ("Mes", "Año", "Saldo Neto", "Aportado", "Devoluciones SAT")
+
+
+def proyectar_detalle_mensual(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_bruta_scenario: float,
+    tasa_admin_real: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    topes_anuales=None,
+):
+    """Serie mensual de la proyección, con la misma matemática que proyectar_saldos_dos_fases.
+
+    Devuelve (columnas, saldo_fin_aportes) donde columnas es un dict con las
+    llaves de COLUMNAS_DETALLE y arreglos preasignados de largo total_meses
+    (listos para pd.DataFrame sin construir un dict por fila). "Devoluciones
+    SAT" es el acumulado nominal, se reinvierta o no.
+    """
+    tasa_neta = max(0.0, float(tasa_bruta_scenario) - float(tasa_admin_real))
+
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    total_anos = max(0, int(edad_objetivo) - int(edad_actual))
+    anos_aporte = min(max(0, plazo_anos), total_anos)
+    total_meses = total_anos * 12
+    meses_aporte = anos_aporte * 12
+
+    tope, deduce = _tope_y_deduccion(
+        estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+    )
+    factor_inflacion = (1.0 + float(tasa_inflacion)) if inflacion else 1.0
+
+    saldos_inicio, aportes_mes, devoluciones, saldo_fin_aportes, saldo = _fase_aportes(
+        ahorro_mensual, anos_aporte, tasa_neta, factor_inflacion, tope, isr_cliente,
+        deduce, reinvertir_beneficio,
+    )
+    devoluciones = np.asarray(devoluciones, dtype=float)
+
+    # Factores de crecimiento y anualidad para k = 1..12 meses dentro del año
+    m = tasa_neta / 12.0
+    k = np.arange(1, 13, dtype=float)
+    crec_k = (1.0 + m) ** k
+    anualidad_k = (crec_k - 1.0) / m if m != 0.0 else k
+
+    saldo_neto = np.empty(total_meses)
+    aportado = np.zeros(total_meses)
+    devoluciones_sat = np.zeros(total_meses)
+
+    # Fase 1: matriz años x 12 meses; la devolución se suma al cierre de año
+    fase_1 = saldo_neto[:meses_aporte].reshape(anos_aporte, 12)
+    np.multiply(np.asarray(saldos_inicio)[:, None], crec_k, out=fase_1)
+    fase_1 += np.asarray(aportes_mes)[:, None] * anualidad_k
+    if reinvertir_beneficio:
+        fase_1[:, 11] += devoluciones
+    aportado[:meses_aporte] = np.repeat(aportes_mes, 12)
+    devoluciones_sat[11:meses_aporte:12] = devoluciones
+
+    # Fase 2: solo crecimiento
+    meses_sin_aporte = total_meses - meses_aporte
+    saldo_neto[meses_aporte:] = saldo * (1.0 + m) ** np.arange(1, meses_sin_aporte + 1, dtype=float)
+
+    np.cumsum(aportado, out=aportado)
+    np.cumsum(devoluciones_sat, out=devoluciones_sat)
+
+    mes = np.arange(1, total_meses + 1)
+    columnas = {
+        "Mes": mes,
+        "Año": int(edad_actual) + mes / 12.0,
+        "Saldo Neto": saldo_neto,
+        "Aportado": aportado,
+        "Devoluciones SAT": devoluciones_sat,
+    }
+
+    if plazo_anos <= 0 or plazo_anos > total_anos:
+        saldo_fin_aportes = float(saldo_neto[-1]) if total_meses else 0.0
+
+    return columnas, float(saldo_fin_aportes)
+
+
+# -----------------------------
+# Calendario de flujos (generador, para exportar)
+# -----------------------------
+COLUMNAS_CALENDARIO = ("Periodo", "Edad", "Aportación", "Rendimiento", "Devolución SAT", "Saldo")
+GRANULARIDADES = ("mensual", "anual")
+
+
+def iterar_calendario(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_bruta_scenario: float,
+    tasa_admin_real: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    topes_anuales=None,
+    granularidad: str = "mensual",
+):
+    """Genera el calendario fila por fila (tuplas en el orden de COLUMNAS_CALENDARIO).
+
+    Misma matemática que proyectar_detalle_mensual, pero un año a la vez: solo
+    vive en memoria el bloque de 12 meses en curso, así que exportar 80 años o
+    miles de clientes no materializa la serie completa.
+
+    mensual: Periodo = mes 1..n, Edad al cierre del mes; la devolución SAT cae
+    en el mes 12 de cada año de aportación (y se suma al saldo si se reinvierte).
+    anual: Periodo = año 1..n con aportación, rendimiento y devolución del año.
+    Rendimiento = cambio de saldo menos aportación y devolución reinvertida.
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no soportada: {granularidad!r} (usa {' / '.join(GRANULARIDADES)}).")
+    tasa_neta = max(0.0, float(tasa_bruta_scenario) - float(tasa_admin_real))
+
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    total_anos = max(0, int(edad_objetivo) - int(edad_actual))
+    anos_aporte = min(max(0, plazo_anos), total_anos)
+
+    tope, deduce = _tope_y_deduccion(
+        estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+    )
+    factor_inflacion = (1.0 + float(tasa_inflacion)) if inflacion else 1.0
+    _, aportes_mes, devoluciones, _, _ = _fase_aportes(
+        ahorro_mensual, anos_aporte, tasa_neta, factor_inflacion, tope, isr_cliente,
+        deduce, reinvertir_beneficio,
+    )
+
+    m = tasa_neta / 12.0
+    k = np.arange(1, 13, dtype=float)
+    crec_k = (1.0 + m) ** k
+    anualidad_k = (crec_k - 1.0) / m if m != 0.0 else k
+    edad_actual = int(edad_actual)
+    mensual = granularidad == "mensual"
+
+    saldo = 0.0
+    for anio in range(total_anos):
+        aporte = float(aportes_mes[anio]) if anio < anos_aporte else 0.0
+        devolucion = float(devoluciones[anio]) if anio < anos_aporte else 0.0
+        reinvertida = devolucion if reinvertir_beneficio else 0.0
+        saldos = saldo * crec_k + aporte * anualidad_k
+        saldos[11] += reinvertida
+        if mensual:
+            anterior = saldo
+            for j in range(12):
+                mes = anio * 12 + j + 1
+                al_cierre = float(saldos[j])
+                devolucion_mes = devolucion if j == 11 else 0.0
+                rendimiento = al_cierre - anterior - aporte - (reinvertida if j == 11 else 0.0)
+                yield mes, edad_actual + mes / 12.0, aporte, rendimiento, devolucion_mes, al_cierre
+                anterior = al_cierre
+        else:
+            al_cierre = float(saldos[11])
+            yield anio + 1, edad_actual + anio + 1, aporte * 12.0, al_cierre - saldo - aporte * 12.0 - reinvertida, devolucion, al_cierre
+        saldo = float(saldos[11])
+
+
+# -----------------------------
+# Fase 3: retiros después de edad_objetivo (desacumulación)
+# -----------------------------
+MODOS_RETIRO = ("fijo", "indexado", "porcentaje")
+
+
+def _factores_retiro(tasa_neta):
+    """(g, G, c): crecimiento mensual, anual y factor de anualidad anticipada de 12 meses.
+
+    Los retiros se hacen al inicio de cada mes: un retiro mensual w durante
+    un año reduce el saldo de cierre en w * c, con c = g * ((g^12 - 1) / (g - 1)).
+    """
+    g = 1.0 + np.asarray(tasa_neta, dtype=float) / 12.0
+    crec_anual = g ** 12
+    m = g - 1.0
+    anualidad = np.where(m == 0.0, 12.0, (crec_anual - 1.0) / np.where(m == 0.0, 1.0, m))
+    return g, crec_anual, g * anualidad
+
+
+def pension_maxima(saldo, tasa_neta, anos, indexacion=0.0):
+    """Retiro mensual bruto inicial que agota el saldo exactamente en `anos` años.
+
+    Forma cerrada (anualidad creciente): con indexacion > 0 el retiro sube
+    cada año a esa tasa. Acepta escalares o arreglos (broadcasting).
+    """
+    saldo = np.asarray(saldo, dtype=float)
+    anos = np.asarray(anos, dtype=float)
+    f = 1.0 + np.asarray(indexacion, dtype=float)
+    _, crec_anual, c = _factores_retiro(tasa_neta)
+
+    # saldo * G^Y = w * c * sum_{j<Y} G^(Y-1-j) f^j
+    iguales = np.isclose(crec_anual, f, rtol=1e-12, atol=0.0)
+    suma = np.where(
+        iguales,
+        anos * crec_anual ** np.maximum(anos - 1.0, 0.0),
+        (crec_anual ** anos - f ** anos) / np.where(iguales, 1.0, crec_anual - f),
+    )
+    pension = np.where(anos > 0, saldo * crec_anual ** anos / (c * np.where(anos > 0, suma, 1.0)), 0.0)
+    if pension.ndim == 0:
+        return float(pension)
+    return pension
+
+
+def _isr_retiros(brutos, estrategia_fiscal: str, isr_retiro: float, exencion: float):
+    """Retención de ISR de cada retiro mensual según la estrategia.
+
+    - Art 93: aportaciones no deducidas, retiro exento.
+    - Art 185: lo diferido se acumula al retirarlo, se grava todo el retiro.
+    - Art 151: se grava lo retirado por encima del monto exento (acumulado).
+    """
+    brutos = np.asarray(brutos, dtype=float)
+    if estrategia_fiscal == ESTRATEGIA_ART_185:
+        return brutos * float(isr_retiro)
+    if estrategia_fiscal == ESTRATEGIA_ART_151:
+        gravable = np.maximum(np.cumsum(brutos) - float(exencion), 0.0)
+        return np.diff(gravable, prepend=0.0) * float(isr_retiro)
+    return np.zeros_like(brutos)
+
+
+def proyectar_retiro(
+    saldo_inicial: float,
+    edad_retiro: int,
+    tasa_neta: float,
+    modo: str = "fijo",
+    retiro_mensual: float = 0.0,
+    porcentaje_anual: float = 0.04,
+    indexacion: float = 0.0,
+    edad_maxima: int = 100,
+    estrategia_fiscal: str = ESTRATEGIA_ART_93,
+    isr_retiro: float = 0.0,
+    exencion: float = 0.0,
+):
+    """Serie mensual de la fase de retiros desde edad_retiro hasta edad_maxima.
+
+    Modos: "fijo" (retiro_mensual constante), "indexado" (retiro_mensual que
+    sube cada año con `indexacion`) y "porcentaje" (porcentaje_anual del saldo
+    al inicio de cada año, pagado en 12 mensualidades). Los retiros son al
+    inicio de mes y el saldo sigue rindiendo tasa_neta.
+
+    Los saldos por año salen en forma cerrada y los meses por broadcasting
+    (sin bucle); si el saldo no alcanza, el último retiro es parcial y el
+    resto de la serie queda en cero.
+
+    Devuelve un dict con "columnas" (Mes, Año, Saldo, Retiro bruto, ISR,
+    Retiro neto, por mes), "edad_agotamiento" (None si alcanza hasta
+    edad_maxima), "saldo_final" y los totales bruto / ISR / neto.
+    """
+    if modo not in MODOS_RETIRO:
+        raise ValueError(f"Modo de retiro no soportado: {modo!r} (usa {', '.join(MODOS_RETIRO)}).")
+
+    anos = max(0, int(edad_maxima) - int(edad_retiro))
+    total_meses = anos * 12
+    g, crec_anual, c = (float(v) for v in _factores_retiro(tasa_neta))
+    saldo_inicial = max(0.0, float(saldo_inicial))
+    y = np.arange(anos, dtype=float)
+
+    # Saldo al inicio de cada año y retiro mensual de ese año (sin agotamiento)
+    if modo == "porcentaje":
+        q = crec_anual - c * float(porcentaje_anual) / 12.0
+        saldos_anio = saldo_inicial * q ** y
+        retiros_anio = saldos_anio * float(porcentaje_anual) / 12.0
+    else:
+        f = 1.0 + float(indexacion) if modo == "indexado" else 1.0
+        retiro_mensual = max(0.0, float(retiro_mensual))
+        if np.isclose(crec_anual, f, rtol=1e-12, atol=0.0):
+            suma = y * crec_anual ** np.maximum(y - 1.0, 0.0)
+        else:
+            suma = (crec_anual ** y - f ** y) / (crec_anual - f)
+        saldos_anio = saldo_inicial * crec_anual ** y - c * retiro_mensual * suma
+        retiros_anio = retiro_mensual * f ** y
+
+    # Saldo antes del retiro de cada mes: S * g^m - w * g * (g^m - 1) / (g - 1)
+    k = np.arange(12, dtype=float)
+    crec_k = g ** k
+    anualidad_k = (crec_k - 1.0) / (g - 1.0) if g != 1.0 else k
+    antes = (saldos_anio[:, None] * crec_k - retiros_anio[:, None] * g * anualidad_k).ravel()
+    brutos = np.repeat(retiros_anio, 12)
+
+    # Primer mes en que el saldo ya no cubre el retiro completo
+    faltante = np.flatnonzero(antes < brutos * (1.0 - 1e-9))
+    agotamiento = int(faltante[0]) if len(faltante) else None
+    saldo = (antes - brutos) * g
+    if agotamiento is not None:
+        brutos[agotamiento] = max(0.0, antes[agotamiento])
+        brutos[agotamiento + 1:] = 0.0
+        saldo[agotamiento:] = 0.0
+    np.maximum(saldo, 0.0, out=saldo)
+
+    isr = _isr_retiros(brutos, estrategia_fiscal, isr_retiro, exencion)
+    netos = brutos - isr
+    mes = np.arange(1, total_meses + 1)
+    return {
+        "columnas": {
+            "Mes": mes,
+            "Año": int(edad_retiro) + mes / 12.0,
+            "Saldo": saldo,
+            "Retiro bruto": brutos,
+            "ISR": isr,
+            "Retiro neto": netos,
+        },
+        "edad_agotamiento": None if agotamiento is None else int(edad_retiro) + agotamiento / 12.0,
+        "saldo_final": float(saldo[-1]) if total_meses else saldo_inicial,
+        "total_bruto": float(brutos.sum()),
+        "total_isr": float(isr.sum()),
+        "total_neto": float(netos.sum()),
+    }
+
+
+# -----------------------------
+# Proyección en lote (NumPy): miles de escenarios en una sola llamada
+# -----------------------------
+def proyectar_saldos_lote(
+    ahorro_mensual,
+    edad_actual,
+    edad_fin_aportes,
+    edad_objetivo,
+    tasa_bruta_scenario,
+    tasa_admin_real,
+    inflacion,
+    tasa_inflacion,
+    estrategia_fiscal,
+    validar_sueldo=False,
+    sueldo_anual=0.0,
+    isr_cliente=0.0,
+    tope_art_151_abs=0.0,
+    tope_art_185=0.0,
+    reinvertir_beneficio=False,
+    topes_anuales=None,
+):
+    """Versión vectorizada de proyectar_saldos_dos_fases.
+
+    Todos los argumentos aceptan escalares o arreglos y se combinan con las
+    reglas de broadcasting de NumPy. Devuelve tres arreglos float64 con la
+    forma común: (saldo_fin_aportes, saldo_objetivo, tasa_neta).
+
+    topes_anuales: tope por año de aportación en el último eje (común o por
+    escenario); si se da, reemplaza a estrategia / sueldo / topes constantes.
+
+    No hay bucle por escenario: solo se itera sobre los años de aportación
+    (a lo más unas decenas) aplicando la misma fórmula de anualidad a todo el
+    lote.
+    """
+    (
+        ahorro_mensual, edad_actual, edad_fin_aportes, edad_objetivo,
+        tasa_bruta_scenario, tasa_admin_real, inflacion, tasa_inflacion,
+        estrategia_fiscal, validar_sueldo, sueldo_anual, isr_cliente,
+        tope_art_151_abs, tope_art_185, reinvertir_beneficio,
+    ) = np.broadcast_arrays(
+        np.asarray(ahorro_mensual, dtype=float),
+        np.asarray(edad_actual, dtype=np.int64),
+        np.asarray(edad_fin_aportes, dtype=np.int64),
+        np.asarray(edad_objetivo, dtype=np.int64),
+        np.asarray(tasa_bruta_scenario, dtype=float),
+        np.asarray(tasa_admin_real, dtype=float),
+        np.asarray(inflacion, dtype=bool),
+        np.asarray(tasa_inflacion, dtype=float),
+        np.asarray(estrategia_fiscal, dtype=str),
+        np.asarray(validar_sueldo, dtype=bool),
+        np.asarray(sueldo_anual, dtype=float),
+        np.asarray(isr_cliente, dtype=float),
+        np.asarray(tope_art_151_abs, dtype=float),
+        np.asarray(tope_art_185, dtype=float),
+        np.asarray(reinvertir_beneficio, dtype=bool),
+    )
+
+    tasa_neta = np.maximum(0.0, tasa_bruta_scenario - tasa_admin_real)
+
+    plazo_anos = edad_fin_aportes - edad_actual
+    total_anos = np.maximum(0, edad_objetivo - edad_actual)
+    anos_aporte = np.clip(plazo_anos, 0, total_anos)
+
+    if topes_anuales is None:
+        es_151 = estrategia_fiscal == ESTRATEGIA_ART_151
+        tope = np.where(
+            es_151,
+            np.where(validar_sueldo, np.minimum(tope_art_151_abs, sueldo_anual * 0.10), tope_art_151_abs),
+            np.where(estrategia_fiscal == ESTRATEGIA_ART_185, tope_art_185, 0.0),
+        )
+        topes = tope[..., np.newaxis]
+        aplica_beneficio = reinvertir_beneficio & (estrategia_fiscal != ESTRATEGIA_ART_93)
+    else:
+        # Vector por año (último eje), común al lote o uno por escenario
+        topes = np.asarray(topes_anuales, dtype=float)
+        aplica_beneficio = reinvertir_beneficio
+    ultimo_anio = topes.shape[-1] - 1
+    factor_inflacion = np.where(inflacion, 1.0 + tasa_inflacion, 1.0)
+
+    tasa_mensual = tasa_neta / 12.0
+    crec_anual = (1.0 + tasa_mensual) ** 12
+    anualidad_anual = np.full_like(tasa_mensual, 12.0)
+    np.divide(crec_anual - 1.0, tasa_mensual, out=anualidad_anual, where=tasa_mensual != 0.0)
+
+    saldo = np.zeros_like(tasa_neta)
+    saldo_fin_aportes = np.zeros_like(tasa_neta)
+    aporte_actual = ahorro_mensual.copy()
+
+    # Fase 1: un paso por año para todo el lote; los escenarios que ya
+    # terminaron de aportar quedan enmascarados.
+    for anio in range(int(anos_aporte.max(initial=0))):
+        activo = anio < anos_aporte
+        saldo = np.where(activo, saldo * crec_anual + aporte_actual * anualidad_anual, saldo)
+        saldo_fin_aportes = np.where(activo, saldo, saldo_fin_aportes)
+        devolucion = np.minimum(aporte_actual * 12.0, topes[..., min(anio, ultimo_anio)]) * isr_cliente
+        saldo = saldo + np.where(activo & aplica_beneficio, devolucion, 0.0)
+        aporte_actual = aporte_actual * factor_inflacion
+
+    # Fase 2: solo crecimiento
+    saldo = saldo * (1.0 + tasa_mensual) ** ((total_anos - anos_aporte) * 12)
+
+    sin_fase_1 = (plazo_anos <= 0) | (plazo_anos > total_anos)
+    saldo_fin_aportes = np.where(sin_fase_1, saldo, saldo_fin_aportes)
+
+    return saldo_fin_aportes, saldo, tasa_neta
+
+
+# -----------------------------
+# Referencia: bucle mes a mes (para validar el motor rápido)
+# -----------------------------
+def _proyectar_saldos_dos_fases_mensual(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_bruta_scenario: float,
+    tasa_admin_real: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    tope_art_151_abs: float,
+    tope_art_185: float,
+    reinvertir_beneficio: bool,
+    topes_anuales=None,
+):
+    """Implementación original mes a mes; misma firma y resultado que proyectar_saldos_dos_fases."""
+    tasa_neta = max(0.0, float(tasa_bruta_scenario) - float(tasa_admin_real))
+
+    plazo_anos = int(edad_fin_aportes - edad_actual)
+    contrib_meses = max(0, int(plazo_anos) * 12)
+    total_meses = max(0, int((int(edad_objetivo) - int(edad_actual)) * 12))
+
+    saldo = 0.0
+    saldo_fin_aportes = None
+    aporte_actual = float(ahorro_mensual)
+
+    tope, deduce = _tope_y_deduccion(
+        estrategia_fiscal, validar_sueldo, sueldo_anual, tope_art_151_abs, tope_art_185, topes_anuales
+    )
+    topes = np.atleast_1d(tope).tolist()
+
+    aporte_anual_real = 0.0
+
+    for i in range(1, total_meses + 1):
+        rendimiento_mensual = saldo * (tasa_neta / 12.0)
+        aporte_mes = aporte_actual if i <= contrib_meses else 0.0
+        saldo += rendimiento_mensual + aporte_mes
+
+        if i <= contrib_meses:
+            aporte_anual_real += aporte_mes
+
+        if i == contrib_meses:
+            saldo_fin_aportes = saldo
+
+        # Cierre de año mientras aportas: beneficio fiscal e inflación
+        if i % 12 == 0 and i <= contrib_meses:
+            if deduce:
+                aporte_deducible = min(aporte_anual_real, topes[min(i // 12 - 1, len(topes) - 1)])
+                devolucion_anio = aporte_deducible * float(isr_cliente)
+                if reinvertir_beneficio:
+                    saldo += devolucion_anio
+            aporte_anual_real = 0.0
+            if inflacion:
+                aporte_actual *= (1.0 + float(tasa_inflacion))
+
+    if saldo_fin_aportes is None:
+        saldo_fin_aportes = saldo  # si fin aportes coincide con objetivo
+
+    saldo_objetivo = saldo
+    return float(saldo_fin_aportes), float(saldo_objetivo), float(tasa_neta)
+
+
+def _proyectar_retiro_mensual(
+    saldo_inicial: float,
+    edad_retiro: int,
+    tasa_neta: float,
+    modo: str = "fijo",
+    retiro_mensual: float = 0.0,
+    porcentaje_anual: float = 0.04,
+    indexacion: float = 0.0,
+    edad_maxima: int = 100,
+    estrategia_fiscal: str = ESTRATEGIA_ART_93,
+    isr_retiro: float = 0.0,
+    exencion: float = 0.0,
+):
+    """Referencia mes a mes de proyectar_retiro: (edad_agotamiento, saldo_final, total_bruto, total_isr)."""
+    saldo = max(0.0, float(saldo_inicial))
+    retiro = float(retiro_mensual)
+    edad_agotamiento = None
+    total_bruto = total_isr = 0.0
+    exento_restante = float(exencion)
+
+    for i in range(max(0, int(edad_maxima) - int(edad_retiro)) * 12):
+        if i % 12 == 0:
+            if modo == "porcentaje":
+                retiro = saldo * float(porcentaje_anual) / 12.0
+            elif modo == "indexado" and i > 0:
+                retiro *= 1.0 + float(indexacion)
+        bruto = min(retiro, saldo) if edad_agotamiento is None else 0.0
+        if edad_agotamiento is None and saldo < retiro * (1.0 - 1e-9):
+            edad_agotamiento = int(edad_retiro) + i / 12.0
+        saldo = (saldo - bruto) * (1.0 + float(tasa_neta) / 12.0)
+
+        if estrategia_fiscal == ESTRATEGIA_ART_185:
+            isr = bruto * float(isr_retiro)
+        elif estrategia_fiscal == ESTRATEGIA_ART_151:
+            exento = min(bruto, exento_restante)
+            exento_restante -= exento
+            isr = (bruto - exento) * float(isr_retiro)
+        else:
+            isr = 0.0
+        total_bruto += bruto
+        total_isr += isr
+
+    return edad_agotamiento, float(saldo), float(total_bruto), float(total_isr)
@@ -0,0 +1,107 @@
+"""Reglas fiscales versionadas por ejercicio (topes Art. 151 / 185, UMA, exenciones).
+
+Los parámetros de cada año se leen de k360/datos/reglas_fiscales.json (o
+K360_REGLAS_FISCALES). Para años sin capturar se proyectan desde el último
+conocido, indexando los montos ligados a la UMA; los fijos en ley (tope del
+Art. 185) se mantienen.
+
+topes_por_anio arma una sola vez el vector de topes deducibles por año de
+aportación, con la estrategia ya resuelta (Art 93 = ceros), y el motor lo
+recibe como topes_anuales: dentro de la proyección ya no se compara la
+estrategia ni se usan los topes de hoy para años futuros.
+"""
+
+import functools
+import json
+import os
+from datetime import date
+
+import numpy as np
+
+from .proyeccion import ESTRATEGIA_ART_151, ESTRATEGIA_ART_185
+
+RUTA_REGLAS_DEFAULT = os.path.join(os.path.dirname(__file__), "datos", "reglas_fiscales.json")
+
+
+class ReglasFiscales:
+    """Parámetros fiscales por año, con proyección de los años futuros."""
+
+    def __init__(self, anios: dict, indexacion_anual: float = 0.0, indexados=()):
+        if not anios:
+            raise ValueError("Las reglas fiscales necesitan al menos un año de parámetros.")
+        self.anios = {int(a): dict(p) for a, p in anios.items()}
+        self.indexacion_anual = float(indexacion_anual)
+        self.indexados = tuple(indexados)
+        self.primer_anio = min(self.anios)
+        self.ultimo_anio = max(self.anios)
+
+    def parametros(self, anio: int) -> dict:
+        """Parámetros del ejercicio; los años futuros se indexan desde el último conocido."""
+        anio = int(anio)
+        if anio in self.anios:
+            return dict(self.anios[anio])
+        if anio < self.primer_anio:
+            return dict(self.anios[self.primer_anio])
+        base_anio = max(a for a in self.anios if a <= anio)
+        params = dict(self.anios[base_anio])
+        factor = (1.0 + self.indexacion_anual) ** (anio - base_anio)
+        for campo in self.indexados:
+            if campo in params:
+                params[campo] = float(params[campo]) * factor
+        return params
+
+    def serie(self, campo: str, anio_inicio: int, anos: int) -> np.ndarray:
+        """Valor de `campo` para anio_inicio, anio_inicio + 1, ... (anos valores)."""
+        return np.array([float(self.parametros(anio_inicio + i)[campo]) for i in range(int(anos))])
+
+    def exencion_retiro(self, anio: int) -> float:
+        """Monto exento de los retiros (UMAs anuales del ejercicio de retiro)."""
+        params = self.parametros(anio)
+        return float(params["exencion_retiro_umas"]) * float(params["uma_diaria"]) * 365.0
+
+    def topes_por_anio(
+        self,
+        estrategia_fiscal: str,
+        validar_sueldo: bool,
+        sueldo_anual: float,
+        anos: int,
+        anio_inicio: int | None = None,
+    ) -> np.ndarray:
+        """Tope deducible de cada año de aportación (ceros si la estrategia no deduce)."""
+        anio_inicio = date.today().year if anio_inicio is None else int(anio_inicio)
+        anos = max(1, int(anos))
+        if estrategia_fiscal == ESTRATEGIA_ART_151:
+            topes = self.serie("tope_art_151_abs", anio_inicio, anos)
+            if validar_sueldo:
+                porcentaje = self.serie("porcentaje_ingresos_art_151", anio_inicio, anos)
+                topes = np.minimum(topes, float(sueldo_anual) * porcentaje)
+            return topes
+        if estrategia_fiscal == ESTRATEGIA_ART_185:
+            return self.serie("tope_art_185", anio_inicio, anos)
+        return np.zeros(anos)
+
+
+@functools.lru_cache(maxsize=8)
+def _leer_reglas(ruta: str, _mtime_ns: int) -> ReglasFiscales:
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    return ReglasFiscales(datos["anios"], datos.get("indexacion_anual", 0.0), datos.get("indexados", ()))
+
+
+def cargar_reglas(ruta: str | None = None) -> ReglasFiscales:
+    """Reglas vigentes del archivo (se vuelven a leer si cambia su fecha de modificación)."""
+    ruta = ruta or os.environ.get("K360_REGLAS_FISCALES") or RUTA_REGLAS_DEFAULT
+    return _leer_reglas(ruta, os.stat(ruta).st_mtime_ns)
+
+
+def topes_por_anio(
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    anos: int,
+    anio_inicio: int | None = None,
+    reglas: ReglasFiscales | None = None,
+) -> np.ndarray:
+    """Atajo de ReglasFiscales.topes_por_anio con las reglas del archivo por default."""
+    reglas = reglas or cargar_reglas()
+    return reglas.topes_por_anio(estrategia_fiscal, validar_sueldo, sueldo_anual, anos, anio_inicio)
@@ -0,0 +1,124 @@
+"""Análisis de sensibilidad (tornado) del saldo a edad objetivo.
+
+Cada variable se mueve -delta / +delta dejando las demás en su valor base;
+los 2N escenarios más el base se evalúan en una sola llamada a
+proyectar_saldos_lote. Al mover la aportación o la edad de fin de aportes
+el costo de administración se vuelve a tomar de obtener_tasa_admin (puede
+cambiar de tramo); la variable "Costo de administración" mueve la tasa
+directamente.
+"""
+
+import numpy as np
+
+from .costos import obtener_tasa_admin
+from .fiscal import TOPE_ART_151_ABS, TOPE_ART_185
+from .proyeccion import proyectar_saldos_lote
+
+# variable -> (etiqueta, delta por default, escala y sufijo para mostrar el delta)
+DELTAS_SENSIBILIDAD = {
+    "tasa_bruta": ("Tasa bruta", 0.01, 100, " pp"),
+    "inflacion_pct": ("Inflación", 1.0, 1, " pp"),
+    "ahorro_mensual": ("Ahorro mensual", 0.10, 100, "%"),
+    "edad_fin_aportes": ("Fin de aportaciones", 2, 1, " años"),
+    "retiro": ("Edad objetivo", 2, 1, " años"),
+    "isr_cliente": ("% ISR", 0.05, 100, " pp"),
+    "tasa_admin": ("Costo de administración", 0.0025, 100, " pp"),
+}
+
+
+def analisis_sensibilidad(
+    ahorro_mensual: float,
+    edad_actual: int,
+    edad_fin_aportes: int,
+    edad_objetivo: int,
+    tasa_bruta: float,
+    inflacion: bool,
+    tasa_inflacion: float,
+    estrategia_fiscal: str,
+    validar_sueldo: bool,
+    sueldo_anual: float,
+    isr_cliente: float,
+    reinvertir_beneficio: bool,
+    tope_art_151_abs: float = TOPE_ART_151_ABS,
+    tope_art_185: float = TOPE_ART_185,
+    topes_anuales=None,
+    deltas: dict | None = None,
+):
+    """Devuelve (saldo_base, filas) con filas ordenadas de mayor a menor impacto.
+
+    deltas sobrescribe los de DELTAS_SENSIBILIDAD por variable. Cada fila:
+    variable, etiqueta, delta (texto), saldo_bajo, saldo_alto, impacto
+    (|alto - bajo|). La inflación solo aparece si está activa.
+    """
+    deltas = {k: v[1] for k, v in DELTAS_SENSIBILIDAD.items()} | dict(deltas or {})
+    edad_actual, edad_fin_aportes, edad_objetivo = int(edad_actual), int(edad_fin_aportes), int(edad_objetivo)
+
+    base = {
+        "ahorro_mensual": float(ahorro_mensual),
+        "edad_fin_aportes": edad_fin_aportes,
+        "edad_objetivo": edad_objetivo,
+        "tasa_bruta_scenario": float(tasa_bruta),
+        "tasa_inflacion": float(tasa_inflacion),
+        "isr_cliente": float(isr_cliente),
+        "ajuste_admin": 0.0,
+    }
+
+    def mover(variable: str, signo: int) -> dict:
+        d = deltas[variable] * signo
+        esc = dict(base)
+        if variable == "tasa_bruta":
+            esc["tasa_bruta_scenario"] = max(0.0, base["tasa_bruta_scenario"] + d)
+        elif variable == "inflacion_pct":
+            esc["tasa_inflacion"] = max(0.0, base["tasa_inflacion"] + d / 100.0)
+        elif variable == "ahorro_mensual":
+            esc["ahorro_mensual"] = max(0.0, base["ahorro_mensual"] * (1.0 + d))
+        elif variable == "edad_fin_aportes":
+            esc["edad_fin_aportes"] = int(np.clip(edad_fin_aportes + d, edad_actual + 1, max(edad_objetivo, edad_actual + 1)))
+        elif variable == "retiro":
+            esc["edad_objetivo"] = int(max(edad_fin_aportes, edad_objetivo + d))
+        elif variable == "isr_cliente":
+            esc["isr_cliente"] = float(np.clip(base["isr_cliente"] + d, 0.0, 1.0))
+        elif variable == "tasa_admin":
+            esc["ajuste_admin"] = d
+        return esc
+
+    variables = [v for v in DELTAS_SENSIBILIDAD if v != "inflacion_pct" or inflacion]
+    escenarios = [base] + [mover(v, s) for v in variables for s in (-1, 1)]
+
+    admin = np.maximum(0.0, obtener_tasa_admin(
+        np.array([e["ahorro_mensual"] for e in escenarios]),
+        np.array([e["edad_fin_aportes"] for e in escenarios]) - edad_actual,
+    ) + np.array([e["ajuste_admin"] for e in escenarios]))
+    _, saldos, _ = proyectar_saldos_lote(
+        ahorro_mensual=[e["ahorro_mensual"] for e in escenarios],
+        edad_actual=edad_actual,
+        edad_fin_aportes=[e["edad_fin_aportes"] for e in escenarios],
+        edad_objetivo=[e["edad_objetivo"] for e in escenarios],
+        tasa_bruta_scenario=[e["tasa_bruta_scenario"] for e in escenarios],
+        tasa_admin_real=admin,
+        inflacion=bool(inflacion),
+        tasa_inflacion=[e["tasa_inflacion"] for e in escenarios],
+        estrategia_fiscal=str(estrategia_fiscal),
+        validar_sueldo=bool(validar_sueldo),
+        sueldo_anual=float(sueldo_anual),
+        isr_cliente=[e["isr_cliente"] for e in escenarios],
+        tope_art_151_abs=float(tope_art_151_abs),
+        tope_art_185=float(tope_art_185),
+        reinvertir_beneficio=bool(reinvertir_beneficio),
+        topes_anuales=topes_anuales,
+    )
+
+    filas = []
+    for i, variable in enumerate(variables):
+        etiqueta, _, escala, sufijo = DELTAS_SENSIBILIDAD[variable]
+        bajo, alto = float(saldos[1 + 2 * i]), float(saldos[2 + 2 * i])
+        filas.append({
+            "variable": variable,
+            "etiqueta": etiqueta,
+            "delta": f"±{deltas[variable] * escala:g}{sufijo}",
+            "saldo_bajo": bajo,
+            "saldo_alto": alto,
+            "impacto": abs(alto - bajo),
+        })
+    filas.sort(key=lambda f: f["impacto"], reverse=True)
+    return float(saldos[0]), filas
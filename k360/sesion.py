@@ -0,0 +1,182 @@
+"""Sesiones firmadas sin estado y conteo de intentos de login compartido.
+
+Un token de sesión es `payload.firma` (base64url): el payload lleva usuario,
+un identificador único (jti) y expiración, y la firma es HMAC-SHA256 con el
+secreto del despliegue. Cualquier réplica con el mismo secreto valida el
+token en O(1), sin sesión pegada a un servidor. El rol no viaja en el token:
+se lee de la configuración en cada validación.
+
+Los intentos fallidos se cuentan por usuario en un almacén enchufable:
+IntentosMemoria (un proceso) o IntentosSQLite (archivo compartido por los
+procesos de la máquina). Así el bloqueo no se reinicia al abrir otra pestaña
+o reconectar a otra réplica. El mismo almacén guarda los jti revocados al
+cerrar sesión, hasta que el token expiraría de todos modos.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+
+# -----------------------------
+# Tokens firmados
+# -----------------------------
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode("ascii")
+
+
+def _desb64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _firma(payload: str, secreto: str) -> str:
+    return _b64(hmac.new(secreto.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def firmar_token(usuario: str, ttl_segundos: float, secreto: str, ahora: float | None = None) -> str:
+    """Token `payload.firma` con jti aleatorio que expira ttl_segundos después de `ahora`."""
+    ahora = time.time() if ahora is None else float(ahora)
+    datos = {"u": str(usuario), "j": secrets.token_urlsafe(12), "exp": int(ahora + float(ttl_segundos))}
+    payload = _b64(json.dumps(datos, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    return f"{payload}.{_firma(payload, secreto)}"
+
+
+def validar_token(token: str | None, secreto: str, ahora: float | None = None) -> dict | None:
+    """{"usuario", "jti", "exp"} si la firma es válida y no ha expirado; None si no.
+
+    No consulta revocaciones: el llamador revisa `almacen.revocado(jti)`.
+    """
+    # El token llega del cliente: cualquier cosa que no sea ASCII o no tenga la forma esperada es inválida
+    if not isinstance(token, str) or not token.isascii() or token.count(".") != 1:
+        return None
+    payload, firma = token.split(".")
+    try:
+        if not hmac.compare_digest(firma, _firma(payload, secreto)):
+            return None
+        datos = json.loads(_desb64(payload))
+        expira = float(datos.get("exp", 0)) if isinstance(datos, dict) else 0.0
+    except (UnicodeError, TypeError, ValueError):
+        return None
+    ahora = time.time() if ahora is None else float(ahora)
+    if expira <= ahora:
+        return None
+    return {"usuario": datos.get("u"), "jti": str(datos.get("j", "")), "exp": expira}
+
+
+def secreto_efimero() -> str:
+    """Secreto aleatorio del proceso (solo sirve con una réplica; configura uno fijo)."""
+    return secrets.token_urlsafe(32)
+
+
+# -----------------------------
+# Intentos fallidos (throttle)
+# -----------------------------
+class IntentosMemoria:
+    """Intentos por clave y sesiones revocadas en memoria del proceso."""
+
+    def __init__(self):
+        self._datos = {}  # clave -> (intentos, bloqueado_hasta)
+        self._revocados = {}  # jti -> expiración del token
+        self._lock = threading.Lock()
+
+    def bloqueado_hasta(self, clave: str) -> float:
+        with self._lock:
+            return self._datos.get(clave, (0, 0.0))[1]
+
+    def registrar_fallo(self, clave: str, max_intentos: int, bloqueo_segundos: float) -> float:
+        """Suma un intento; al llegar a max_intentos bloquea y reinicia el conteo. Devuelve bloqueado_hasta."""
+        with self._lock:
+            intentos, hasta = self._datos.get(clave, (0, 0.0))
+            intentos += 1
+            if intentos >= int(max_intentos):
+                intentos, hasta = 0, time.time() + float(bloqueo_segundos)
+            self._datos[clave] = (intentos, hasta)
+            return hasta
+
+    def reiniciar(self, clave: str) -> None:
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def revocar(self, jti: str, expira: float) -> None:
+        """Invalida el token `jti` hasta su expiración (después ya no valida por sí solo)."""
+        ahora = time.time()
+        with self._lock:
+            self._revocados = {j: e for j, e in self._revocados.items() if e > ahora}
+            self._revocados[jti] = float(expira)
+
+    def revocado(self, jti: str) -> bool:
+        with self._lock:
+            return jti in self._revocados
+
+
+class IntentosSQLite:
+    """Intentos por clave y sesiones revocadas en un archivo SQLite compartido por los procesos de la máquina."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        with self._conexion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS intentos ("
+                "clave TEXT PRIMARY KEY, intentos INTEGER NOT NULL, bloqueado_hasta REAL NOT NULL)"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS revocados (jti TEXT PRIMARY KEY, expira REAL NOT NULL)")
+
+    def _conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            self._local.con = con
+        return con
+
+    def bloqueado_hasta(self, clave: str) -> float:
+        fila = self._conexion().execute("SELECT bloqueado_hasta FROM intentos WHERE clave = ?", (clave,)).fetchone()
+        return float(fila[0]) if fila else 0.0
+
+    def registrar_fallo(self, clave: str, max_intentos: int, bloqueo_segundos: float) -> float:
+        con = self._conexion()
+        # BEGIN IMMEDIATE: leer y escribir el conteo sin que otro proceso se cuele
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            fila = con.execute("SELECT intentos, bloqueado_hasta FROM intentos WHERE clave = ?", (clave,)).fetchone()
+            intentos, hasta = (int(fila[0]), float(fila[1])) if fila else (0, 0.0)
+            intentos += 1
+            if intentos >= int(max_intentos):
+                intentos, hasta = 0, time.time() + float(bloqueo_segundos)
+            con.execute(
+                "INSERT INTO intentos (clave, intentos, bloqueado_hasta) VALUES (?, ?, ?) "
+                "ON CONFLICT(clave) DO UPDATE SET intentos = excluded.intentos, bloqueado_hasta = excluded.bloqueado_hasta",
+                (clave, intentos, hasta),
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        return hasta
+
+    def reiniciar(self, clave: str) -> None:
+        self._conexion().execute("DELETE FROM intentos WHERE clave = ?", (clave,))
+
+    def revocar(self, jti: str, expira: float) -> None:
+        con = self._conexion()
+        con.execute("DELETE FROM revocados WHERE expira <= ?", (time.time(),))
+        con.execute("INSERT OR REPLACE INTO revocados (jti, expira) VALUES (?, ?)", (jti, float(expira)))
+
+    def revocado(self, jti: str) -> bool:
+        return self._conexion().execute("SELECT 1 FROM revocados WHERE jti = ?", (jti,)).fetchone() is not None
+
+
+def crear_almacen_intentos(especificacion: str | None):
+    """"memoria" o "sqlite:<ruta>" (default sqlite:auth_intentos_k360.sqlite3)."""
+    especificacion = (especificacion or "sqlite:auth_intentos_k360.sqlite3").strip()
+    if especificacion == "memoria":
+        return IntentosMemoria()
+    if especificacion.startswith("sqlite:"):
+        return IntentosSQLite(especificacion[len("sqlite:"):])
+    raise ValueError(f"Almacén de intentos no soportado: {especificacion!r} (usa 'memoria' o 'sqlite:<ruta>').")
@@ -0,0 +1,117 @@
+"""Almacén de propuestas: aislamiento por asesor, búsqueda, paginación, PDFs y versión del motor."""
+
+import os
+import sqlite3
+
+import pytest
+
+from k360 import almacen as modulo_almacen
+from k360.almacen import AlmacenPropuestas, abrir_almacen, version_motor
+from k360.costos import RUTA_TABLA_DEFAULT
+
+RESULTADOS = {"saldo_final": 1_234_567.0, "beneficio_sat": 89_000.0}
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenPropuestas(str(tmp_path / "propuestas.sqlite3"))
+
+
+def _guardar(almacen, cliente, asesor="ana", pdf=None):
+    return almacen.guardar(asesor, cliente, {"ahorro_mensual": 3000.0}, RESULTADOS, pdf)
+
+
+def test_otro_asesor_no_ve_la_propuesta_ni_su_pdf(almacen):
+    id_ana = _guardar(almacen, "Cliente A", pdf=b"%PDF-a")
+
+    assert almacen.obtener(id_ana, "ana")["entradas"] == {"ahorro_mensual": 3000.0}
+    assert almacen.obtener(id_ana, "beto") is None
+    assert almacen.pdf(id_ana, "ana") == b"%PDF-a"
+    assert almacen.pdf(id_ana, "beto") is None
+    assert almacen.listar("beto") == ([], 0)
+    assert almacen.obtener(id_ana)["asesor"] == "ana"  # sin asesor: acceso administrativo
+    assert almacen.obtener(9999, "ana") is None
+
+
+@pytest.mark.parametrize("busqueda, esperados", [
+    ("100%", ["100% Seguro"]),
+    ("%", ["100% Seguro"]),
+    ("a_b", ["a_b Consultores"]),
+    ("_", ["a_b Consultores"]),
+    ("\\", ["Barra \\ Invertida"]),
+    ("consultores", ["axb Consultores", "a_b Consultores"]),
+])
+def test_comodines_de_like_se_buscan_literalmente(almacen, busqueda, esperados):
+    for cliente in ("100% Seguro", "1000 Seguro", "a_b Consultores", "axb Consultores", "Barra \\ Invertida"):
+        _guardar(almacen, cliente)
+    filas, total = almacen.listar("ana", busqueda)
+    assert sorted(f["cliente"] for f in filas) == sorted(esperados)
+    assert total == len(esperados)
+
+
+@pytest.mark.parametrize("busqueda, esperados", [
+    ("jose perez", ["José Pérez"]),
+    ("PÉREZ", ["José Pérez"]),
+    ("  José   Pérez ", ["José Pérez"]),
+    ("josé", ["José Pérez", "Joselyn Ruiz"]),
+    ("ruíz", ["Joselyn Ruiz"]),
+])
+def test_busqueda_sin_acentos_ni_mayusculas(almacen, busqueda, esperados):
+    _guardar(almacen, "José Pérez")
+    _guardar(almacen, "Joselyn Ruiz")
+    filas, _ = almacen.listar("ana", busqueda)
+    assert sorted(f["cliente"] for f in filas) == sorted(esperados)
+
+
+def test_paginacion_y_total(almacen):
+    ids = [_guardar(almacen, f"Cliente {i:02d}") for i in range(25)]
+    _guardar(almacen, "De otro asesor", asesor="beto")
+
+    paginas = [almacen.listar("ana", pagina=p, por_pagina=10) for p in range(3)]
+    assert [len(filas) for filas, _ in paginas] == [10, 10, 5]
+    assert {total for _, total in paginas} == {25}
+    # Las más recientes primero, sin repetir entre páginas
+    assert [f["id"] for filas, _ in paginas for f in filas] == ids[::-1]
+    assert almacen.listar("ana", "cliente 1", por_pagina=3)[1] == 10
+
+
+def test_pdf_identico_se_guarda_una_vez(almacen):
+    primero = _guardar(almacen, "Uno", pdf=b"%PDF-mismo")
+    segundo = _guardar(almacen, "Dos", pdf=b"%PDF-mismo")
+    sin_pdf = _guardar(almacen, "Tres")
+
+    with sqlite3.connect(almacen.ruta) as con:
+        assert con.execute("SELECT COUNT(*) FROM pdfs").fetchone()[0] == 1
+    assert almacen.pdf(primero) == almacen.pdf(segundo) == b"%PDF-mismo"
+    assert almacen.obtener(primero)["pdf_sha256"] == almacen.obtener(segundo)["pdf_sha256"]
+    assert almacen.pdf(sin_pdf) is None
+    assert {f["cliente"]: f["tiene_pdf"] for f in almacen.listar("ana")[0]} == {"Uno": True, "Dos": True, "Tres": False}
+
+
+def test_guarda_la_version_del_motor(almacen):
+    id_propuesta = _guardar(almacen, "Cliente")
+    assert almacen.obtener(id_propuesta)["version_motor"] == version_motor()
+    assert almacen.obtener(id_propuesta)["resultados"] == RESULTADOS
+
+
+def test_version_del_motor_cubre_modulos_y_tablas_en_uso(tmp_path, monkeypatch):
+    assert {"reglas_fiscales.py", "montecarlo.py", "proyeccion.py", "costos.py"} <= set(modulo_almacen._ARCHIVOS_MOTOR)
+    for nombre in modulo_almacen._ARCHIVOS_MOTOR:
+        assert os.path.exists(os.path.join(modulo_almacen._DIR_K360, nombre))
+
+    original = version_motor()
+    tabla = tmp_path / "tasas.json"
+    with open(RUTA_TABLA_DEFAULT, "rb") as f:
+        tabla.write_bytes(f.read())
+    monkeypatch.setenv("K360_TABLA_COSTOS", str(tabla))
+    assert version_motor() == original  # mismo contenido, misma versión
+
+    tabla.write_bytes(tabla.read_bytes().replace(b"0.0228", b"0.0230"))
+    os.utime(tabla, ns=(0, os.stat(tabla).st_mtime_ns + 10**9))
+    assert version_motor() != original
+
+
+def test_abrir_almacen_compartido_por_ruta(tmp_path, monkeypatch):
+    monkeypatch.setenv("K360_ALMACEN", str(tmp_path / "a.sqlite3"))
+    assert abrir_almacen() is abrir_almacen(str(tmp_path / "a.sqlite3"))
+    assert abrir_almacen(str(tmp_path / "b.sqlite3")) is not abrir_almacen()
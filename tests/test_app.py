@@ -0,0 +1,122 @@
+"""Smoke tests de la app con el AppTest de Streamlit (simulador sin auth y flujo de login).
+
+AppTest vuelve a correr el script completo en cada interacción, así que aquí
+se verifica que las secciones con rerun propio (meta, exportar) funcionan
+dentro del script completo, no la latencia del rerun por fragmento.
+"""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("K360_PDF_EJECUTOR", "hilos")
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("K360_ALMACEN", str(tmp_path / "propuestas.sqlite3"))
+    at = AppTest.from_file(RUTA_APP, default_timeout=60)
+    at.secrets["auth"] = {"enabled": False}
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_carga_con_proyeccion_y_comparador(app):
+    assert app.dataframe  # tabla del comparador
+    assert any("Saldo" in m.label for m in app.metric)
+
+
+def test_calculadora_de_meta(app):
+    resolver = next(r for r in app.radio if r.label == "Resolver")
+    for opcion in ("Ahorro mensual", "Tasa bruta", "Fin de aportaciones"):
+        resolver.set_value(opcion).run()
+        assert not app.exception
+        assert app.success or app.warning
+
+
+def test_generar_pdf_desde_la_seccion_exportar(app):
+    next(b for b in app.button if b.label == "Generar PDF").click().run()
+    for _ in range(100):
+        if any("éxito" in s.value for s in app.success) or app.error:
+            break
+        time.sleep(0.2)
+        app.run()
+    assert not app.exception
+    assert not app.error
+    assert any("éxito" in s.value for s in app.success)
+
+
+def _con_login(secretos):
+    at = AppTest.from_file(RUTA_APP, default_timeout=60)
+    at.secrets["auth"] = secretos
+    return at
+
+
+@pytest.fixture
+def secretos_auth(tmp_path, monkeypatch):
+    monkeypatch.setenv("K360_ALMACEN", str(tmp_path / "propuestas.sqlite3"))
+    return {
+        "enabled": True, "max_attempts": 3, "lockout_minutes": 5, "session_secret": "secreto-de-prueba",
+        "throttle_store": f"sqlite:{tmp_path / 'intentos.sqlite3'}",
+        "users": {"jay": {"password_sha256": hashlib.sha256(b"clave").hexdigest(), "role": "admin"}},
+    }
+
+
+def _entrar(at):
+    at.run()
+    at.text_input[0].input("jay")
+    at.text_input[1].input("clave")
+    at.button[0].click().run()
+    assert not at.exception
+    return at
+
+
+def test_login_guarda_el_token_en_cookie_y_no_en_la_url(secretos_auth):
+    at = _entrar(_con_login(secretos_auth))
+    token = at.session_state["_auth_token"]
+
+    assert at.session_state["_auth_role"] == "admin"
+    assert "sesion" not in dict(at.query_params)
+    assert any(f"k360_sesion={token}" in h.proto.body for h in at.get("html"))
+
+
+def test_cerrar_sesion_revoca_el_token(secretos_auth):
+    at = _entrar(_con_login(secretos_auth))
+    token = at.session_state["_auth_token"]
+    next(b for b in at.sidebar.button if "Cerrar" in b.label).click().run()
+    assert [t.value for t in at.title] == ["🔐 Acceso privado"]
+
+    otra = _con_login(secretos_auth)
+    otra.session_state["_auth_token"] = token  # p. ej. copiado de otra pestaña
+    otra.run()
+    assert [t.value for t in otra.title] == ["🔐 Acceso privado"]
+
+
+def test_rol_se_lee_de_la_configuracion(secretos_auth):
+    token = _entrar(_con_login(secretos_auth)).session_state["_auth_token"]
+    degradado = dict(secretos_auth, users={"jay": dict(secretos_auth["users"]["jay"], role="viewer")})
+
+    at = _con_login(degradado)
+    at.session_state["_auth_token"] = token
+    at.run()
+    assert at.session_state["_auth_role"] == "viewer"
+
+    sin_usuario = _con_login(dict(secretos_auth, users={"otro": secretos_auth["users"]["jay"]}))
+    sin_usuario.session_state["_auth_token"] = token
+    sin_usuario.run()
+    assert [t.value for t in sin_usuario.title] == ["🔐 Acceso privado"]
+
+
+def test_token_malformado_en_la_url_no_rompe_el_login(secretos_auth):
+    at = _con_login(secretos_auth)
+    at.query_params["sesion"] = "ñandú.abc"
+    at.run()
+    assert not at.exception
+    assert [t.value for t in at.title] == ["🔐 Acceso privado"]
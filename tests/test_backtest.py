@@ -0,0 +1,130 @@
+"""Backtest por ventanas móviles contra el motor determinista y un bucle directo."""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from k360.backtest import backtest_ventanas, cargar_historial, leer_historial
+from k360.bench import PARAMETROS_BASE
+from k360.costos import obtener_tasa_admin
+from k360.proyeccion import ESTRATEGIA_ART_185, ESTRATEGIA_ART_93, proyectar_saldos_dos_fases
+
+
+def _plan(edad=30, fin=50, objetivo=60, **extra):
+    return dict(
+        PARAMETROS_BASE, edad_actual=edad, edad_fin_aportes=fin, edad_objetivo=objetivo,
+        tasa_admin_real=obtener_tasa_admin(PARAMETROS_BASE["ahorro_mensual"], fin - edad), **extra,
+    )
+
+
+def _sin_tasa(plan):
+    return {k: v for k, v in plan.items() if k != "tasa_bruta_scenario"}
+
+
+@pytest.mark.parametrize("plan", [
+    _plan(),
+    _plan(18, 43, 65, estrategia_fiscal=ESTRATEGIA_ART_93),
+    _plan(40, 45, 45, reinvertir_beneficio=False),
+    _plan(30, 70, 65, estrategia_fiscal=ESTRATEGIA_ART_185, inflacion=False),
+])
+def test_rendimiento_constante_igual_al_motor_determinista(plan):
+    meses = 12 * (plan["edad_objetivo"] - plan["edad_actual"])
+    rendimientos = np.full(meses + 36, plan["tasa_bruta_scenario"] / 12.0)
+    resultado = backtest_ventanas(rendimientos, **_sin_tasa(plan))
+
+    saldo_fin, saldo_objetivo, _ = proyectar_saldos_dos_fases(**plan)
+    assert resultado["ventanas"] == 37
+    np.testing.assert_allclose(resultado["saldo_objetivo"], saldo_objetivo, rtol=1e-9)
+    np.testing.assert_allclose(resultado["saldo_fin_aportes"], saldo_fin, rtol=1e-9)
+    np.testing.assert_allclose(resultado["tasa_anualizada"], (1 + plan["tasa_bruta_scenario"] / 12) ** 12 - 1)
+
+
+def _bucle(r, infl, s, plan):
+    """Saldo a edad objetivo de la ventana que empieza en s, mes a mes."""
+    meses = 12 * (plan["edad_objetivo"] - plan["edad_actual"])
+    anos_aporte = plan["edad_fin_aportes"] - plan["edad_actual"]
+    tope = plan["tope_art_151_abs"]
+    aporte, saldo = plan["ahorro_mensual"], 0.0
+    for m in range(meses):
+        anio = m // 12
+        if m and m % 12 == 0:
+            aporte *= np.prod(1.0 + infl[s + m - 12:s + m])
+        saldo *= 1.0 + r[s + m] - plan["tasa_admin_real"] / 12.0
+        if anio < anos_aporte:
+            saldo += aporte  # al cierre del mes, como el motor determinista
+        if anio < anos_aporte and m % 12 == 11:
+            saldo += min(aporte * 12.0, tope) * plan["isr_cliente"]
+    return saldo
+
+
+def test_rendimientos_e_inflacion_historicos_igual_a_bucle():
+    rng = np.random.default_rng(7)
+    plan = _plan(40, 50, 55)
+    r = rng.normal(0.007, 0.04, 12 * 30)
+    infl = rng.normal(0.004, 0.002, 12 * 30)
+    resultado = backtest_ventanas(r, **_sin_tasa(plan), inflacion_historica=infl)
+
+    for s in (0, 17, resultado["ventanas"] - 1):
+        assert resultado["saldo_objetivo"][s] == pytest.approx(_bucle(r, infl, s, plan), rel=1e-10)
+    deflactor = np.prod(1.0 + infl[:resultado["meses"]])
+    assert resultado["saldo_objetivo_real"][0] == pytest.approx(resultado["saldo_objetivo"][0] / deflactor)
+
+
+def test_peor_y_mejor_ventana():
+    plan = _plan(40, 45, 45)
+    r = np.full(12 * 10, 0.005)
+    r[12 * 5] = -0.3  # caída en el sexto año del historial
+    fechas = pd.date_range("2000-01-01", periods=len(r), freq="MS").strftime("%Y-%m").to_numpy()
+    resultado = backtest_ventanas(r, **_sin_tasa(plan), fechas=fechas)
+
+    assert resultado["peor"]["saldo_objetivo"] == pytest.approx(resultado["saldo_objetivo"].min())
+    assert resultado["mejor"]["saldo_objetivo"] == pytest.approx(resultado["saldo_objetivo"].max())
+    assert resultado["peor"]["fin"] == "2005-01"  # la caída al final de la ventana pega más
+    p10, p50, p90 = resultado["percentiles"]
+    assert p10 <= p50 <= p90
+
+
+def test_historial_insuficiente():
+    with pytest.raises(ValueError, match="insuficiente"):
+        backtest_ventanas(np.full(12, 0.01), **_sin_tasa(_plan()))
+
+
+def test_leer_historial_csv_en_porcentaje_y_desordenado():
+    csv = "Fecha,Rendimiento,Inflacion\n2020-02-01,-1.5,0.3\n2020-01-01,2.0,0.5\n"
+    historial = leer_historial(csv.encode(), "historial.csv")
+    assert list(historial["fecha"]) == ["2020-01", "2020-02"]
+    np.testing.assert_allclose(historial["rendimiento"], [0.02, -0.015])
+    np.testing.assert_allclose(historial["inflacion"], [0.005, 0.003])
+
+
+def test_inflacion_mensual_en_porcentaje_con_rendimiento_decimal():
+    historial = leer_historial(b"fecha,rendimiento,inflacion\n2020-01-01,0.01,0.3\n2020-02-01,0.02,0.4\n", "h.csv")
+    np.testing.assert_allclose(historial["rendimiento"], [0.01, 0.02])
+    np.testing.assert_allclose(historial["inflacion"], [0.003, 0.004])
+
+
+def test_leer_historial_parquet_sin_inflacion():
+    pytest.importorskip("pyarrow")
+    buffer = io.BytesIO()
+    pd.DataFrame({"date": ["2021-01-01", "2021-02-01"], "return": [0.01, 0.02]}).to_parquet(buffer)
+    historial = leer_historial(buffer.getvalue(), "h.parquet")
+    assert historial["inflacion"] is None
+    np.testing.assert_allclose(historial["rendimiento"], [0.01, 0.02])
+
+
+def test_historial_invalido():
+    with pytest.raises(ValueError, match="columnas"):
+        leer_historial(b"mes_x,valor\n2020-01,1\n", "malo.csv")
+    with pytest.raises(ValueError, match="repetidos"):
+        leer_historial(b"fecha,rendimiento\n2020-01-01,1\n2020-01-01,2\n", "dup.csv")
+
+
+def test_cargar_historial_por_variable_de_entorno(tmp_path, monkeypatch):
+    monkeypatch.delenv("K360_RENDIMIENTOS_HISTORICOS", raising=False)
+    assert cargar_historial() is None
+    ruta = tmp_path / "h.csv"
+    ruta.write_text("fecha,rendimiento\n2020-01-01,0.01\n", encoding="utf-8")
+    monkeypatch.setenv("K360_RENDIMIENTOS_HISTORICOS", str(ruta))
+    assert list(cargar_historial()["fecha"]) == ["2020-01"]
@@ -0,0 +1,74 @@
+"""CacheLRU: desalojo por entradas y por bytes, y memoizar con claves canónicas."""
+
+import numpy as np
+import pytest
+
+from k360.cache import CacheLRU, clave_canonica, memoizar
+
+
+def test_desaloja_el_menos_usado_por_entradas():
+    cache = CacheLRU(max_entradas=2, max_bytes=10**9)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obtener("a") == 1  # "a" pasa a ser la más reciente
+    cache.guardar("c", 3)
+
+    assert cache.obtener("b", None) is None
+    assert cache.obtener("a") == 1 and cache.obtener("c") == 3
+    assert cache.estadisticas()["evictions"] == 1
+
+
+def test_desaloja_por_bytes():
+    cache = CacheLRU(max_entradas=100, max_bytes=3000)
+    for clave in "abc":
+        cache.guardar(clave, np.zeros(100))  # 800 bytes cada uno
+    cache.guardar("d", np.zeros(100))
+
+    estadisticas = cache.estadisticas()
+    assert estadisticas["bytes"] <= 3000
+    assert estadisticas["entradas"] == 3
+    assert cache.obtener("a", None) is None
+    assert cache.obtener("d") is not None
+
+
+def test_valor_mas_grande_que_el_presupuesto_no_vacia_la_cache():
+    cache = CacheLRU(max_entradas=10, max_bytes=1000)
+    cache.guardar("chico", np.zeros(10))
+    cache.guardar("grande", np.zeros(1000))
+
+    assert cache.obtener("grande", None) is None
+    assert cache.obtener("chico") is not None
+    assert cache.estadisticas()["evictions"] == 0
+
+
+def test_reemplazar_una_clave_no_duplica_bytes():
+    cache = CacheLRU(max_entradas=10, max_bytes=10**6)
+    cache.guardar("a", np.zeros(100))
+    cache.guardar("a", np.zeros(100))
+    assert cache.estadisticas()["entradas"] == 1
+    assert cache.estadisticas()["bytes"] == 800
+
+
+def test_clave_canonica_ignora_tipos_numpy_y_menos_cero():
+    assert clave_canonica("f", {"x": 1.0, "n": 3}) == clave_canonica("f", {"x": np.float64(1.0), "n": np.int64(3)})
+    assert clave_canonica("f", {"x": 0.0}) == clave_canonica("f", {"x": -0.0})
+    assert clave_canonica("f", {"x": 1.0}) != clave_canonica("g", {"x": 1.0})
+    assert clave_canonica("f", {"a": np.arange(3.0)}) != clave_canonica("f", {"a": np.arange(1.0, 4.0)})
+
+
+def test_memoizar_misma_clave_por_posicion_o_nombre():
+    cache = CacheLRU(max_entradas=10)
+    llamadas = []
+
+    @memoizar(cache=cache)
+    def doble(x, y=1.0):
+        llamadas.append((x, y))
+        return np.array([x * 2, y])
+
+    primero = doble(2.0)
+    segundo = doble(x=2.0, y=1.0)
+    assert len(llamadas) == 1
+    assert segundo is primero
+    assert cache.estadisticas()["hits"] == 1
+    with pytest.raises(ValueError):
+        primero[0] = 0.0  # los resultados compartidos son de solo lectura
@@ -0,0 +1,117 @@
+"""Cola de PDFs con hilos: deduplicación en vuelo, errores de una sola entrega, TTL y timeout."""
+
+import threading
+import time
+
+import pytest
+
+from k360 import cola_pdf as modulo_cola
+from k360.cola_pdf import DESCONOCIDO, EN_PROCESO, LISTO, ColaPDF
+
+DATOS = ({"nombre": "Ana"}, {"saldo_final": 1.0}, {"texto_analisis": ""}, {"nombre": "Asesor"})
+
+
+class RenderFalso:
+    """Sustituye a _renderizar: cuenta llamadas y puede detenerse hasta que se libere."""
+
+    def __init__(self, resultado=(b"%PDF-falso", None), excepcion=None):
+        self.resultado = resultado
+        self.excepcion = excepcion
+        self.llamadas = 0
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def __call__(self, *args):
+        self.llamadas += 1
+        self.liberar.wait(5)
+        if self.excepcion is not None:
+            raise self.excepcion
+        return self.resultado, 0.01
+
+
+@pytest.fixture
+def render(monkeypatch):
+    falso = RenderFalso()
+    monkeypatch.setattr(modulo_cola, "_renderizar", falso)
+    return falso
+
+
+@pytest.fixture
+def cola():
+    cola = ColaPDF(workers=2, ejecutor="hilos", ttl=60.0)
+    yield cola
+    cola.cerrar()
+
+
+def test_mismo_pdf_en_vuelo_se_genera_una_vez(cola, render):
+    render.liberar.clear()
+    clave = cola.enviar(*DATOS)
+    assert cola.enviar(*DATOS) == clave  # doble clic mientras se genera
+    assert cola.estado(clave)[0] == EN_PROCESO
+
+    render.liberar.set()
+    assert cola.esperar(clave, timeout=5) == (b"%PDF-falso", None)
+    assert cola.enviar(*DATOS) == clave  # ya en caché: no se vuelve a encolar
+    assert cola.estado(clave)[:2] == (LISTO, (b"%PDF-falso", None))
+    assert render.llamadas == 1
+
+
+def test_otro_contenido_es_otro_trabajo(cola, render):
+    clave = cola.enviar(*DATOS)
+    otra = cola.enviar(DATOS[0], {"saldo_final": 2.0}, *DATOS[2:])
+    assert otra != clave
+    cola.esperar(clave, timeout=5)
+    cola.esperar(otra, timeout=5)
+    assert render.llamadas == 2
+
+
+@pytest.mark.parametrize("falso", [
+    RenderFalso(resultado=(None, "fuente no encontrada")),
+    RenderFalso(excepcion=RuntimeError("worker caído")),
+])
+def test_error_se_entrega_una_sola_vez_y_no_se_cachea(cola, monkeypatch, falso):
+    monkeypatch.setattr(modulo_cola, "_renderizar", falso)
+    clave = cola.enviar(*DATOS)
+    pdf, error = cola.esperar(clave, timeout=5)
+
+    assert pdf is None and error
+    assert cola.estado(clave) == (DESCONOCIDO, None, 0.0)  # ya se entregó
+    cola.enviar(*DATOS)  # el siguiente clic reintenta
+    cola.esperar(clave, timeout=5)
+    assert falso.llamadas == 2
+
+
+def test_esperar_respeta_el_timeout(cola, render):
+    render.liberar.clear()
+    clave = cola.enviar(*DATOS)
+
+    inicio = time.monotonic()
+    assert cola.esperar(clave, timeout=0.05) is None
+    assert time.monotonic() - inicio < 1.0
+    assert cola.estado(clave)[0] == EN_PROCESO
+
+    render.liberar.set()
+    assert cola.esperar(clave, timeout=5) == (b"%PDF-falso", None)
+
+
+def test_resultado_expira_con_el_ttl(render):
+    cola = ColaPDF(workers=1, ejecutor="hilos", ttl=0.05)
+    try:
+        clave = cola.enviar(*DATOS)
+        assert cola.esperar(clave, timeout=5) is not None
+        time.sleep(0.1)
+        assert cola.estado(clave)[0] == DESCONOCIDO
+        cola.esperar(cola.enviar(*DATOS), timeout=5)
+        assert render.llamadas == 2
+    finally:
+        cola.cerrar()
+
+
+def test_clave_desconocida(cola):
+    assert cola.estado("no-existe") == (DESCONOCIDO, None, 0.0)
+    assert cola.esperar("no-existe", timeout=0.01) is None
+
+
+def test_ejecutor_invalido():
+    with pytest.raises(ValueError):
+        ColaPDF(ejecutor="asyncio")
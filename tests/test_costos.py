@@ -0,0 +1,65 @@
+"""Tabla de costos versionada: tramos, camino escalar vs. vectorizado y vigencias."""
+
+import json
+
+import numpy as np
+import pytest
+
+from k360.costos import TablaCostos, obtener_tasa_admin, tabla_vigente
+
+
+@pytest.mark.parametrize("aporte, plazo, esperado", [
+    (2000.0, 10, 0.0228),
+    (2499.99, 19.9, 0.0228),
+    (2500.0, 20, 0.0199),
+    (4000.0, 24, 0.0181),
+    (5000.0, 25, 0.0164),
+    (10_000.0, 40, 0.0153),
+    (-1.0, 30, 0.0228),  # fuera de tabla
+])
+def test_tramos_de_la_tabla_vigente(aporte, plazo, esperado):
+    assert obtener_tasa_admin(aporte, plazo, fecha="2025-06-01") == pytest.approx(esperado)
+
+
+def test_vectorizado_igual_a_escalar():
+    aportes = np.array([-5.0, 0.0, 1000.0, 2500.0, 3999.0, 4000.0, 7500.0, 9999.0, 10_000.0, 50_000.0])
+    plazos = np.array([0.0, 5.0, 19.0, 20.0, 24.9, 25.0, 60.0])
+    malla_aporte, malla_plazo = np.meshgrid(aportes, plazos, indexing="ij")
+
+    vector = obtener_tasa_admin(malla_aporte, malla_plazo)
+    escalar = np.vectorize(lambda a, p: obtener_tasa_admin(float(a), float(p)))(malla_aporte, malla_plazo)
+    assert vector.shape == malla_aporte.shape
+    np.testing.assert_array_equal(vector, escalar)
+
+
+def test_aportacion_nan_usa_la_tasa_fuera_de_tabla():
+    assert obtener_tasa_admin(np.array([np.nan]), np.array([30.0]))[0] == pytest.approx(0.0228)
+    assert obtener_tasa_admin(float("nan"), 30) == pytest.approx(0.0228)
+
+
+def _escribir_tablas(ruta, versiones):
+    ruta.write_text(json.dumps({"version": 1, "productos": {"prueba": versiones}}), encoding="utf-8")
+    return str(ruta)
+
+
+def _version(vigencia, tasa):
+    return {"vigencia": vigencia, "plazos_min": [0, 10], "montos_min": [0, 1000],
+            "tasas": [[tasa, tasa], [tasa / 2, tasa / 2]], "tasa_fuera_de_tabla": tasa}
+
+
+def test_elige_la_vigencia_mas_reciente_no_posterior(tmp_path):
+    ruta = _escribir_tablas(tmp_path / "tasas.json", [_version("2025-01-01", 0.02), _version("2024-01-01", 0.03)])
+
+    assert tabla_vigente("prueba", "2024-06-30", ruta).vigencia == "2024-01-01"
+    assert tabla_vigente("prueba", "2025-01-01", ruta).tasa(500.0, 5) == pytest.approx(0.02)
+    with pytest.raises(ValueError, match="vigente"):
+        tabla_vigente("prueba", "2023-12-31", ruta)
+    with pytest.raises(ValueError, match="Producto"):
+        tabla_vigente("otro", "2025-01-01", ruta)
+
+
+def test_tabla_invalida():
+    with pytest.raises(ValueError, match="2x2"):
+        TablaCostos("x", "2024-01-01", [0, 1000], [0, 10], [[0.02, 0.02]], 0.02)
+    with pytest.raises(ValueError, match="crecientes"):
+        TablaCostos("x", "2024-01-01", [1000, 0], [0, 10], [[0.02, 0.02], [0.02, 0.02]], 0.02)
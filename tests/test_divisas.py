@@ -0,0 +1,81 @@
+"""Planes en USD: trayectoria de tipo de cambio y simulación conjunta contra el motor en pesos."""
+
+import numpy as np
+import pytest
+
+from k360.bench import PARAMETROS_BASE
+from k360.divisas import simular_plan_usd, trayectoria_tipo_cambio
+from k360.proyeccion import ESTRATEGIA_ART_185, proyectar_saldos_lote
+
+TASAS = np.array([0.06, 0.085, 0.105])
+VOLATILIDADES = np.array([0.05, 0.10, 0.16])
+
+
+def _plan(edad=30, fin=50, objetivo=65, **extra):
+    return dict(PARAMETROS_BASE, edad_actual=edad, edad_fin_aportes=fin, edad_objetivo=objetivo,
+                tasa_admin_real=0.0164, tasa_bruta_scenario=TASAS, **extra)
+
+
+def test_trayectoria_tipo_cambio():
+    tc = trayectoria_tipo_cambio(20.0, 3, depreciacion_anual=0.05)
+    assert tc.shape == (36,)
+    np.testing.assert_allclose(tc[11::12], 20.0 * 1.05 ** np.arange(1, 4))
+    np.testing.assert_allclose(tc[:12], 20.0 * 1.05 ** (np.arange(1, 13) / 12.0))
+
+    dada = trayectoria_tipo_cambio(20.0, 2, trayectoria_anual=[22.0, 19.0, 30.0])
+    np.testing.assert_allclose(dada[[11, 23]], [22.0, 19.0])
+    with pytest.raises(ValueError):
+        trayectoria_tipo_cambio(20.0, 3, trayectoria_anual=[22.0, 19.0])
+    with pytest.raises(ValueError):
+        trayectoria_tipo_cambio(0.0, 3)
+
+
+@pytest.mark.parametrize("plan", [_plan(), _plan(40, 45, 45, estrategia_fiscal=ESTRATEGIA_ART_185), _plan(30, 70, 65)])
+def test_tipo_cambio_constante_igual_al_motor_en_pesos(plan):
+    resultado = simular_plan_usd(**plan, tipo_cambio_inicial=20.0, depreciacion_anual=0.0, volatilidad_tc=0.0,
+                                 n_trayectorias=5)
+    saldo_fin, saldo_objetivo, _ = proyectar_saldos_lote(**plan)
+
+    np.testing.assert_allclose(resultado["saldo_objetivo_mxn"], saldo_objetivo, rtol=1e-12)
+    np.testing.assert_allclose(resultado["saldo_fin_aportes_mxn"], saldo_fin, rtol=1e-12)
+    np.testing.assert_allclose(resultado["saldo_objetivo_usd"], saldo_objetivo / 20.0, rtol=1e-12)
+    # Sin volatilidad de rendimiento las trayectorias simuladas son la central
+    np.testing.assert_allclose(resultado["rango_objetivo_mxn"], np.repeat(saldo_objetivo[:, None], 3, axis=1), rtol=1e-12)
+
+
+def test_depreciacion_sin_volatilidad_valua_el_saldo_usd_al_tipo_final():
+    plan = _plan()
+    resultado = simular_plan_usd(**plan, tipo_cambio_inicial=20.0, depreciacion_anual=0.03, volatilidad_tc=0.0)
+    tc_final = 20.0 * 1.03 ** 35
+    assert resultado["tipo_cambio_objetivo"] == pytest.approx((tc_final,) * 3)
+    np.testing.assert_allclose(resultado["saldo_objetivo_mxn"], resultado["saldo_objetivo_usd"] * tc_final)
+    # Los pesos aportados compran menos dólares, pero el saldo se revalúa al tipo final
+    assert np.all(resultado["saldo_objetivo_mxn"] > proyectar_saldos_lote(**plan)[1])
+
+
+@pytest.mark.parametrize("volatilidad_tc", [0.0, 0.12])
+def test_media_de_trayectorias_sin_sesgo(volatilidad_tc):
+    plan = _plan()
+    resultado = simular_plan_usd(**plan, depreciacion_anual=0.0, volatilidad_rendimiento=VOLATILIDADES,
+                                 volatilidad_tc=volatilidad_tc, correlacion=0.0, n_trayectorias=20_000)
+
+    # Choques independientes: la media es la trayectoria central, que es el motor en pesos
+    np.testing.assert_allclose(resultado["saldo_objetivo_mxn"], proyectar_saldos_lote(**plan)[1], rtol=1e-12)
+    np.testing.assert_allclose(resultado["media_objetivo_mxn"], resultado["saldo_objetivo_mxn"], rtol=0.02)
+    p10, p50, p90 = resultado["rango_objetivo_mxn"].T
+    assert np.all((p10 < p50) & (p50 < resultado["saldo_objetivo_mxn"]) & (resultado["saldo_objetivo_mxn"] < p90))
+
+
+def test_correlacion_negativa_amortigua_el_rango_en_pesos():
+    opciones = dict(depreciacion_anual=0.0, volatilidad_rendimiento=VOLATILIDADES, n_trayectorias=5000)
+    ancho = {
+        rho: np.ptp(simular_plan_usd(**_plan(), correlacion=rho, **opciones)["rango_objetivo_mxn"][:, [0, 2]], axis=1)
+        for rho in (-0.8, 0.8)
+    }
+    assert np.all(ancho[-0.8] < ancho[0.8])
+
+
+def test_sin_plazo():
+    resultado = simular_plan_usd(**_plan(50, 55, 50), n_trayectorias=10)
+    np.testing.assert_array_equal(resultado["saldo_objetivo_mxn"], np.zeros(3))
+    assert resultado["rango_objetivo_mxn"] is None and resultado["media_objetivo_mxn"] is None
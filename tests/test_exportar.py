@@ -0,0 +1,85 @@
+"""Exportación en streaming del calendario de flujos a CSV y XLSX."""
+
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from k360.bench import PARAMETROS_BASE
+from k360.costos import obtener_tasa_admin
+from k360.exportar import escribir, escribir_csv, escribir_xlsx
+from k360.proyeccion import COLUMNAS_CALENDARIO, iterar_calendario, proyectar_saldos_dos_fases
+
+NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+PARAMETROS = dict(
+    PARAMETROS_BASE, edad_actual=30, edad_fin_aportes=55, edad_objetivo=65,
+    tasa_admin_real=obtener_tasa_admin(PARAMETROS_BASE["ahorro_mensual"], 25),
+)
+
+
+def _filas_xlsx(contenido: bytes) -> list:
+    """Valores de la hoja como texto, fila por fila (sin openpyxl)."""
+    with zipfile.ZipFile(io.BytesIO(contenido)) as libro:
+        assert libro.testzip() is None
+        raiz = ElementTree.fromstring(libro.read("xl/worksheets/sheet1.xml"))
+    filas = []
+    for fila in raiz.iterfind("x:sheetData/x:row", NS):
+        filas.append([c.findtext("x:v", namespaces=NS) or c.findtext("x:is/x:t", namespaces=NS) for c in fila])
+    return filas
+
+
+@pytest.mark.parametrize("granularidad, esperadas", [("mensual", 35 * 12), ("anual", 35)])
+def test_calendario_cuenta_filas_y_cierra_en_el_saldo_del_motor(granularidad, esperadas):
+    filas = list(iterar_calendario(**PARAMETROS, granularidad=granularidad))
+    assert len(filas) == esperadas
+    assert all(len(f) == len(COLUMNAS_CALENDARIO) for f in filas)
+    assert filas[-1][-1] == pytest.approx(proyectar_saldos_dos_fases(**PARAMETROS)[1], rel=1e-9)
+
+
+def test_csv_filas_y_bom():
+    destino = io.BytesIO()
+    n = escribir_csv(iterar_calendario(**PARAMETROS, granularidad="anual"), destino, COLUMNAS_CALENDARIO)
+
+    contenido = destino.getvalue()
+    assert contenido.startswith(b"\xef\xbb\xbf")
+    filas = list(csv.reader(io.StringIO(contenido.decode("utf-8-sig"))))
+    assert n == 35
+    assert filas[0] == list(COLUMNAS_CALENDARIO)
+    assert len(filas) == n + 1
+    assert not destino.closed  # el destino es del llamador
+
+
+def test_xlsx_filas_y_valores():
+    filas = list(iterar_calendario(**PARAMETROS, granularidad="mensual"))
+    destino = io.BytesIO()
+    n = escribir_xlsx(iter(filas), destino, COLUMNAS_CALENDARIO, filas_por_bloque=100)
+
+    hoja = _filas_xlsx(destino.getvalue())
+    assert n == len(filas)
+    assert hoja[0] == list(COLUMNAS_CALENDARIO)
+    assert len(hoja) == n + 1
+    assert float(hoja[-1][-1]) == pytest.approx(filas[-1][-1])
+
+
+def test_xlsx_escapa_texto():
+    destino = io.BytesIO()
+    escribir_xlsx([("<a & b>", 1, 2.5, True)], destino, ["Texto", "Entero", "Flotante", "Bool"])
+    assert _filas_xlsx(destino.getvalue())[1] == ["<a & b>", "1", "2.5", "True"]
+
+
+def test_xlsx_abre_con_pandas():
+    pytest.importorskip("openpyxl")
+    import pandas as pd
+
+    destino = io.BytesIO()
+    n = escribir("xlsx", iterar_calendario(**PARAMETROS, granularidad="anual"), destino, COLUMNAS_CALENDARIO)
+    df = pd.read_excel(io.BytesIO(destino.getvalue()))
+    assert list(df.columns) == list(COLUMNAS_CALENDARIO)
+    assert len(df) == n
+
+
+def test_formato_no_soportado():
+    with pytest.raises(ValueError):
+        escribir("ods", [], io.BytesIO(), COLUMNAS_CALENDARIO)
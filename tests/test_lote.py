@@ -0,0 +1,97 @@
+"""Modo lote: normalización de prospectos y de CSV/JSON a PDFs, calendarios y resumen."""
+
+import csv
+import io
+import json
+import zipfile
+
+import pytest
+
+from k360.lote import _perfil, ejecutar_lote, leer_prospectos, main, normalizar_prospecto
+
+PROSPECTOS = [
+    {"nombre": "Ana López", "edad": "30", "fin_aportes": "55", "retiro": "65", "ahorro": "3000",
+     "estrategia": "151", "isr": "30%", "perfil": "dinamico", "asesor": "Beto", "reinvertir": "si"},
+    {"nombre": "Carlos Ruiz", "edad": "40", "fin_aportes": "50", "retiro": "60", "ahorro": "5000",
+     "estrategia": "Art 93 (No Deducible)", "isr": "0.35", "perfil": "", "asesor": "Beto", "inflacion_pct": "0"},
+]
+
+
+def _escribir_csv(ruta, filas):
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=sorted({k for fila in filas for k in fila}))
+        writer.writeheader()
+        writer.writerows(filas)
+    return str(ruta)
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("dinamico", "Dinámico (Optimista)"),
+    ("DINÁMICO", "Dinámico (Optimista)"),
+    ("Conserv", "Conservador"),
+    ("", "Balanceado (Recomendado)"),
+    (None, "Balanceado (Recomendado)"),
+])
+def test_perfil(valor, esperado):
+    assert _perfil(valor) == esperado
+
+
+@pytest.mark.parametrize("valor", ["Agresivo", "Balanceado Plus"])
+def test_perfil_desconocido_lanza(valor):
+    with pytest.raises(ValueError, match="Perfil no reconocido"):
+        _perfil(valor)
+
+
+def test_normalizar_prospecto():
+    ana, carlos = (normalizar_prospecto(fila) for fila in PROSPECTOS)
+    assert (ana["isr_cliente"], ana["tasa_bruta"], ana["reinvertir_beneficio"]) == (0.30, 0.105, True)
+    assert ana["estrategia_fiscal"] == "Art 151 (PPR - Deducible)"
+    assert (carlos["perfil"], carlos["tasa_bruta"], carlos["inflacion"]) == ("Balanceado (Recomendado)", 0.085, False)
+    with pytest.raises(ValueError, match="fin_aportes"):
+        normalizar_prospecto({k: v for k, v in PROSPECTOS[0].items() if k != "fin_aportes"})
+
+
+def test_lote_serial_desde_csv_con_calendario(tmp_path):
+    ruta = _escribir_csv(tmp_path / "prospectos.csv", PROSPECTOS)
+    salida = tmp_path / "propuestas"
+    resumenes = ejecutar_lote(leer_prospectos(ruta), str(salida), workers=1, calendario="csv", granularidad="anual")
+
+    assert [r.get("error") for r in resumenes] == [None, None]
+    for r in resumenes:
+        assert (salida / r["archivo"]).read_bytes().startswith(b"%PDF")
+        nombre = r["archivo"].replace("Propuesta_", "Calendario_").replace(".pdf", ".csv")
+        filas = list(csv.reader(io.StringIO((salida / nombre).read_text(encoding="utf-8-sig"))))
+        assert float(filas[-1][-1]) == pytest.approx(r["saldo_objetivo"], abs=0.01)
+    with open(salida / "resumen.csv", encoding="utf-8") as f:
+        assert [fila["nombre"] for fila in csv.DictReader(f)] == ["Ana López", "Carlos Ruiz"]
+
+
+def test_perfil_desconocido_se_reporta_y_no_detiene_el_lote(tmp_path):
+    filas = [PROSPECTOS[0], dict(PROSPECTOS[1], perfil="Agresivo")]
+    resumenes = ejecutar_lote(filas, str(tmp_path / "salida"), workers=1)
+
+    assert resumenes[0].get("error") is None
+    assert "Perfil no reconocido" in resumenes[1]["error"]
+    assert "archivo" not in resumenes[1]
+    assert len(list((tmp_path / "salida").glob("*.pdf"))) == 1
+
+
+def test_cli_json_a_zip_con_pool(tmp_path, capsys):
+    ruta = tmp_path / "prospectos.json"
+    ruta.write_text(json.dumps(PROSPECTOS), encoding="utf-8")
+    salida = tmp_path / "propuestas.zip"
+
+    assert main([str(ruta), "--salida", str(salida), "--workers", "2", "--calendario", "xlsx"]) == 0
+    assert "2 propuestas generadas" in capsys.readouterr().out
+    with zipfile.ZipFile(salida) as z:
+        nombres = z.namelist()
+        assert z.testzip() is None
+    assert sum(n.endswith(".pdf") for n in nombres) == 2
+    assert sum(n.endswith(".xlsx") for n in nombres) == 2
+    assert "resumen.csv" in nombres
+
+
+def test_cli_con_errores_sale_con_1(tmp_path, capsys):
+    ruta = _escribir_csv(tmp_path / "prospectos.csv", [dict(PROSPECTOS[0], perfil="Agresivo")])
+    assert main([ruta, "--salida", str(tmp_path / "salida"), "--workers", "1"]) == 1
+    assert "Perfil no reconocido" in capsys.readouterr().err
@@ -0,0 +1,114 @@
+"""Métricas por etapa: histogramas acumulados, texto Prometheus y spans por hilo."""
+
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from k360 import metricas
+from k360.cache import CACHE_PROYECCIONES
+from k360.metricas import Histograma, RegistroMetricas, span
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    nuevo = RegistroMetricas()
+    monkeypatch.setattr(metricas, "REGISTRO", nuevo)
+    return nuevo
+
+
+def _serie(registro, nombre):
+    return {f["span"]: f for f in registro.resumen()}[nombre]
+
+
+def test_histograma_acumula_por_cubeta():
+    histograma = Histograma((1.0, 2.0, 5.0))
+    for valor in (0.5, 1.0, 1.5, 3.0, 10.0):
+        histograma.observar(valor)
+
+    assert histograma.acumulados() == [(1.0, 2), (2.0, 3), (5.0, 4), (float("inf"), 5)]
+    assert histograma.total == 5
+    assert histograma.suma == pytest.approx(16.0)
+
+
+def test_texto_prometheus():
+    registro = RegistroMetricas()
+    registro.registrar("comparador", 0.02, cache_hits=3, cache_misses=1)
+    registro.registrar("comparador", 0.2, error=True)
+    lineas = registro.texto_prometheus().splitlines()
+
+    assert 'k360_span_segundos_bucket{span="comparador",le="0.01"} 0' in lineas
+    assert 'k360_span_segundos_bucket{span="comparador",le="0.025"} 1' in lineas
+    assert 'k360_span_segundos_bucket{span="comparador",le="+Inf"} 2' in lineas
+    assert 'k360_span_segundos_count{span="comparador"} 2' in lineas
+    for metrica, valor in (("cache_hits", 3), ("cache_misses", 1), ("errores", 1)):
+        assert f"# TYPE k360_span_{metrica}_total counter" in lineas
+        assert f'k360_span_{metrica}_total{{span="comparador"}} {valor}' in lineas
+    # Sin tracemalloc no hay serie de memoria para el span
+    assert not any(linea.startswith("k360_span_memoria_pico_bytes_") for linea in lineas)
+
+
+def test_span_cuenta_solo_la_cache_de_su_hilo(registro):
+    clave = ("prueba-metricas", "hilo")
+    CACHE_PROYECCIONES.guardar(clave, np.zeros(4))
+    listo = threading.Event()
+
+    def otra_sesion():
+        for _ in range(50):
+            CACHE_PROYECCIONES.obtener(clave)
+        listo.set()
+
+    with span("proyeccion"):
+        CACHE_PROYECCIONES.obtener(clave)
+        CACHE_PROYECCIONES.obtener(("prueba-metricas", "falta"), None)
+        hilo = threading.Thread(target=otra_sesion)
+        hilo.start()
+        hilo.join()
+    assert listo.is_set()
+
+    fila = _serie(registro, "proyeccion")
+    assert (fila["cache_hits"], fila["cache_misses"]) == (1, 1)
+
+
+def test_span_con_excepcion_cuenta_error_salvo_stop_y_rerun(registro):
+    class RerunException(Exception):
+        pass
+
+    for excepcion in (ValueError, RerunException):
+        with pytest.raises(excepcion):
+            with span("etapa"):
+                raise excepcion()
+    assert _serie(registro, "etapa")["errores"] == 1
+    assert _serie(registro, "etapa")["conteo"] == 2
+
+
+def test_span_anidado_conserva_el_pico_del_exterior(registro):
+    iniciado = not tracemalloc.is_tracing()
+    if iniciado:
+        tracemalloc.start()
+    try:
+        with span("exterior"):
+            with span("interior"):
+                grande = np.ones(2_000_000)  # ~16 MB que se liberan antes de salir
+                del grande
+            chico = np.ones(1000)
+            del chico
+    finally:
+        if iniciado:
+            tracemalloc.stop()
+
+    interior = _serie(registro, "interior")["pico_memoria_kb_prom"] * 1024
+    exterior = _serie(registro, "exterior")["pico_memoria_kb_prom"] * 1024
+    assert interior >= 16_000_000
+    assert exterior >= interior  # el reset_peak del interior no borra el pico del exterior
+
+
+@pytest.mark.skipif(not metricas.ACTIVAS, reason="K360_METRICAS=0")
+def test_instrumentar_registra_cada_llamada(registro):
+    @metricas.instrumentar("doble")
+    def doble(x):
+        return 2 * x
+
+    assert doble(3) == 6 and doble(4) == 8
+    assert _serie(registro, "doble")["conteo"] == 2
@@ -0,0 +1,52 @@
+"""Monte Carlo de perfiles: sin volatilidad es el motor determinista y en media también."""
+
+import pytest
+
+from k360.bench import PARAMETROS_BASE
+from k360.montecarlo import PERFILES_MONTECARLO, simular_montecarlo
+from k360.proyeccion import ESTRATEGIA_ART_93, proyectar_saldos_dos_fases
+
+FRECUENCIAS = ("anual", "mensual")
+
+
+def _plan(edad=30, fin=50, objetivo=65, **extra):
+    return dict(PARAMETROS_BASE, edad_actual=edad, edad_fin_aportes=fin, edad_objetivo=objetivo,
+                tasa_admin_real=0.0164, **extra)
+
+
+def _simular(plan, tasa, volatilidad, **opciones):
+    sin_tasa = {k: v for k, v in plan.items() if k != "tasa_bruta_scenario"}
+    return simular_montecarlo(**sin_tasa, tasa_media=tasa, volatilidad=volatilidad, **opciones)
+
+
+@pytest.mark.parametrize("frecuencia", FRECUENCIAS)
+@pytest.mark.parametrize("plan", [_plan(), _plan(40, 45, 45, estrategia_fiscal=ESTRATEGIA_ART_93), _plan(30, 70, 65)])
+def test_sin_volatilidad_igual_al_motor_determinista(plan, frecuencia):
+    resultado = _simular(plan, 0.085, 0.0, frecuencia=frecuencia, n_trayectorias=3)
+    saldo_fin, saldo_objetivo, _ = proyectar_saldos_dos_fases(**dict(plan, tasa_bruta_scenario=0.085))
+
+    assert resultado["saldo_objetivo"] == pytest.approx((saldo_objetivo,) * 3, rel=1e-12)
+    assert resultado["saldo_fin_aportes"] == pytest.approx((saldo_fin,) * 3, rel=1e-12)
+    assert resultado["saldo_objetivo_media"] == pytest.approx(saldo_objetivo, rel=1e-12)
+
+
+@pytest.mark.parametrize("frecuencia", FRECUENCIAS)
+@pytest.mark.parametrize("perfil", ["Balanceado (Recomendado)", "Dinámico (Optimista)"])
+@pytest.mark.parametrize("horizonte", [(30, 65, 65), (30, 50, 65)])
+def test_media_de_trayectorias_igual_al_motor_determinista(horizonte, perfil, frecuencia):
+    tasa, volatilidad = PERFILES_MONTECARLO[perfil]
+    plan = _plan(*horizonte)
+    resultado = _simular(plan, tasa, volatilidad, frecuencia=frecuencia, n_trayectorias=20_000)
+    _, saldo_objetivo, _ = proyectar_saldos_dos_fases(**dict(plan, tasa_bruta_scenario=tasa))
+
+    # Sin sesgo de convexidad: antes el modo anual daba ~1.5x con el perfil Dinámico a 35 años
+    assert resultado["saldo_objetivo_media"] == pytest.approx(saldo_objetivo, rel=0.02)
+    p10, p50, p90 = resultado["saldo_objetivo"]
+    assert p10 < p50 < saldo_objetivo < p90
+
+
+def test_semilla_reproducible_y_frecuencia_invalida():
+    plan = _plan()
+    assert _simular(plan, 0.085, 0.10, semilla=7)["saldo_objetivo"] == _simular(plan, 0.085, 0.10, semilla=7)["saldo_objetivo"]
+    with pytest.raises(ValueError):
+        _simular(plan, 0.085, 0.10, frecuencia="diaria")
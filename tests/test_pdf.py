@@ -0,0 +1,84 @@
+"""Camino rápido del PDF: un bloque estático reinsertado debe dar los mismos bytes que multi_cell."""
+
+import re
+
+import pytest
+
+from k360 import pdf as modulo_pdf
+from k360.bench import HORIZONTES, PARAMETROS_BASE, _datos_pdf
+from k360.costos import obtener_tasa_admin
+from k360.pdf import PDFReport, crear_pdf
+
+TEXTO = (
+    "Resumen: con una aportación mensual indexada y la deducción del Art. 151 "
+    "el saldo proyectado a la edad objetivo considera el costo de administración "
+    "y la devolución del SAT reinvertida cada año. " * 3
+)
+
+
+@pytest.fixture
+def bloques_limpios(monkeypatch):
+    monkeypatch.setattr(modulo_pdf, "_BLOQUES_ESTATICOS", {})
+    return monkeypatch
+
+
+def _componer(y: float, estatico: bool):
+    pdf = PDFReport()
+    pdf.add_page()
+    pdf.set_font("Arial", "", 10)
+    pdf.set_y(y)
+    if estatico:
+        pdf.multi_cell_estatico(0, 4.5, TEXTO)
+    else:
+        pdf.multi_cell(0, 4.5, TEXTO)
+    pdf.cell(0, 5, "Siguiente renglón", 0, 1)
+    return pdf
+
+
+def test_version_fpdf_verificada():
+    # El replay depende del estado privado de esta versión (requirements.txt la fija)
+    assert modulo_pdf.VERSION_FPDF == "1.7.2"
+    assert modulo_pdf.BLOQUES_ESTATICOS_ACTIVOS
+
+
+def test_replay_misma_posicion_da_los_mismos_bytes(bloques_limpios):
+    normal = _componer(40, estatico=False)
+    primero = _componer(40, estatico=True)  # compone y guarda el bloque
+    assert len(modulo_pdf._BLOQUES_ESTATICOS) == 1
+    replay = _componer(40, estatico=True)  # reinserta el fragmento guardado
+
+    assert primero.pages == normal.pages
+    assert replay.pages == normal.pages
+    assert (replay.x, replay.y, replay.lasth) == (normal.x, normal.y, normal.lasth)
+
+
+def test_replay_desplazado_conserva_la_posicion(bloques_limpios):
+    _componer(40, estatico=True)
+    normal = _componer(70, estatico=False)
+    replay = _componer(70, estatico=True)
+
+    assert (replay.x, replay.y) == pytest.approx((normal.x, normal.y))
+    assert re.search(r"q 1 0 0 1 0 -?[\d.]+ cm", replay.pages[1])
+
+
+def test_crear_pdf_igual_con_y_sin_camino_rapido(bloques_limpios):
+    edad, fin, objetivo = HORIZONTES["18-43-65"]
+    parametros = dict(
+        PARAMETROS_BASE, edad_actual=edad, edad_fin_aportes=fin, edad_objetivo=objetivo,
+        tasa_admin_real=obtener_tasa_admin(PARAMETROS_BASE["ahorro_mensual"], fin - edad),
+    )
+    datos = _datos_pdf(parametros)
+
+    def sin_fecha(contenido: bytes) -> bytes:
+        return re.sub(rb"/CreationDate \(D:\d+\)", b"", contenido)
+
+    bloques_limpios.setattr(modulo_pdf, "BLOQUES_ESTATICOS_ACTIVOS", False)
+    referencia, error = crear_pdf(*datos)
+    assert error is None
+
+    bloques_limpios.setattr(modulo_pdf, "BLOQUES_ESTATICOS_ACTIVOS", True)
+    crear_pdf(*datos)  # llena los bloques
+    replay, error = crear_pdf(*datos)
+    assert error is None
+    assert modulo_pdf._BLOQUES_ESTATICOS
+    assert sin_fecha(replay) == sin_fecha(referencia)
@@ -0,0 +1,104 @@
+"""Motor de forma cerrada contra el bucle de referencia mes a mes, y el lote contra el escalar."""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from k360.proyeccion import (
+    ESTRATEGIA_ART_151,
+    ESTRATEGIA_ART_185,
+    ESTRATEGIA_ART_93,
+    _proyectar_saldos_dos_fases_mensual,
+    proyectar_saldos_dos_fases,
+    proyectar_saldos_lote,
+)
+from k360.reglas_fiscales import topes_por_anio
+
+PARAMETROS_BASE = dict(
+    ahorro_mensual=3000.0,
+    tasa_bruta_scenario=0.10,
+    inflacion=True,
+    tasa_inflacion=0.05,
+    estrategia_fiscal=ESTRATEGIA_ART_151,
+    validar_sueldo=False,
+    sueldo_anual=0.0,
+    isr_cliente=0.30,
+    tope_art_151_abs=206_367.0,
+    tope_art_185=152_000.0,
+    reinvertir_beneficio=True,
+)
+HORIZONTES = [(40, 45, 45), (35, 50, 60), (18, 43, 65), (30, 30, 65), (30, 70, 65), (50, 55, 50)]
+ESTRATEGIAS = [ESTRATEGIA_ART_151, ESTRATEGIA_ART_93, ESTRATEGIA_ART_185]
+
+
+def _caso(horizonte, estrategia, reinvertir, inflacion, validar):
+    edad, fin, objetivo = horizonte
+    return dict(
+        PARAMETROS_BASE,
+        ahorro_mensual=18_000.0 if validar else 3000.0,
+        edad_actual=edad,
+        edad_fin_aportes=fin,
+        edad_objetivo=objetivo,
+        tasa_admin_real=0.0228 if fin - edad < 20 else 0.0199,
+        estrategia_fiscal=estrategia,
+        reinvertir_beneficio=reinvertir,
+        inflacion=inflacion,
+        validar_sueldo=validar,
+        sueldo_anual=250_000.0 if validar else 0.0,
+    )
+
+
+CASOS = [
+    _caso(*combinacion)
+    for combinacion in itertools.product(HORIZONTES, ESTRATEGIAS, (False, True), (False, True), (False, True))
+]
+
+
+def _id(caso):
+    return "{edad_actual}-{edad_fin_aportes}-{edad_objetivo}/{reinvertir_beneficio}/{inflacion}/{validar_sueldo}".format(**caso)
+
+
+@pytest.mark.parametrize("caso", CASOS, ids=[_id(c) for c in CASOS])
+def test_forma_cerrada_igual_a_referencia(caso):
+    esperado = _proyectar_saldos_dos_fases_mensual(**caso)
+    assert proyectar_saldos_dos_fases(**caso) == pytest.approx(esperado, rel=1e-9, abs=1e-6)
+
+
+@pytest.mark.parametrize("estrategia", ESTRATEGIAS)
+def test_forma_cerrada_con_topes_por_anio(estrategia):
+    caso = _caso((18, 43, 65), estrategia, True, True, True)
+    caso["topes_anuales"] = topes_por_anio(estrategia, True, caso["sueldo_anual"], 60, 2025)
+    esperado = _proyectar_saldos_dos_fases_mensual(**caso)
+    assert proyectar_saldos_dos_fases(**caso) == pytest.approx(esperado, rel=1e-9, abs=1e-6)
+
+
+def test_sin_plazo_no_hay_saldo():
+    caso = _caso((50, 55, 50), ESTRATEGIA_ART_151, True, True, False)
+    saldo_fin, saldo_objetivo, _ = proyectar_saldos_dos_fases(**caso)
+    assert saldo_fin == saldo_objetivo == 0.0
+
+
+def test_tasa_neta_descuenta_admin():
+    caso = _caso((35, 50, 60), ESTRATEGIA_ART_93, False, False, False)
+    _, _, tasa_neta = proyectar_saldos_dos_fases(**caso)
+    assert tasa_neta == pytest.approx(max(0.0, caso["tasa_bruta_scenario"] - caso["tasa_admin_real"]))
+    assert np.isfinite(tasa_neta)
+
+
+def test_lote_igual_a_escalar():
+    lote = proyectar_saldos_lote(**{k: np.array([c[k] for c in CASOS]) for k in CASOS[0]})
+    for i, caso in enumerate(CASOS):
+        esperado = proyectar_saldos_dos_fases(**caso)
+        assert (lote[0][i], lote[1][i], lote[2][i]) == pytest.approx(esperado, rel=1e-9, abs=1e-6), _id(caso)
+
+
+def test_lote_broadcast_de_tasas():
+    caso = _caso((18, 43, 65), ESTRATEGIA_ART_151, True, True, False)
+    tasas = np.array([0.04, 0.085, 0.12])
+    saldos_fin, saldos_obj, netas = proyectar_saldos_lote(**dict(caso, tasa_bruta_scenario=tasas))
+    assert saldos_obj.shape == tasas.shape
+    for i, tasa in enumerate(tasas):
+        esperado = proyectar_saldos_dos_fases(**dict(caso, tasa_bruta_scenario=float(tasa)))
+        assert (saldos_fin[i], saldos_obj[i], netas[i]) == pytest.approx(esperado, rel=1e-9)
+    assert np.all(np.diff(saldos_obj) > 0)
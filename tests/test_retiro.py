@@ -0,0 +1,69 @@
+"""Fase de retiros: forma cerrada contra el bucle mes a mes y pensión máxima."""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from k360.proyeccion import (
+    ESTRATEGIA_ART_151,
+    ESTRATEGIA_ART_185,
+    ESTRATEGIA_ART_93,
+    _proyectar_retiro_mensual,
+    pension_maxima,
+    proyectar_retiro,
+)
+
+MODOS = [
+    ("fijo", {"retiro_mensual": 20_000.0}),
+    ("fijo", {"retiro_mensual": 40_000.0}),  # se agota antes de los 100
+    ("indexado", {"retiro_mensual": 15_000.0, "indexacion": 0.05}),
+    ("porcentaje", {"porcentaje_anual": 0.07}),
+]
+CASOS = [
+    dict(saldo_inicial=5_000_000.0, edad_retiro=65, tasa_neta=tasa, modo=modo,
+         estrategia_fiscal=estrategia, isr_retiro=0.30, exencion=1_200_000.0, **extra)
+    for tasa, (modo, extra), estrategia in itertools.product(
+        (0.0, 0.06), MODOS, (ESTRATEGIA_ART_151, ESTRATEGIA_ART_93, ESTRATEGIA_ART_185)
+    )
+]
+
+
+@pytest.mark.parametrize("caso", CASOS)
+def test_forma_cerrada_igual_a_referencia(caso):
+    edad_agotamiento, saldo_final, total_bruto, total_isr = _proyectar_retiro_mensual(**caso)
+    resultado = proyectar_retiro(**caso)
+
+    assert resultado["edad_agotamiento"] == edad_agotamiento
+    assert (resultado["saldo_final"], resultado["total_bruto"], resultado["total_isr"]) == pytest.approx(
+        (saldo_final, total_bruto, total_isr), rel=1e-9, abs=1e-6
+    )
+    assert resultado["total_neto"] == pytest.approx(resultado["total_bruto"] - resultado["total_isr"])
+
+
+def test_modo_invalido():
+    with pytest.raises(ValueError):
+        proyectar_retiro(1_000_000.0, 65, 0.05, modo="mensual")
+
+
+@pytest.mark.parametrize("tasa, indexacion", [(0.0, 0.0), (0.06, 0.0), (0.06, 0.04), (0.05, (1 + 0.05 / 12) ** 12 - 1)])
+def test_pension_maxima_agota_el_saldo_en_el_plazo(tasa, indexacion):
+    saldo, anos = 3_000_000.0, 25
+    pension = pension_maxima(saldo, tasa, anos, indexacion)
+    modo = "indexado" if indexacion else "fijo"
+    resultado = proyectar_retiro(saldo, 65, tasa, modo=modo, retiro_mensual=pension,
+                                 indexacion=indexacion, edad_maxima=65 + anos)
+
+    assert resultado["saldo_final"] == pytest.approx(0.0, abs=1e-4)
+    assert resultado["edad_agotamiento"] is None
+    # Un peso más al mes ya no alcanza
+    mayor = proyectar_retiro(saldo, 65, tasa, modo=modo, retiro_mensual=pension + 1.0,
+                             indexacion=indexacion, edad_maxima=65 + anos)
+    assert mayor["edad_agotamiento"] is not None
+
+
+def test_pension_maxima_vectorizada():
+    saldos = np.array([1e6, 2e6, 4e6])
+    pensiones = pension_maxima(saldos, 0.05, 20)
+    np.testing.assert_allclose(pensiones, [pension_maxima(float(s), 0.05, 20) for s in saldos])
+    np.testing.assert_allclose(pensiones / saldos, pensiones[0] / saldos[0])
@@ -0,0 +1,98 @@
+"""Tokens de sesión firmados, revocación y conteo de intentos compartido."""
+
+import pytest
+
+from k360.sesion import (
+    IntentosMemoria,
+    IntentosSQLite,
+    _b64,
+    _firma,
+    crear_almacen_intentos,
+    firmar_token,
+    validar_token,
+)
+
+SECRETO = "secreto-de-prueba"
+
+
+def test_ida_y_vuelta():
+    token = firmar_token("jay", 3600, SECRETO, ahora=1000.0)
+    sesion = validar_token(token, SECRETO, ahora=2000.0)
+    assert sesion["usuario"] == "jay"
+    assert sesion["exp"] == 4600.0
+    assert sesion["jti"]
+    assert "rol" not in sesion  # el rol se lee de la configuración, no del token
+
+
+def test_cada_token_tiene_jti_distinto():
+    uno, otro = (validar_token(firmar_token("jay", 60, SECRETO), SECRETO) for _ in range(2))
+    assert uno["jti"] != otro["jti"]
+
+
+def test_expirado():
+    token = firmar_token("jay", 60, SECRETO, ahora=1000.0)
+    assert validar_token(token, SECRETO, ahora=1059.0) is not None
+    assert validar_token(token, SECRETO, ahora=1060.0) is None
+
+
+def test_firma_alterada_u_otro_secreto():
+    token = firmar_token("jay", 60, SECRETO)
+    payload, firma = token.split(".")
+    otra = "A" if firma[0] != "A" else "B"
+    assert validar_token(f"{payload}.{otra}{firma[1:]}", SECRETO) is None
+    assert validar_token(token, "otro-secreto") is None
+    # Payload cambiado con la firma original
+    falso = _b64(b'{"exp":9999999999,"j":"x","u":"admin"}')
+    assert validar_token(f"{falso}.{firma}", SECRETO) is None
+
+
+@pytest.mark.parametrize("token", [
+    None, "", "sin-punto", "a.b.c", "ñandú.abc", "abc.ñ", "abc.é", 12345, "=.=", "%%%.###",
+])
+def test_tokens_malformados_no_lanzan(token):
+    assert validar_token(token, SECRETO) is None
+
+
+@pytest.mark.parametrize("contenido", [b"[1]", b"null", b'{"exp":"x"}', b'{"exp":[1]}', b"\xff\xfe", b"{}"])
+def test_payload_firmado_pero_invalido(contenido):
+    payload = _b64(contenido)
+    assert validar_token(f"{payload}.{_firma(payload, SECRETO)}", SECRETO) is None
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request, tmp_path):
+    if request.param == "memoria":
+        return IntentosMemoria()
+    return IntentosSQLite(str(tmp_path / "intentos.sqlite3"))
+
+
+def test_bloqueo_tras_max_intentos(almacen):
+    assert almacen.registrar_fallo("jay", 3, 300) == 0.0
+    assert almacen.registrar_fallo("jay", 3, 300) == 0.0
+    hasta = almacen.registrar_fallo("jay", 3, 300)
+    assert hasta > 0.0
+    assert almacen.bloqueado_hasta("jay") == hasta
+    assert almacen.bloqueado_hasta("otro") == 0.0
+    almacen.reiniciar("jay")
+    assert almacen.bloqueado_hasta("jay") == 0.0
+
+
+def test_revocacion(almacen):
+    sesion = validar_token(firmar_token("jay", 600, SECRETO), SECRETO)
+    assert not almacen.revocado(sesion["jti"])
+    almacen.revocar(sesion["jti"], sesion["exp"])
+    assert almacen.revocado(sesion["jti"])
+    assert not almacen.revocado("otro-jti")
+
+
+def test_revocaciones_compartidas_entre_procesos(tmp_path):
+    ruta = str(tmp_path / "intentos.sqlite3")
+    IntentosSQLite(ruta).revocar("jti-1", 9_999_999_999.0)
+    assert IntentosSQLite(ruta).revocado("jti-1")
+
+
+def test_crear_almacen(tmp_path):
+    assert isinstance(crear_almacen_intentos("memoria"), IntentosMemoria)
+    assert isinstance(crear_almacen_intentos(f"sqlite:{tmp_path / 'x.sqlite3'}"), IntentosSQLite)
+    with pytest.raises(ValueError):
+        crear_almacen_intentos("redis://localhost")